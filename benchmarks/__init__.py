@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+
+
+__author__ = "Hao Luo"
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+事件循环中渲染图表：同步调用与 arender_embed 对比事件循环的最大停顿，以及同一请求并发时的合并效果
+
+python -m benchmarks.bench_async [rows [concurrency]]
+"""
+import asyncio
+import sys
+import time
+
+from benchmarks.bench_parse_data import make_frame
+from stock.kline.aio import AsyncRenderer
+from stock.kline.kline import ProKline
+
+__author__ = "Hao Luo"
+
+
+async def max_stall(coroutine):
+    """
+    :return: (耗时, 事件循环最大停顿)
+    """
+    stalls = [0.0]
+
+    async def ticker():
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stalls[0] = max(stalls[0], time.perf_counter() - start)
+
+    task = asyncio.ensure_future(ticker())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await coroutine
+    seconds = time.perf_counter() - start
+    await asyncio.sleep(0.01)
+    task.cancel()
+    return seconds, stalls[0]
+
+
+async def main(rows, concurrency):
+    df = make_frame(rows)
+    renderer = AsyncRenderer()
+
+    async def sync_render():
+        for _ in range(concurrency):
+            ProKline("BENCH", df).render_embed()
+
+    async def async_render():
+        await asyncio.gather(*[ProKline("BENCH", df).arender_embed(renderer=renderer) for _ in range(concurrency)])
+
+    print("%-8s %10s %14s" % ("", "seconds", "max stall(s)"))
+    print("%-8s %10.3f %14.3f" % (("sync",) + await max_stall(sync_render())))
+    print("%-8s %10.3f %14.3f" % (("async",) + await max_stall(async_render())))
+    renderer.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*([int(arg) for arg in sys.argv[1:]] or [5000, 8])))
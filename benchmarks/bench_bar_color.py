@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+成交量、MACD柱的涨跌取色：逐点 JS 回调（每点 [idx, value, state]）与 Python 端拆分为两个纯数值序列对比
+
+python -m benchmarks.bench_bar_color [rows]
+"""
+import sys
+import time
+
+from benchmarks.suite import synthetic_ohlcv
+from stock.kline.kline import BAR_COLOR_MODES, Config, MacdChart, ProKline, VolumeBar
+
+__author__ = "Hao Luo"
+
+
+def main(rows=100000):
+    df = synthetic_ohlcv(rows)
+    data = ProKline("BENCH", df).parse_data()
+    targets = {
+        "VolumeBar": lambda mode: VolumeBar("VOLUME", data["str_dates"], data["volume_bar_y_data"], color_mode=mode).get_chart(),
+        "MacdChart": lambda mode: MacdChart("MACD", data["str_dates"], data["close_prices"], color_mode=mode).get_chart(),
+        "ProKline.fast_inline": lambda mode: ProKline("BENCH", df).get_fast_chart(),
+        "ProKline.fast_dataset": lambda mode: ProKline("BENCH", df).get_fast_chart(mode="dataset"),
+    }
+
+    print("%d bars" % rows)
+    print("%-24s %-10s %10s %12s %10s" % ("target", "mode", "seconds", "output(MB)", "callbacks"))
+    for name, build in targets.items():
+        for mode in BAR_COLOR_MODES:
+            Config.BAR_COLOR_MODE = mode
+            start = time.perf_counter()
+            options = build(mode).dump_options()
+            seconds = time.perf_counter() - start
+            print("%-24s %-10s %10.3f %12.2f %10d" % (name, mode, seconds, len(options) / 1e6, options.count("function (params)")))
+    Config.BAR_COLOR_MODE = "callback"
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+冷启动：每次在新的解释器里导入模块，记录耗时、常驻内存和被带入的重依赖
+
+python -m benchmarks.bench_import [repeat]
+"""
+import json
+import subprocess
+import sys
+
+__author__ = "Hao Luo"
+
+
+MODULES = [
+    "stock.kline.data",
+    "stock.kline.indicator",
+    "stock.kline.panel",
+    "stock.kline.store",
+    "stock.kline.kline",
+]
+HEAVY_MODULES = ["pandas", "pyecharts", "talib", "jinja2", "asyncio"]
+
+PROBE = '''
+import json, resource, sys, time
+start = time.perf_counter()
+%s
+seconds = time.perf_counter() - start
+print(json.dumps({
+    "seconds": seconds,
+    "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+'''
+
+# 导入后再生成一张小图，包含第一次使用时才加载的依赖
+FIRST_CHART = '''from stock.kline.kline import ProKline
+from stock.kline.data import sample_frame
+ProKline("BENCH", sample_frame()).get_chart().dump_options()'''
+
+
+def probe(code):
+    output = subprocess.run([sys.executable, "-c", PROBE % (code, HEAVY_MODULES)], capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+
+def main(repeat=5):
+    print("%-28s %10s %10s  %s" % ("import", "ms", "rss(MB)", "heavy modules loaded"))
+    cases = [("numpy (baseline)", "import numpy")] + [(name, "import " + name) for name in MODULES] + [("first ProKline chart", FIRST_CHART)]
+    for name, code in cases:
+        results = [probe(code) for _ in range(repeat)]
+        best = min(results, key=lambda result: result["seconds"])
+        print("%-28s %10.1f %10.1f  %s" % (name, best["seconds"] * 1e3, best["max_rss"] / 1e6, ", ".join(best["loaded"])))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
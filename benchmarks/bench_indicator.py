@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+纯 NumPy 指标（algorithm）与 talib 的一致性检查和耗时对比
+
+python -m benchmarks.bench_indicator [rows ...]
+"""
+import sys
+import time
+
+import numpy
+import talib
+
+from stock.kline import algorithm
+
+__author__ = "Hao Luo"
+
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+TOLERANCE = 1e-9
+MA_PERIODS = [1, 5, 10, 20, 30, 60, 90, 120, 180, 250, 7, 14]  # 常见的 12 条均线布局
+
+
+def make_prices(rows, seed=0):
+    random = numpy.random.default_rng(seed)
+    close_prices = 10 + numpy.cumsum(random.normal(0, 0.1, rows))
+    high_prices = close_prices + random.random(rows)
+    low_prices = close_prices - random.random(rows)
+    volumes = random.integers(100, 100000, rows).astype(numpy.float64)
+    # 开头的 NaN 和最高最低价相等的K线
+    close_prices[:3] = numpy.nan
+    high_prices[10:15] = low_prices[10:15] = close_prices[10:15] = close_prices[10]
+    return high_prices, low_prices, close_prices, volumes
+
+
+def ma_lines(lib, values, periods, matype):
+    """
+    多条均线：algorithm 一次算出整个矩阵，talib 逐条计算
+    """
+    if lib is algorithm:
+        return list(algorithm.ma_matrix(values, periods, matype=matype))
+    return [lib.MA(values, timeperiod=period, matype=matype) for period in periods]
+
+
+def cases(high_prices, low_prices, close_prices, volumes):
+    """
+    :return: [(name, 无参函数)]，函数参数为指标库 talib 或 algorithm
+    """
+    return [
+        ("MA5", lambda lib: [lib.MA(close_prices, timeperiod=5, matype=0)]),
+        ("MA30", lambda lib: [lib.MA(close_prices, timeperiod=30, matype=0)]),
+        ("VMA10", lambda lib: [lib.MA(volumes, timeperiod=10, matype=0)]),
+        ("EMA20", lambda lib: [lib.MA(close_prices, timeperiod=20, matype=1)]),
+        ("MAx12", lambda lib: ma_lines(lib, close_prices, MA_PERIODS, 0)),
+        ("WMAx12", lambda lib: ma_lines(lib, close_prices, MA_PERIODS, 2)),
+        ("MACD", lambda lib: list(lib.MACD(close_prices, fastperiod=12, slowperiod=26, signalperiod=9))),
+        ("STOCH", lambda lib: list(lib.STOCH(high_prices, low_prices, close_prices, 5, 3, 0, 3, 0))),
+    ]
+
+
+def max_error(expected, actual):
+    """
+    NaN 位置必须一致，其余位置返回最大相对误差
+    """
+    nan = numpy.isnan(expected)
+    if not numpy.array_equal(nan, numpy.isnan(actual)):
+        return numpy.inf
+    if nan.all():
+        return 0.0
+    return float(numpy.max(numpy.abs(expected[~nan] - actual[~nan]) / numpy.maximum(numpy.abs(expected[~nan]), 1.0)))
+
+
+def timeit(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main(sizes):
+    print("%10s %8s %10s %10s %8s %10s" % ("rows", "name", "talib(s)", "numpy(s)", "ratio", "max_error"))
+    failed = False
+    for rows in sizes:
+        for name, func in cases(*make_prices(rows)):
+            talib_seconds, expected = timeit(func, talib)
+            numpy_seconds, actual = timeit(func, algorithm)
+            error = max(max_error(e, a) for e, a in zip(expected, actual))
+            failed = failed or error > TOLERANCE
+            print("%10d %8s %10.4f %10.4f %7.1fx %10.2e" % (
+                rows, name, talib_seconds, numpy_seconds, numpy_seconds / max(talib_seconds, 1e-9), error))
+
+    if failed:
+        print("numpy engine differs from talib by more than %g" % TOLERANCE)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
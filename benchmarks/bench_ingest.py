@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+行情文件导入：pandas 整表读入、改名、计算昨收，与按块导入为 Bars 对比
+
+python -m benchmarks.bench_ingest [rows [files]]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy
+import pandas
+
+from benchmarks.suite import synthetic_ohlcv
+from stock.kline.ingest import ingest, ingest_files
+
+__author__ = "Hao Luo"
+
+
+MAPPING = {
+    "str_date": ("date", "time"),
+    "open_price": "open",
+    "close_price": "close",
+    "low_price": "low",
+    "high_price": "high",
+    "volume": "vol",
+}
+
+
+def write_vendor_file(path, rows, seed):
+    """
+    常见的行情文件：日期、时间分列，没有昨收，带无关的列
+    """
+    df = synthetic_ohlcv(rows, seed=seed)
+    pandas.DataFrame({
+        "code": "000001",
+        "date": df["str_date"].str[:10],
+        "time": df["str_date"].str[11:],
+        "open": df["open_price"],
+        "high": df["high_price"],
+        "low": df["low_price"],
+        "close": df["close_price"],
+        "vol": df["volume"],
+        "amount": df["volume"] * df["close_price"],
+    }).to_csv(path, index=False)
+
+
+def load_with_pandas(path):
+    df = pandas.read_csv(path, dtype={"date": str, "time": str})
+    df["str_date"] = df["date"] + " " + df["time"]
+    df = df.rename(columns={"open": "open_price", "high": "high_price", "low": "low_price", "close": "close_price", "vol": "volume"})
+    df["preclose_price"] = df["close_price"].shift(1).fillna(df["close_price"].iloc[0])
+    return df[["str_date", "open_price", "close_price", "low_price", "high_price", "preclose_price", "volume"]]
+
+
+def measure(func, *args):
+    """
+    耗时与峰值内存分开测，tracemalloc 会拖慢计时
+    """
+    start = time.perf_counter()
+    func(*args)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main(rows=2000000, files=4):
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [os.path.join(directory, "%d.csv" % i) for i in range(files)]
+        for seed, path in enumerate(paths):
+            write_vendor_file(path, rows, seed)
+
+        print("%-24s %10s %12s" % ("", "seconds", "peak(MB)"))
+        seconds, peak = measure(load_with_pandas, paths[0])
+        print("%-24s %10.3f %12.1f" % ("pandas, 1 file", seconds, peak / 1e6))
+        seconds, peak = measure(lambda path: ingest(path, mapping=MAPPING, chunksize=500000), paths[0])
+        print("%-24s %10.3f %12.1f" % ("ingest, 1 file", seconds, peak / 1e6))
+        seconds, peak = measure(lambda path: ingest(path, mapping=MAPPING, chunksize=500000, price_dtype=numpy.float32, decimals=2), paths[0])
+        print("%-24s %10.3f %12.1f" % ("ingest float32, 1 file", seconds, peak / 1e6))
+
+        start = time.perf_counter()
+        for path in paths:
+            load_with_pandas(path)
+        print("%-24s %10.3f" % ("pandas, %d files" % files, time.perf_counter() - start))
+        start = time.perf_counter()
+        ingest_files(paths, mapping=MAPPING)
+        print("%-24s %10.3f" % ("ingest, %d files" % files, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
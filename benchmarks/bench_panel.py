@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+多标的指标：逐个标的调用指标函数与按面板一次计算对比
+
+python -m benchmarks.bench_panel [symbols bars [talib|numpy]]
+"""
+import sys
+import time
+
+import numpy
+
+from stock.kline import indicator
+from stock.kline.cache import indicator_cache
+from stock.kline.panel import IndicatorPanel
+
+__author__ = "Hao Luo"
+
+
+CLOSE_MA_PERIODS = [5, 10, 20, 30]
+VOLUME_MA_PERIODS = [5, 10]
+
+
+def make_panel(symbols, bars, seed=0):
+    random = numpy.random.default_rng(seed)
+    close_prices = 10 + numpy.cumsum(random.normal(0, 0.1, (symbols, bars)), axis=1)
+    high_prices = close_prices + random.random((symbols, bars))
+    low_prices = close_prices - random.random((symbols, bars))
+    volumes = random.integers(100, 100000, (symbols, bars)).astype(numpy.float64)
+    # 上市时间不同：每个标的开头有不同长度的 NaN
+    listed = random.integers(0, bars // 2, symbols)
+    for i, begin in enumerate(listed):
+        close_prices[i, :begin] = high_prices[i, :begin] = low_prices[i, :begin] = volumes[i, :begin] = numpy.nan
+    return close_prices, high_prices, low_prices, volumes
+
+
+def per_symbol(close_prices, high_prices, low_prices, volumes):
+    for i in range(len(close_prices)):
+        indicator.ma_matrix(close_prices[i], CLOSE_MA_PERIODS)
+        indicator.ma_matrix(volumes[i], VOLUME_MA_PERIODS)
+        indicator.macd(close_prices[i])
+        indicator.stoch(high_prices[i], low_prices[i], close_prices[i])
+
+
+def whole_panel(close_prices, high_prices, low_prices, volumes):
+    return IndicatorPanel(
+        close_prices, high_prices, low_prices, volumes,
+        close_ma_periods=CLOSE_MA_PERIODS, volume_ma_periods=VOLUME_MA_PERIODS,
+    ).compute()
+
+
+def timeit(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main(symbols, bars, engine=None):
+    if engine is not None:
+        indicator.set_engine(engine)
+    data = make_panel(symbols, bars)
+    print("symbols=%d bars=%d engine=%s" % (symbols, bars, indicator.engine_name()))
+
+    indicator_cache.clear()
+    loop_seconds, _ = timeit(per_symbol, *data)
+    panel_seconds, panel = timeit(whole_panel, *data)
+    print("%-12s %8.3fs" % ("per-symbol", loop_seconds))
+    print("%-12s %8.3fs %7.1fx" % ("panel", panel_seconds, loop_seconds / panel_seconds))
+
+    # 抽查几个标的与逐个计算的结果一致
+    indicator_cache.clear()
+    for i in numpy.linspace(0, symbols - 1, 5).astype(int):
+        expected = indicator.macd(data[0][i])[2]
+        actual = panel.macd()[2][i]
+        assert numpy.array_equal(numpy.isnan(expected), numpy.isnan(actual))
+        assert numpy.allclose(expected[~numpy.isnan(expected)], actual[~numpy.isnan(actual)], rtol=1e-9, atol=1e-9)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 5000, int(args[1]) if len(args) > 1 else 250, args[2] if len(args) > 2 else None)
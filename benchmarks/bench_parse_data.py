@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+ProKline.parse_data 逐行解析与按列解析对比
+
+python -m benchmarks.bench_parse_data [rows ...]
+"""
+import sys
+import time
+
+import numpy
+import pandas
+
+from stock.kline.kline import ProKline
+
+__author__ = "Hao Luo"
+
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+
+
+def make_frame(rows, seed=0):
+    random = numpy.random.default_rng(seed)
+    close_prices = 10 + numpy.cumsum(random.normal(0, 0.1, rows))
+    open_prices = close_prices + random.normal(0, 0.05, rows)
+    return pandas.DataFrame({
+        "str_date": pandas.date_range("1990-01-01", periods=rows, freq="min").strftime("%Y-%m-%d %H:%M"),
+        "open_price": open_prices,
+        "close_price": close_prices,
+        "low_price": numpy.minimum(open_prices, close_prices) - 0.1,
+        "high_price": numpy.maximum(open_prices, close_prices) + 0.1,
+        "preclose_price": numpy.r_[close_prices[0], close_prices[:-1]],
+        "volume": random.integers(100, 100000, rows),
+    })
+
+
+def parse_data_iterrows(df):
+    """
+    原逐行解析实现，作为对照
+    """
+    str_dates = []
+    candlestick_y_data = []
+    volume_bar_y_data = []
+    for idx, item in df.iterrows():
+        str_dates.append(item["str_date"])
+        candlestick_y_data.append([
+            item["open_price"],
+            item["close_price"],
+            item["low_price"],
+            item["high_price"]
+        ])
+
+        change_state = 1
+        if item["close_price"] < item["preclose_price"]:
+            change_state = -1
+
+        volume_bar_y_data.append([idx, item["volume"], change_state])
+
+    return {
+        "str_dates": str_dates,
+        "candlestick_y_data": candlestick_y_data,
+        "volume_bar_y_data": volume_bar_y_data,
+    }
+
+
+def timeit(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main(sizes):
+    print("%10s %12s %12s %8s" % ("rows", "iterrows(s)", "columnar(s)", "speedup"))
+    for rows in sizes:
+        df = make_frame(rows)
+        legacy_seconds, legacy = timeit(parse_data_iterrows, df)
+        columnar_seconds, columnar = timeit(ProKline("BENCH", df).parse_data)
+        assert legacy["str_dates"] == columnar["str_dates"]
+        assert legacy["candlestick_y_data"] == columnar["candlestick_y_data"]
+        assert legacy["volume_bar_y_data"] == columnar["volume_bar_y_data"]
+        print("%10d %12.4f %12.4f %7.1fx" % (rows, legacy_seconds, columnar_seconds, legacy_seconds / columnar_seconds))
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
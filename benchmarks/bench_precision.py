@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+输出精度：完整精度与价格按最小变动价位、指标保留有效数字、去掉开头 NaN 的输出体积和耗时对比
+
+python -m benchmarks.bench_precision [rows [price_tick [digits]]]
+"""
+import sys
+import time
+
+from benchmarks.suite import synthetic_ohlcv
+from stock.kline.kline import Config, ProKline
+
+__author__ = "Hao Luo"
+
+
+def main(rows=100000, price_tick=0.01, digits=4):
+    df = synthetic_ohlcv(rows)
+    chart_df = df.iloc[:min(rows, 20000)]  # pyecharts 逐个构建较慢，只测前 2 万根
+    targets = {
+        "fast_inline": lambda: ProKline("BENCH", df).get_fast_chart(mode="inline").render_embed(),
+        "fast_dataset": lambda: ProKline("BENCH", df).get_fast_chart(mode="dataset").render_embed(),
+        "fast_binary": lambda: ProKline("BENCH", df).get_fast_chart(mode="binary").render_embed(),
+        "get_chart(%d)" % len(chart_df): lambda: ProKline("BENCH", chart_df).render_embed(),
+    }
+    settings = [
+        ("full", None, None, False),
+        ("rounded", price_tick, digits, False),
+        ("rounded+trim", price_tick, digits, True),
+    ]
+
+    print("%d bars, price_tick=%r, digits=%r" % (rows, price_tick, digits))
+    print("%-20s %-14s %10s %12s" % ("target", "precision", "seconds", "html(MB)"))
+    for name, func in targets.items():
+        for label, tick, indicator_digits, trim_nan in settings:
+            Config.PRICE_TICK, Config.INDICATOR_DIGITS, Config.TRIM_LEADING_NAN = tick, indicator_digits, trim_nan
+            start = time.perf_counter()
+            html = func()
+            seconds = time.perf_counter() - start
+            print("%-20s %-14s %10.3f %12.2f" % (name, label, seconds, len(html) / 1e6))
+    Config.PRICE_TICK, Config.INDICATOR_DIGITS, Config.TRIM_LEADING_NAN = None, None, False
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(*[convert(arg) for convert, arg in zip((int, float, int), args)])
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+重复渲染同一份K线：不缓存、内存缓存、磁盘缓存（新进程/内存未命中）对比
+
+python -m benchmarks.bench_render_cache [rows [repeats]]
+"""
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_parse_data import make_frame
+from stock.kline.cache import RenderCache
+from stock.kline.kline import ProKline
+
+__author__ = "Hao Luo"
+
+
+def timeit(func, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats
+
+
+def main(rows=20000, repeats=20):
+    df = make_frame(rows)
+    with tempfile.TemporaryDirectory() as directory:
+        memory = RenderCache()
+        disk = RenderCache(directory=directory)
+        chart = ProKline("BENCH", df)
+        chart.render_embed(use_cache=memory)
+        expected = chart.render_embed(use_cache=disk)
+
+        def from_disk():
+            disk.entries.clear()
+            disk.current_bytes = 0
+            return chart.render_embed(use_cache=disk)
+
+        assert from_disk() == expected
+        print("%-20s %12s" % ("", "seconds"))
+        print("%-20s %12.6f" % ("uncached", timeit(lambda: ProKline("BENCH", df).render_embed(), 1)))
+        print("%-20s %12.6f" % ("memory, new chart", timeit(lambda: ProKline("BENCH", df).render_embed(use_cache=memory), repeats)))
+        print("%-20s %12.6f" % ("memory, same chart", timeit(lambda: chart.render_embed(use_cache=memory), repeats)))
+        print("%-20s %12.6f" % ("disk, same chart", timeit(from_disk, repeats)))
+        print(memory.stats())
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
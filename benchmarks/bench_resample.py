@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+分钟K线转换为各周期：每个周期一次 pandas groupby 与 Resampler（首次合并、切换周期查表）对比
+
+python -m benchmarks.bench_resample [rows]
+"""
+import sys
+import time
+
+import numpy
+import pandas
+
+from benchmarks.suite import synthetic_ohlcv
+from stock.kline.resample import Resampler
+
+__author__ = "Hao Luo"
+
+
+TIMEFRAMES = ["5m", "15m", "30m", "60m", "day", "week", "month"]
+
+
+def groupby_keys(df):
+    """
+    与 resample.bucket_keys 相同的分段，分钟K线按开盘后的交易分钟数
+    """
+    times = pandas.to_datetime(df["str_date"], format="ISO8601")
+    minutes = times.dt.hour * 60 + times.dt.minute
+    elapsed = (minutes - 570).clip(0, 120) + (minutes - 780).clip(0, 120)
+    days = times.dt.normalize()
+    keys = {
+        "day": days,
+        "week": times.dt.to_period("W"),
+        "month": times.dt.to_period("M"),
+    }
+    for timeframe in TIMEFRAMES[:4]:
+        keys[timeframe] = [days, (elapsed - 1).clip(lower=0) // int(timeframe[:-1])]
+    return keys
+
+
+def groupby(df, keys):
+    return df.groupby(keys, sort=False).agg(
+        open_price=("open_price", "first"),
+        close_price=("close_price", "last"),
+        low_price=("low_price", "min"),
+        high_price=("high_price", "max"),
+        preclose_price=("preclose_price", "first"),
+        volume=("volume", "sum"),
+    )
+
+
+def main(rows=1000000):
+    df = synthetic_ohlcv(rows)
+
+    start = time.perf_counter()
+    keys = groupby_keys(df)
+    parse_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    resampler = Resampler(df)
+    init_seconds = time.perf_counter() - start
+    print("%d minute bars, parse dates: groupby %.3fs, Resampler %.3fs" % (rows, parse_seconds, init_seconds))
+
+    print("%-8s %8s %12s %12s %12s" % ("period", "bars", "groupby(s)", "first(s)", "cached(s)"))
+    for timeframe in TIMEFRAMES:
+        start = time.perf_counter()
+        expected = groupby(df, keys[timeframe])
+        groupby_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        columns = resampler.get(timeframe)
+        first_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        resampler.get(timeframe)
+        cached_seconds = time.perf_counter() - start
+
+        assert numpy.array_equal(expected["high_price"].to_numpy(), columns["high_prices"])
+        assert numpy.array_equal(expected["volume"].to_numpy(), columns["volumes"])
+        print("%-8s %8d %12.4f %12.4f %12.6f" % (timeframe, len(expected), groupby_seconds, first_seconds, cached_seconds))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+只显示最后一段K线：读入整个 CSV 再切片与从列式存储按日期取窗口对比
+
+python -m benchmarks.bench_store [rows [window]]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas
+
+from benchmarks.bench_parse_data import make_frame
+from stock.kline.kline import ProKline
+from stock.kline.store import OhlcvStore, convert_csv
+
+__author__ = "Hao Luo"
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def main(rows=2000000, window=5000):
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "bars.csv")
+        store_path = os.path.join(directory, "bars")
+        make_frame(rows).to_csv(csv_path, index=False)
+
+        seconds, peak, store = measure(lambda: convert_csv(csv_path, store_path, chunksize=500000))
+        print("convert  %d rows: %.2fs peak=%.1fMB" % (rows, seconds, peak / 1e6))
+        start_date = store.dates[-window].decode()
+
+        def from_csv():
+            df = pandas.read_csv(csv_path)
+            df = df[df["str_date"] >= start_date].reset_index(drop=True)
+            return ProKline("BENCH", df).get_fast_chart(mode="dataset").dump_options()
+
+        def from_store():
+            return ProKline("BENCH", OhlcvStore(store_path).window(start_date)).get_fast_chart(mode="dataset").dump_options()
+
+        csv_seconds, csv_peak, csv_options = measure(from_csv)
+        store_seconds, store_peak, store_options = measure(from_store)
+        assert csv_options == store_options
+        print("%-8s %10s %10s" % ("source", "seconds", "peak(MB)"))
+        print("%-8s %10.3f %10.1f" % ("csv", csv_seconds, csv_peak / 1e6))
+        print("%-8s %10.3f %10.1f" % ("store", store_seconds, store_peak / 1e6))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
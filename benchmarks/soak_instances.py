@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+反复创建图表，检查进程内存和各实例序列长度保持有界
+
+python -m benchmarks.soak_instances [charts] [rows]
+"""
+import gc
+import resource
+import sys
+
+from stock.kline.cache import indicator_cache
+from stock.kline.kline import Candlestick, MacdChart, ProKline, VolumeBar
+
+from .bench_parse_data import make_frame
+
+__author__ = "Hao Luo"
+
+
+MAX_RSS_GROWTH_BYTES = 64 * 1024 * 1024
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def build_chart(seed, rows):
+    df = make_frame(rows, seed=seed)
+    pro_kline = ProKline("SOAK%d" % seed, df)
+    data = pro_kline.parse_data()
+
+    candlestick = Candlestick("CANDLESTICK", data["str_dates"], data["candlestick_y_data"])
+    volume_bar = VolumeBar("VOLUME", data["str_dates"], data["volume_bar_y_data"])
+    macd_chart = MacdChart("MACD", data["str_dates"], data["close_prices"])
+    assert len(candlestick.y_close_prices) == rows
+    assert len(volume_bar.y_volumes) == rows
+    assert len(macd_chart.histogram_data) == rows
+
+    pro_kline.get_chart().dump_options()
+
+
+def main(charts, rows):
+    # 每个图表数据都不同，把指标缓存限制小一些，避免把缓存占用算作泄漏
+    indicator_cache.max_bytes = 4 * 1024 * 1024
+
+    warmup = min(100, charts)
+    for seed in range(warmup):
+        build_chart(seed, rows)
+    gc.collect()
+    baseline = rss_bytes()
+
+    for seed in range(warmup, charts):
+        build_chart(seed, rows)
+        if seed % 500 == 0:
+            gc.collect()
+            print("charts=%d rss=%.1fMB" % (seed, rss_bytes() / 1024 / 1024))
+
+    gc.collect()
+    growth = rss_bytes() - baseline
+    print("rss growth after %d charts: %.1fMB" % (charts, growth / 1024 / 1024))
+    assert growth < MAX_RSS_GROWTH_BYTES, "rss grew by %d bytes" % growth
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [3000, 500][len(args):]))
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+图表生成基准测试：各图表类在不同数据量、日线/分钟线下的耗时、峰值内存、输出字节数，
+结果保存为 JSON，两次结果对比时标出变慢、变大的项
+
+python -m benchmarks.suite run [--sizes 1000 10000 ...] [--large] [--profiles minute daily] [--targets ...] [--output results.json]
+python -m benchmarks.suite compare baseline.json current.json [--threshold 0.1]
+"""
+import argparse
+import datetime
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy
+import pandas
+
+from stock.kline import indicator
+from stock.kline.cache import indicator_cache
+from stock.kline.kline import PANELS, Candlestick, KdjLine, MacdChart, MaLine, ProKline, VolumeBar
+
+__author__ = "Hao Luo"
+
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+LARGE_SIZES = [1000000, 5000000]  # --large 时追加，单次运行需要数分钟、数 GB 内存
+PROFILES = ["minute", "daily"]
+DAILY_MAX_ROWS = 100000  # 日线超过这个数量已超出 pandas 的日期范围，也没有实际意义
+MINUTES_PER_DAY = 240  # A 股每个交易日 4 小时
+
+# ProKline(panels=...) 的面板组合；full 的目标名不带后缀，与之前的结果对比
+PANEL_SETS = {
+    "full": PANELS,
+    "ma": ["candlestick"],  # K线与收盘价均线
+    "macd": ["macd"],
+    "kdj": ["kdj"],
+}
+
+
+def trading_dates(rows, profile):
+    """
+    工作日日历；分钟线每天 9:30-11:30、13:00-15:00
+    """
+    if profile == "daily":
+        return pandas.bdate_range("1990-12-19", periods=rows).strftime("%Y-%m-%d").to_numpy()
+
+    days = pandas.bdate_range("1990-12-19", periods=(rows + MINUTES_PER_DAY - 1) // MINUTES_PER_DAY)
+    minutes = numpy.r_[numpy.arange(9 * 60 + 31, 11 * 60 + 31), numpy.arange(13 * 60 + 1, 15 * 60 + 1)]
+    times = pandas.to_timedelta(minutes, unit="min")
+    stamps = (days.to_numpy()[:, None] + times.to_numpy()[None, :]).ravel()[:rows]
+    return pandas.DatetimeIndex(stamps).strftime("%Y-%m-%d %H:%M").to_numpy()
+
+
+def synthetic_ohlcv(rows, profile="minute", seed=0):
+    """
+    几何布朗运动的收盘价，开盘价带跳空，成交量对数正态分布
+    :return: pandas.DataFrame，列与 ProKline 的 DataFrame 相同
+    """
+    random = numpy.random.default_rng(seed)
+    volatility = 0.02 if profile == "daily" else 0.002
+    close_prices = 10 * numpy.exp(numpy.cumsum(random.normal(0, volatility, rows)))
+    preclose_prices = numpy.r_[close_prices[0], close_prices[:-1]]
+    open_prices = preclose_prices * (1 + random.normal(0, volatility / 4, rows))
+    spread = numpy.abs(random.normal(0, volatility / 2, rows)) * close_prices
+    return pandas.DataFrame({
+        "str_date": trading_dates(rows, profile),
+        "open_price": open_prices.round(2),
+        "close_price": close_prices.round(2),
+        "low_price": (numpy.minimum(open_prices, close_prices) - spread).round(2),
+        "high_price": (numpy.maximum(open_prices, close_prices) + spread).round(2),
+        "preclose_price": preclose_prices.round(2),
+        "volume": random.lognormal(10, 1, rows).astype(numpy.int64),
+    })
+
+
+def output_size(chart):
+    return len(chart.dump_options())
+
+
+def targets(df):
+    """
+    :return: {name: 无参函数}，函数返回输出的字节数
+    """
+    data = ProKline("BENCH", df).parse_data()
+    str_dates = data["str_dates"]
+
+    result = {
+        "Candlestick": lambda: output_size(Candlestick("CANDLESTICK", str_dates, data["candlestick_y_data"]).get_chart()),
+        "VolumeBar": lambda: output_size(VolumeBar("VOLUME", str_dates, data["volume_bar_y_data"]).get_chart()),
+        "MaLine": lambda: output_size(MaLine("MA", str_dates, data["close_prices"]).get_chart()),
+        "MacdChart": lambda: output_size(MacdChart("MACD", str_dates, data["close_prices"]).get_chart()),
+        "KdjLine": lambda: output_size(KdjLine("KDJ", str_dates, data["high_prices"], data["low_prices"], data["close_prices"]).get_chart()),
+        "ProKline.get_chart": lambda: output_size(ProKline("BENCH", df).get_chart()),
+        "ProKline.render": lambda: len(ProKline("BENCH", df).render_embed()),
+        "ProKline.fast_dataset": lambda: output_size(ProKline("BENCH", df).get_fast_chart(mode="dataset")),
+    }
+    for set_name, panels in PANEL_SETS.items():
+        if set_name == "full":
+            continue
+        result["ProKline.get_chart[%s]" % set_name] = (
+            lambda panels=panels: output_size(ProKline("BENCH", df, panels=panels).get_chart()))
+        result["ProKline.fast_dataset[%s]" % set_name] = (
+            lambda panels=panels: output_size(ProKline("BENCH", df, panels=panels).get_fast_chart(mode="dataset")))
+    return result
+
+
+def measure(func, repeat):
+    """
+    耗时取多次中最快的一次；峰值内存单独跑一次，tracemalloc 会拖慢计时
+    每次前清空指标缓存，测的是冷启动
+    """
+    seconds = []
+    output_bytes = 0
+    for _ in range(repeat):
+        indicator_cache.clear()
+        gc.collect()
+        start = time.perf_counter()
+        output_bytes = func()
+        seconds.append(time.perf_counter() - start)
+
+    indicator_cache.clear()
+    gc.collect()
+    tracemalloc.start()
+    func()
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(seconds), peak_bytes, output_bytes
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+
+    import pyecharts
+    return {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "pyecharts": pyecharts.__version__,
+        "indicator_engine": indicator.engine_name(),
+    }
+
+
+def run(sizes, profiles, names, repeat):
+    results = []
+    print("%-8s %9s %-28s %10s %12s %12s" % ("profile", "rows", "target", "seconds", "peak(MB)", "output(MB)"))
+    for profile in profiles:
+        for rows in sizes:
+            if profile == "daily" and rows > DAILY_MAX_ROWS:
+                continue
+            df = synthetic_ohlcv(rows, profile)
+            for name, func in targets(df).items():
+                if names and name not in names:
+                    continue
+                seconds, peak_bytes, output_bytes = measure(func, repeat)
+                results.append({
+                    "profile": profile,
+                    "rows": rows,
+                    "target": name,
+                    "seconds": seconds,
+                    "peak_bytes": peak_bytes,
+                    "output_bytes": output_bytes,
+                })
+                print("%-8s %9d %-28s %10.4f %12.1f %12.1f" % (profile, rows, name, seconds, peak_bytes / 1e6, output_bytes / 1e6))
+    return {"environment": environment(), "results": results}
+
+
+def compare(baseline, current, threshold):
+    """
+    :param threshold: 耗时、峰值内存超过基线这个比例视为回退
+    :return: 回退项列表
+    """
+    base = {(item["profile"], item["rows"], item["target"]): item for item in baseline["results"]}
+    regressions = []
+    print("%-8s %9s %-28s %10s %10s %10s" % ("profile", "rows", "target", "seconds", "peak", "output"))
+    for item in current["results"]:
+        key = (item["profile"], item["rows"], item["target"])
+        old = base.get(key)
+        if old is None:
+            continue
+
+        ratios = {name: item[name] / max(old[name], 1e-12) for name in ("seconds", "peak_bytes", "output_bytes")}
+        flags = [name for name in ("seconds", "peak_bytes") if ratios[name] > 1 + threshold]
+        if item["output_bytes"] != old["output_bytes"]:
+            # 输出变化不一定是回退，但需要注意
+            flags.append("output_bytes")
+        print("%-8s %9d %-28s %9.2fx %9.2fx %9.2fx %s" % (
+            key + (ratios["seconds"], ratios["peak_bytes"], ratios["output_bytes"], " ".join(flags))))
+        if "seconds" in flags or "peak_bytes" in flags:
+            regressions.append((key, flags))
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="1000 到 5000000")
+    run_parser.add_argument("--large", action="store_true", help="追加 %s 行（仅分钟线）" % LARGE_SIZES)
+    run_parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=PROFILES)
+    run_parser.add_argument("--targets", nargs="+", default=None)
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--engine", choices=indicator.ENGINES, default=None)
+    run_parser.add_argument("--output", default=None, help="结果 JSON 文件")
+
+    compare_parser = commands.add_parser("compare")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        if args.engine:
+            indicator.set_engine(args.engine)
+        sizes = list(args.sizes)
+        if args.large:
+            sizes += [rows for rows in LARGE_SIZES if rows not in sizes]
+        report = run(sizes, args.profiles, args.targets, args.repeat)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=1)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print("%d regression(s) over %.0f%%" % (len(regressions), args.threshold * 100))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
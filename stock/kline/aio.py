@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio 接口：指标计算、选项构建、序列化放到有界的线程池执行，不阻塞事件循环
+同一 key 的并发请求合并为一次计算；全部等待方取消时，尚未开始的计算一并取消
+"""
+import asyncio
+import concurrent.futures
+import os
+
+__author__ = "Hao Luo"
+
+
+class AsyncRenderer:
+    """
+    并发请求合并与限流
+    正在执行的计算无法中断，全部等待方取消后其结果被丢弃（开启渲染缓存时仍会写入缓存）
+    pyecharts 构建选项是纯 Python，线程间会争用 GIL；CPU 核数多时可传入 ProcessPoolExecutor，
+    此时渲染缓存需启用磁盘一层才能在进程间共享
+    """
+    max_workers = 1
+    max_pending = 1
+
+    def __init__(self, max_workers=None, max_pending=None, executor=None):
+        """
+        :param max_workers: 线程数，默认 CPU 核数
+        :param max_pending: 同时排队和执行的计算数上限，超出时等待，默认 max_workers 的 4 倍
+        :param executor: 自定义 concurrent.futures.Executor，传入时 max_workers 不起作用
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.max_workers * 4
+        self.executor = executor
+        self.inflight = {}  # (loop, key) -> [asyncio.Future, 等待方数量]
+        self.semaphores = {}  # loop -> asyncio.Semaphore
+
+    def get_executor(self):
+        if self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(self.max_workers, thread_name_prefix="ucharts")
+        return self.executor
+
+    def get_semaphore(self, loop):
+        semaphore = self.semaphores.get(loop)
+        if semaphore is None:
+            # 顺便清理已关闭事件循环的信号量
+            self.semaphores = {item: value for item, value in self.semaphores.items() if not item.is_closed()}
+            semaphore = asyncio.Semaphore(self.max_pending)
+            self.semaphores[loop] = semaphore
+        return semaphore
+
+    async def call(self, func, *args):
+        """
+        在线程池执行 func，不合并
+        """
+        loop = asyncio.get_running_loop()
+        async with self.get_semaphore(loop):
+            return await loop.run_in_executor(self.get_executor(), func, *args)
+
+    async def run(self, key, func, *args):
+        """
+        同一 key 正在计算时等待其结果，否则提交新的计算
+        :param key: 可哈希的请求 key，相同 key 的计算结果须可以共享
+        """
+        loop = asyncio.get_running_loop()
+        entry = self.inflight.get((loop, key))
+        if entry is None:
+            future = asyncio.ensure_future(self.call(func, *args))
+            entry = [future, 0]
+            self.inflight[(loop, key)] = entry
+            future.add_done_callback(lambda _: self.discard(loop, key, entry))
+
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        except asyncio.CancelledError:
+            if not entry[0].done():
+                entry[1] -= 1
+                if entry[1] == 0:
+                    entry[0].cancel()
+                    self.discard(loop, key, entry)
+            raise
+
+    def discard(self, loop, key, entry):
+        if self.inflight.get((loop, key)) is entry:
+            del self.inflight[(loop, key)]
+
+    def shutdown(self, wait=True):
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait)
+            self.executor = None
+
+
+async_renderer = AsyncRenderer()
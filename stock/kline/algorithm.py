@@ -1,5 +1,383 @@
 # -*- coding: utf-8 -*-
+"""
+纯 NumPy 指标计算，语义与 talib 相同（包括开头的 NaN 预热段），没有安装 TA-Lib 时使用
+输入为 float64 一维数组，或二维面板（每行一个标的，沿最后一维为K线），按行独立计算：
+与 talib 一样跳过每行开头的 NaN，中间出现 NaN 后该行之后的结果都为 NaN
+例外：talib.WMA 每 8 * period 个输出重新求一次窗口和，窗口移过 NaN 后会在下一个重算点恢复出值，
+这里的 WMA（及 matype=2 的 STOCH）在中间 NaN 之后一直为 NaN；NaN 之前两者相同
+"""
 import decimal
 import math
 
+import numpy
+
 __author__ = "Hao Luo"
+
+
+SMA_BLOCK = 1024  # 分块前缀和的块长
+WMA_BLOCK = 256
+EMA_BLOCK = 64  # 分块递推的块长，块内用矩阵乘法，块间只递推一次
+MA_TYPES = (0, 1, 2)  # SMA、EMA、WMA，与 talib.MA_Type 的取值相同
+
+
+class Rows:
+    """
+    把输入整理成二维（每行一个标的），记录每行有效区间 [begins, ends)：
+    begins 为第一个有效值，ends 为其后第一个 NaN；区间外置 0，各指标在原位置上整块计算，
+    最后把每行预热段和区间外的结果置为 NaN
+    """
+    squeeze = False
+    begins = None  # (rows, 1)
+    ends = None  # (rows, 1)
+
+    def __init__(self, *arrays):
+        arrays = [numpy.asarray(values, dtype=numpy.float64) for values in arrays]
+        self.squeeze = arrays[0].ndim == 1
+        arrays = [values.reshape(1, -1) if self.squeeze else values for values in arrays]
+        rows, count = arrays[0].shape
+        self.count = count
+        self.positions = numpy.arange(count)
+
+        nan = numpy.isnan(arrays[0])
+        for values in arrays[1:]:
+            nan |= numpy.isnan(values)
+        if not nan.any():
+            self.begins = numpy.zeros((rows, 1), dtype=numpy.int64)
+            self.ends = numpy.full((rows, 1), count, dtype=numpy.int64)
+            self.arrays = arrays
+            return
+
+        # 各输入开头 NaN 的最大者为起点
+        begins = numpy.zeros(rows, dtype=numpy.int64)
+        for values in arrays:
+            valid = ~numpy.isnan(values)
+            begins = numpy.maximum(begins, numpy.where(valid.any(axis=1), valid.argmax(axis=1), count))
+        self.begins = begins[:, None]
+
+        broken = nan & (self.positions >= self.begins)
+        self.ends = numpy.where(broken.any(axis=1), broken.argmax(axis=1), count)[:, None]
+
+        outside = self.outside(0)
+        self.arrays = [numpy.where(outside, 0.0, values) for values in arrays]
+
+    def outside(self, lookback):
+        """
+        :return: 每行预热段（有效区间的前 lookback 个）及有效区间之外的位置
+        """
+        return (self.positions < self.begins + lookback) | (self.positions >= self.ends)
+
+    def clean(self, result, lookback):
+        """
+        预热段和区间外的中间结果置 0，避免影响后续的整块运算
+        """
+        result[self.outside(lookback)] = 0.0
+        return result
+
+    def finish(self, result, lookback):
+        """
+        :param result: 与输入的二维形式相同，会被原地修改
+        :param lookback: 每行有效区间的前 lookback 个结果为 NaN
+        """
+        result[self.outside(lookback)] = numpy.nan
+        return result[0] if self.squeeze else result
+
+    def window_at(self, values, offset, length):
+        """
+        每行从 begins + offset 开始的 length 个值，超出末尾的行取到的值没有意义
+        :return: (rows, length)
+        """
+        if self.count == 0:
+            return numpy.zeros((len(values), length))
+        indexes = numpy.minimum(self.begins + offset + numpy.arange(length), self.count - 1)
+        return numpy.take_along_axis(values, indexes, axis=1)
+
+    def seeded(self, values, offset, seeds, k):
+        """
+        以 seeds 为第 begins + offset 根的初值做 EMA 递推：该位置之前置 0，该位置放入 seeds / k，
+        递推一次即得每行在各自起点起算的 EMA
+        """
+        starts = self.begins + offset
+        result = numpy.where(self.positions > starts, values, 0.0)
+        inside = starts[:, 0] < self.count
+        result[inside, starts[inside, 0]] = seeds[inside] / k
+        return result
+
+
+def rows_mean(values):
+    return values.mean(axis=-1)
+
+
+def sma(values, period):
+    """
+    简单移动平均，前 period-1 个为 NaN
+    """
+    return ma_matrix(values, [period], matype=0)[0]
+
+
+def ema_recursive(values, k, initial=0.0):
+    """
+    沿最后一维 y[i] = y[i-1] + (values[i] - y[i-1]) * k，y[-1] = initial
+    按 EMA_BLOCK 分块：块内以零为初值用矩阵乘法一次算出，再把上一块的末值按衰减叠加上去
+    :param values: 无 NaN 的二维数组
+    :param initial: 每行的初值
+    """
+    rows, count = values.shape
+    if count == 0:
+        return numpy.empty((rows, 0))
+
+    decay = 1.0 - k
+    block = min(EMA_BLOCK, count)
+    blocks = (count + block - 1) // block
+    padded = numpy.zeros((rows, blocks * block))
+    padded[:, :count] = values
+    padded = padded.reshape(rows, blocks, block)
+
+    lags = numpy.arange(block)[:, None] - numpy.arange(block)[None, :]
+    weights = numpy.where(lags >= 0, k * decay ** numpy.maximum(lags, 0), 0.0)
+    partial = padded @ weights.T
+
+    powers = decay ** numpy.arange(1, block + 1)
+    carries = numpy.empty((rows, blocks))
+    carries[:, 0] = initial
+    if blocks > 1:
+        # 块末值之间同样是一阶递推 carry = last + decay^block * carry，再按同样的方法分块计算
+        block_k = 1.0 - powers[-1]
+        carries[:, 1:] = ema_recursive(partial[:, :-1, -1] / block_k, block_k, carries[:, 0])
+
+    return (partial + carries[:, :, None] * powers).reshape(rows, -1)[:, :count]
+
+
+def ema_rows(values, period, rows, offset=0):
+    """
+    与 talib.EMA 一致：每行在有效区间第 offset + period 根以前 period 根的简单平均起算
+    :param values: Rows 整理后的二维数组，有效区间从 rows.begins + offset 开始
+    """
+    k = 2.0 / (period + 1)
+    seeds = rows_mean(rows.window_at(values, offset, period))
+    return ema_recursive(rows.seeded(values, offset + period - 1, seeds, k), k)
+
+
+def ema(values, period):
+    """
+    指数移动平均，与 talib.EMA 一致
+    """
+    return ma_matrix(values, [period], matype=1)[0]
+
+
+def wma(values, period):
+    """
+    加权移动平均，与 talib.WMA 一致：最新一根权重为 period，最早一根为 1
+    中间出现 NaN 后之后都为 NaN，talib.WMA 则会在窗口移过 NaN 后的某个重算点恢复出值
+    """
+    return ma_matrix(values, [period], matype=2)[0]
+
+
+def ma(values, timeperiod, matype=0):
+    """
+    :param matype: 0 SMA，1 EMA，2 WMA，与 talib.MA_Type 相同
+    """
+    return ma_matrix(values, [timeperiod], matype=matype)[0]
+
+
+def block_prefix_sums(values, max_period, block, weighted=False):
+    """
+    沿最后一维分块的前缀和，所有周期共用：第 k 块覆盖以 [k*block, (k+1)*block) 结尾的窗口，
+    块内下标 j 结尾、长度为 p 的窗口和为 prefix[..., max_period + j] - prefix[..., max_period - p + j] + p * reference
+    每块先减去块内第一根的值再累加，前缀和的量级只取决于块内的波动
+    :param weighted: 同时返回按块内位置加权的前缀和，用于 WMA
+    :return: (reference, prefix, weighted_prefix)，prefix 形状为 (rows, blocks, block + max_period)，首列为 0
+    """
+    rows, count = values.shape
+    blocks = (count + block - 1) // block
+    padded = numpy.zeros((rows, blocks * block + max_period))
+    # 前面补 max_period - 1 个 0，后面补齐整块
+    padded[:, max_period - 1:max_period - 1 + count] = values
+
+    windows = numpy.lib.stride_tricks.sliding_window_view(padded, block + max_period - 1, axis=1)[:, ::block][:, :blocks]
+    reference = windows[:, :, max_period - 1:max_period].copy()
+    windows = windows - reference
+    prefix = numpy.zeros((rows, blocks, block + max_period))
+    numpy.cumsum(windows, axis=2, out=prefix[:, :, 1:])
+
+    weighted_prefix = None
+    if weighted:
+        positions = numpy.arange(block + max_period - 1, dtype=numpy.float64)
+        weighted_prefix = numpy.zeros_like(prefix)
+        numpy.cumsum(windows * positions, axis=2, out=weighted_prefix[:, :, 1:])
+    return reference, prefix, weighted_prefix
+
+
+def window_averages(values, periods, weighted=False):
+    """
+    同一份分块前缀和上计算多个周期的 SMA 或 WMA
+    :param values: 按行对齐的二维数组
+    :return: {period: 以各下标结尾的窗口均值}，每行前 period-1 个没有意义
+    """
+    rows, count = values.shape
+    max_period = max(periods)
+    # 加权前缀和的量级随块长平方增长，WMA 用较短的块
+    block = max(min(WMA_BLOCK if weighted else SMA_BLOCK, count), max_period)
+    reference, prefix, weighted_prefix = block_prefix_sums(values, max_period, block, weighted)
+
+    result = {}
+    for period in periods:
+        lower = max_period - period
+        sums = numpy.subtract(prefix[:, :, max_period:max_period + block], prefix[:, :, lower:lower + block])
+        if weighted:
+            # 窗口内第一根的块内位置为 lower + j，权重从 1 开始
+            sums *= -(numpy.arange(block) + (lower - 1))
+            sums += weighted_prefix[:, :, max_period:max_period + block]
+            sums -= weighted_prefix[:, :, lower:lower + block]
+            sums /= period * (period + 1) / 2.0
+        else:
+            sums /= period
+        sums += reference
+        result[period] = sums.reshape(rows, -1)[:, :count]
+    return result
+
+
+def check_matype(matype):
+    """
+    只实现了 SMA、EMA、WMA，其它均线类型（DEMA、KAMA 等）需要 talib 引擎
+    """
+    if matype not in MA_TYPES:
+        raise ValueError("matype %r is not supported without talib, expected one of %s" % (matype, MA_TYPES))
+
+
+def ma_rows(values, periods, matype, rows, offset=0):
+    """
+    多条均线，SMA、WMA 不依赖起点，EMA 按每行的起点起算
+    :param values: Rows 整理后的二维数组，有效区间从 rows.begins + offset 开始
+    :return: {period: 二维数组}，每行预热段的值没有意义
+    """
+    count = values.shape[1]
+    valid_periods = sorted(set(period for period in periods if 1 < period <= count))
+    averages = {}
+    if matype == 1:
+        for period in valid_periods:
+            averages[period] = ema_rows(values, period, rows, offset)
+    elif matype == 2:
+        groups = {}
+        for period in valid_periods:
+            groups.setdefault(max(WMA_BLOCK, 4 ** int(math.ceil(math.log(period, 4)))), []).append(period)
+        for group in groups.values():
+            averages.update(window_averages(values, group, weighted=True))
+    elif valid_periods:
+        averages = window_averages(values, valid_periods)
+
+    if 1 in periods:
+        averages[1] = values.copy()
+    return averages
+
+
+def ma_matrix(values, periods, matype=0):
+    """
+    一次计算多条均线：SMA 所有周期共用同一份前缀和，每多一条均线只多几次整列运算；
+    WMA 按周期量级（4 的幂）分组共用前缀和，控制加权前缀和的误差
+    与逐条调用 ma 的结果相同（含开头的 NaN 预热段）
+    :param periods: 周期列表
+    :param matype: 0 SMA，1 EMA，2 WMA
+    :return: numpy.ndarray，形状为 (len(periods),) + values.shape
+    """
+    check_matype(matype)
+
+    periods = [int(period) for period in periods]
+    raw = numpy.asarray(values, dtype=numpy.float64)
+    rows = Rows(raw)
+    averages = ma_rows(rows.arrays[0], periods, matype, rows)
+
+    result = numpy.empty((len(periods),) + raw.shape)
+    for i, period in enumerate(periods):
+        if period == 1:
+            # 与 talib.MA 相同，1 日均线原样返回输入
+            result[i] = raw
+        elif period in averages:
+            result[i] = rows.finish(averages[period], period - 1)
+        else:
+            result[i] = numpy.nan
+    return result
+
+
+def macd(close_prices, fastperiod=12, slowperiod=26, signalperiod=9):
+    """
+    与 talib.MACD 一致：慢线在第 slowperiod 根以简单平均起算，快线在同一根以最近 fastperiod 根的平均起算，
+    DEA 以前 signalperiod 个 DIF 的平均起算，三条线都从第 slowperiod + signalperiod - 1 根开始有值
+    :return: (macd_dif, macd_signal, macd_hist)
+    """
+    if slowperiod < fastperiod:
+        fastperiod, slowperiod = slowperiod, fastperiod
+
+    rows = Rows(close_prices)
+    values = rows.arrays[0]
+    lookback = slowperiod - 1 + signalperiod - 1
+
+    warmup = rows.window_at(values, 0, slowperiod)
+    slow_k = 2.0 / (slowperiod + 1)
+    fast_k = 2.0 / (fastperiod + 1)
+    slow = ema_recursive(rows.seeded(values, slowperiod - 1, rows_mean(warmup), slow_k), slow_k)
+    fast = ema_recursive(rows.seeded(values, slowperiod - 1, rows_mean(warmup[:, -fastperiod:]), fast_k), fast_k)
+    dif = fast - slow
+
+    signal_k = 2.0 / (signalperiod + 1)
+    signal_seeds = rows_mean(rows.window_at(dif, slowperiod - 1, signalperiod))
+    dea = ema_recursive(rows.seeded(dif, lookback, signal_seeds, signal_k), signal_k)
+
+    dif = rows.finish(dif, lookback)
+    dea = rows.finish(dea, lookback)
+    return dif, dea, dif - dea
+
+
+def rolling_reduce(ufunc, values, period):
+    """
+    沿最后一维的滑动窗口最大/最小值：窗口内逐个错位比较，每次都是连续内存上的整列运算
+    :return: 最后一维长度为 count - period + 1，第 i 个为 values[..., i:i+period] 上的结果
+    """
+    count = values.shape[-1] - period + 1
+    result = values[..., :count].copy()
+    for offset in range(1, period):
+        ufunc(result, values[..., offset:offset + count], out=result)
+    return result
+
+
+def rolling_max(values, period):
+    return rolling_reduce(numpy.maximum, values, period)
+
+
+def rolling_min(values, period):
+    return rolling_reduce(numpy.minimum, values, period)
+
+
+def stoch(high_prices, low_prices, close_prices, fastk_period=5, slowk_period=3, slowk_matype=0, slowd_period=3, slowd_matype=0):
+    """
+    慢速随机指标，与 talib.STOCH 一致：最高最低价相等时 fastK 为 0，
+    slowK、slowD 都从第 fastk_period + slowk_period + slowd_period - 2 根开始有值
+    :return: (slow_k, slow_d)
+    """
+    check_matype(slowk_matype)
+    check_matype(slowd_matype)
+    rows = Rows(high_prices, low_prices, close_prices)
+    high_prices, low_prices, close_prices = rows.arrays
+    lookback = fastk_period - 1 + slowk_period - 1 + slowd_period - 1
+    if rows.count < fastk_period:
+        nan = numpy.full(high_prices.shape, numpy.nan)
+        return rows.finish(nan, lookback), rows.finish(nan.copy(), lookback)
+
+    highest = rolling_max(high_prices, fastk_period)
+    lowest = rolling_min(low_prices, fastk_period)
+    diff = (highest - lowest) / 100.0
+    numerator = close_prices[:, fastk_period - 1:] - lowest
+    fast_k = numpy.zeros(close_prices.shape)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        fast_k[:, fastk_period - 1:] = numpy.where(diff != 0, numerator / diff, 0.0)
+    rows.clean(fast_k, fastk_period - 1)
+
+    slow_k = ma_rows(fast_k, [slowk_period], slowk_matype, rows, fastk_period - 1)[slowk_period]
+    rows.clean(slow_k, fastk_period + slowk_period - 2)
+    slow_d = ma_rows(slow_k, [slowd_period], slowd_matype, rows, fastk_period + slowk_period - 2)[slowd_period]
+    return rows.finish(slow_k, lookback), rows.finish(slow_d, lookback)
+
+
+# 与 talib 同名的入口，indicator 按所选引擎调用
+MA = ma
+MACD = macd
+STOCH = stoch
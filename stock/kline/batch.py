@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+批量生成 ProKline 图表：多进程并行，逐个写盘，单个标的失败（包括工作进程崩溃）不影响其它标的
+"""
+import collections
+import concurrent.futures
+import concurrent.futures.process
+import os
+import re
+import time
+import traceback
+
+from .lazy import LazyModule
+
+__author__ = "Hao Luo"
+
+
+pandas = LazyModule("pandas")
+
+BatchResult = collections.namedtuple("BatchResult", ["title", "path", "rows", "seconds", "error"])
+
+
+class BatchReport:
+    total = 0
+    succeeded = 0
+    rows = 0
+    seconds = 0.0
+    failures = None  # [BatchResult]
+
+    def __init__(self):
+        self.failures = []
+
+    def add(self, result):
+        self.total += 1
+        if result.error is None:
+            self.succeeded += 1
+            self.rows += result.rows
+        else:
+            self.failures.append(result)
+
+    @property
+    def charts_per_second(self):
+        return self.total / self.seconds if self.seconds else 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return "charts=%d succeeded=%d failed=%d seconds=%.2f charts/s=%.1f rows/s=%.0f" % (
+            self.total, self.succeeded, len(self.failures), self.seconds, self.charts_per_second, self.rows_per_second)
+
+
+def load_frame(path):
+    """
+    按扩展名读取 csv / parquet / pickle，列需与 ProKline 的 DataFrame 相同
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        return pandas.read_parquet(path)
+    elif ext in (".pkl", ".pickle"):
+        return pandas.read_pickle(path)
+    return pandas.read_csv(path)
+
+
+def file_name(title, index):
+    """
+    标题中的特殊字符替换为 _，再加上任务序号：相同或只差特殊字符的标题（如 "600000.SH" 与 "600000 SH"）不会互相覆盖
+    """
+    return "%s_%d" % (re.sub(r"[^\w.-]+", "_", str(title)).strip("_") or "chart", index)
+
+
+def init_worker():
+    """
+    每个进程启动时预先导入并渲染一次小图，之后的图表复用已编译的模板
+    """
+    from .data import sample_frame
+    from .kline import ProKline
+    ProKline("WARMUP", sample_frame()).get_chart().render_embed()
+
+
+def render_job(job):
+    """
+    :param job: (index, title, DataFrame 或文件路径, output_dir, output_format)，index 为任务序号
+    """
+    from .kline import ProKline
+
+    index, title, source, output_dir, output_format = job
+    start = time.perf_counter()
+    try:
+        df = load_frame(source) if isinstance(source, str) else source
+        chart = ProKline(title, df).get_chart()
+        if output_format == "json":
+            path = os.path.join(output_dir, file_name(title, index) + ".json")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(chart.dump_options_with_quotes())
+        else:
+            path = os.path.join(output_dir, file_name(title, index) + ".html")
+            chart.render(path)
+        return BatchResult(title, path, len(df), time.perf_counter() - start, None)
+    except Exception:
+        return BatchResult(title, None, 0, time.perf_counter() - start, traceback.format_exc())
+
+
+def render_batch(jobs, output_dir, workers=None, output_format="html", on_result=None):
+    """
+    :param jobs: 可迭代的 (title, DataFrame 或文件路径)
+    :param output_dir: 输出目录，文件名为 标题_序号.html，序号为该任务在 jobs 中的位置
+    :param workers: 进程数，默认 CPU 核数
+    :param output_format: html 或 json
+    :param on_result: 每完成一个标的回调一次，参数为 BatchResult
+    :return: BatchReport
+    进程崩溃（段错误、被 OOM killer 杀掉等）时进程池整个不可用，见 collect：
+    重建进程池，把当时在途的任务逐个重跑，再次崩溃的记为失败，其余标的继续
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 2  # 限制在途任务数，避免一次性把所有 DataFrame 序列化进队列
+
+    report = BatchReport()
+    start = time.perf_counter()
+    pool = WorkerPool(workers)
+    try:
+        pending = {}  # {future: job}
+        for index, (title, source) in enumerate(jobs):
+            job = (index, title, source, output_dir, output_format)
+            try:
+                future = pool.executor.submit(render_job, job)
+            except concurrent.futures.process.BrokenProcessPool:
+                # 在途任务中有进程刚崩溃，先按 collect 处理它们并重建进程池
+                concurrent.futures.wait(pending)
+                collect(list(pending), pending, pool, report, on_result)
+                future = pool.executor.submit(render_job, job)
+            pending[future] = job
+            if len(pending) >= max_pending:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                collect(done, pending, pool, report, on_result)
+
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            collect(done, pending, pool, report, on_result)
+    finally:
+        pool.shutdown()
+
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+class WorkerPool:
+    """
+    可重建的进程池，进程崩溃后 ProcessPoolExecutor 不能再提交任务
+    """
+    workers = 1
+    executor = None
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+
+    def restart(self):
+        self.shutdown()
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+    def run_alone(self, job):
+        """
+        在进程池中单独运行一个任务；进程崩溃时记为该任务失败，并重建进程池
+        """
+        start = time.perf_counter()
+        try:
+            return self.executor.submit(render_job, job).result()
+        except concurrent.futures.process.BrokenProcessPool:
+            self.restart()
+            return BatchResult(job[1], None, 0, time.perf_counter() - start, traceback.format_exc())
+
+
+def collect(done, pending, pool, report, on_result):
+    """
+    汇总已完成的任务，并从 pending 中移除
+    进程崩溃时无法知道是哪个任务引起的：等在途任务全部结束，重建进程池，
+    把因崩溃没有结果的任务逐个单独重跑，只有单独运行仍崩溃的任务记为失败
+    """
+    broken = drain(done, pending, report, on_result)
+    if not broken:
+        return
+
+    concurrent.futures.wait(pending)
+    broken += drain(list(pending), pending, report, on_result)
+    pool.restart()
+    for job in sorted(broken, key=lambda item: item[0]):
+        add_result(pool.run_alone(job), report, on_result)
+
+
+def drain(futures, pending, report, on_result):
+    """
+    :return: 因进程崩溃没有结果的任务
+    """
+    broken = []
+    for future in futures:
+        job = pending.pop(future)
+        try:
+            add_result(future.result(), report, on_result)
+        except concurrent.futures.process.BrokenProcessPool:
+            broken.append(job)
+    return broken
+
+
+def add_result(result, report, on_result):
+    report.add(result)
+    if on_result is not None:
+        on_result(result)
@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+import collections
+import hashlib
+import os
+import threading
+import weakref
+
+import numpy
+
+from . import metrics
+
+__author__ = "Hao Luo"
+
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def freeze(values, copy=True):
+    """
+    转换为只读的连续float64数组。只读数组的内容哈希会按对象缓存，不必重复计算
+    :param copy: 输入可能被调用方继续修改时需要复制；新计算出的数组可直接置为只读
+    """
+    values = numpy.ascontiguousarray(values, dtype=numpy.float64)
+    if values.flags.writeable:
+        if copy:
+            values = values.copy()
+        values.setflags(write=False)
+    return values
+
+
+class SeriesKeys:
+    """
+    序列内容哈希。只读数组按对象缓存哈希值，可写数组每次重新计算
+    """
+
+    def __init__(self):
+        self.keys = {}  # id -> (weakref, key)
+        self.lock = threading.Lock()
+
+    def get(self, values):
+        if isinstance(values, numpy.ndarray) and not values.flags.writeable:
+            with self.lock:
+                item = self.keys.get(id(values))
+                if item is not None and item[0]() is values:
+                    return item[1]
+
+            key = self.compute(values)
+            with self.lock:
+                self.keys[id(values)] = (weakref.ref(values, self._discard(id(values))), key)
+            return key
+
+        return self.compute(numpy.ascontiguousarray(values, dtype=numpy.float64))
+
+    def _discard(self, values_id):
+        def callback(ref):
+            with self.lock:
+                item = self.keys.get(values_id)
+                if item is not None and item[0] is ref:
+                    del self.keys[values_id]
+        return callback
+
+    @staticmethod
+    def compute(values):
+        values = numpy.ascontiguousarray(values)
+        digest = hashlib.blake2b(memoryview(values).cast("B"), digest_size=16).hexdigest()
+        return "%s:%s:%s" % (values.dtype.str, values.shape, digest)
+
+
+def nbytes_of(value):
+    if isinstance(value, tuple):
+        return sum(nbytes_of(item) for item in value)
+    return getattr(value, "nbytes", 0)
+
+
+class IndicatorCache:
+    """
+    指标计算缓存
+    key 为 (指标名, 参数, 输入序列的内容哈希)，按LRU淘汰，总占用不超过 max_bytes
+    """
+    max_bytes = DEFAULT_MAX_BYTES
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()  # key -> (value, nbytes)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.series_keys = SeriesKeys()
+        self.lock = threading.RLock()
+
+    def make_key(self, name, params, inputs):
+        return (name, tuple(params), tuple(self.series_keys.get(values) for values in inputs))
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value):
+        nbytes = nbytes_of(value)
+        with self.lock:
+            if key in self.entries:
+                self.current_bytes -= self.entries.pop(key)[1]
+
+            if nbytes > self.max_bytes:
+                return
+
+            self.entries[key] = (value, nbytes)
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self.entries.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+
+    def get_or_compute(self, name, params, inputs, compute):
+        """
+        :param name: 指标名，如 MA、MACD
+        :param params: 指标参数
+        :param inputs: 输入序列
+        :param compute: 无参函数，未命中时调用
+        """
+        key = self.make_key(name, params, inputs)
+        value = self.get(key)
+        if value is None:
+            with metrics.stage("indicator." + name, rows=len(inputs[0]) if inputs else None):
+                value = compute()
+            if isinstance(value, tuple):
+                value = tuple(freeze(item, copy=False) for item in value)
+            else:
+                value = freeze(value, copy=False)
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+
+indicator_cache = IndicatorCache()
+
+
+DEFAULT_DISK_BYTES = 1024 * 1024 * 1024
+
+
+def content_key(*parts):
+    """
+    由输入数据的哈希、配置等组成的缓存 key，各部分需有稳定的 repr
+    """
+    return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def scan_directory(directory):
+    """
+    :return: [(mtime, key, nbytes)]，按修改时间从旧到新
+    """
+    files = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".html"):
+            try:
+                stat = entry.stat()
+            except OSError:
+                # 扫描途中被其它进程删除
+                continue
+            files.append((stat.st_mtime_ns, entry.name[:-5], stat.st_size))
+    return sorted(files)
+
+
+class RenderCache:
+    """
+    渲染结果（HTML/JSON 文本）缓存，占用按 UTF-8 编码后的字节数计算
+    内存一层按LRU淘汰，总占用不超过 max_bytes；
+    设置 directory 后增加磁盘一层，可在多个进程间共享：未命中时直接查找文件，其它进程写入的结果同样命中；
+    每次写入后扫描目录，按文件修改时间（命中时更新）淘汰，整个目录的总占用不超过 max_disk_bytes，
+    多个进程共用一个目录时同样有效
+    文件读写不持有 lock，lock 只保护内存中的表
+    """
+    max_bytes = DEFAULT_MAX_BYTES
+    directory = None
+    max_disk_bytes = DEFAULT_DISK_BYTES
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, directory=None, max_disk_bytes=DEFAULT_DISK_BYTES):
+        self.entries = collections.OrderedDict()  # key -> (text, nbytes)
+        self.current_bytes = 0
+        self.disk_entries = collections.OrderedDict()  # key -> nbytes，最近一次扫描目录的结果
+        self.disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+        self.configure(max_bytes, directory, max_disk_bytes)
+
+    def configure(self, max_bytes=None, directory=None, max_disk_bytes=None):
+        """
+        修改容量或启用磁盘一层，已有的磁盘文件按修改时间载入淘汰顺序
+        """
+        if directory is not None and directory != self.directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self.lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if max_disk_bytes is not None:
+                self.max_disk_bytes = max_disk_bytes
+            if directory is not None and directory != self.directory:
+                self.directory = directory
+                self.disk_entries.clear()
+                self.disk_bytes = 0
+            self._evict_memory()
+            directory = self.directory
+
+        if directory is not None:
+            self.evict_disk(directory)
+
+    def disk_path(self, key, directory=None):
+        return os.path.join(directory or self.directory, key + ".html")
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            directory = self.directory
+
+        if directory is not None:
+            path = self.disk_path(key, directory)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                # 修改时间即最近使用时间，各进程按它淘汰
+                os.utime(path)
+            except OSError:
+                # 没有写入过，或已被淘汰
+                data = None
+
+            with self.lock:
+                if data is None:
+                    if key in self.disk_entries:
+                        self.disk_bytes -= self.disk_entries.pop(key)
+                else:
+                    text = data.decode("utf-8")
+                    self._put_disk_entry(key, len(data))
+                    self._put_memory(key, text, len(data))
+                    self.disk_hits += 1
+                    self._evict_memory()
+                    return text
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, text):
+        data = text.encode("utf-8")
+        with self.lock:
+            self._put_memory(key, text, len(data))
+            self._evict_memory()
+            directory = self.directory
+
+        if directory is not None:
+            path = self.disk_path(key, directory)
+            temp_path = "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            self.evict_disk(directory)
+
+    def evict_disk(self, directory):
+        """
+        扫描目录，按修改时间从旧到新删除，直到目录总占用不超过 max_disk_bytes；
+        统计的是整个目录，包括其它进程写入的文件
+        """
+        files = scan_directory(directory)
+        disk_bytes = sum(nbytes for _, _, nbytes in files)
+        removed = 0
+        while removed < len(files) and disk_bytes > self.max_disk_bytes:
+            _, key, nbytes = files[removed]
+            try:
+                os.remove(self.disk_path(key, directory))
+            except OSError:
+                pass
+            disk_bytes -= nbytes
+            removed += 1
+
+        with self.lock:
+            if directory == self.directory:
+                self.disk_entries = collections.OrderedDict((key, nbytes) for _, key, nbytes in files[removed:])
+                self.disk_bytes = disk_bytes
+
+    def _put_memory(self, key, text, nbytes):
+        if key in self.entries:
+            self.current_bytes -= self.entries.pop(key)[1]
+        if nbytes <= self.max_bytes:
+            self.entries[key] = (text, nbytes)
+            self.current_bytes += nbytes
+
+    def _put_disk_entry(self, key, nbytes):
+        if key in self.disk_entries:
+            self.disk_bytes -= self.disk_entries.pop(key)
+        self.disk_entries[key] = nbytes
+        self.disk_bytes += nbytes
+
+    def _evict_memory(self):
+        while self.current_bytes > self.max_bytes:
+            _, (_, nbytes) = self.entries.popitem(last=False)
+            self.current_bytes -= nbytes
+
+    def get_or_render(self, key, render):
+        """
+        :param render: 无参函数，未命中时调用，返回文本
+        """
+        text = self.get(key)
+        if text is None:
+            text = render()
+            self.put(key, text)
+        return text
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self.entries),
+                "bytes": self.current_bytes,
+                "disk_entries": len(self.disk_entries),
+                "disk_bytes": self.disk_bytes,
+            }
+
+    def clear(self):
+        """
+        清空内存一层和计数，磁盘文件保留
+        """
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+            self.hits = 0
+            self.disk_hits = 0
+            self.misses = 0
+
+
+render_cache = RenderCache()
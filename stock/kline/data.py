@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+import hashlib
+
+import numpy
+
+from .lazy import LazyModule
+
+__author__ = "Hao Luo"
+
+
+pandas = LazyModule("pandas")
+
+COLUMNS = ["str_date", "open_price", "close_price", "low_price", "high_price", "preclose_price", "volume"]
+PRICE_COLUMNS = ["open_price", "close_price", "low_price", "high_price", "preclose_price"]
+
+
+def parse_columns(df):
+    """
+    按列解析K线数据，一次性生成蜡烛矩阵、涨跌状态和成交量数组
+    :param df: pandas.DataFrame
+    columes str_date、open_price、close_price、low_price、high_price、preclose_price、volume
+    也可以是 store.StoreWindow（直接引用磁盘上的列）或 Bars（内存中的列）
+    :return: dict of numpy.ndarray
+    """
+    if hasattr(df, "parse_columns"):
+        return df.parse_columns()
+
+    return build_columns(
+        df.index.to_numpy(),
+        df["str_date"].to_numpy(),
+        *[df[name].to_numpy(dtype=numpy.float64) for name in PRICE_COLUMNS],
+        df["volume"].to_numpy()
+    )
+
+
+def build_columns(indexes, str_dates, open_prices, close_prices, low_prices, high_prices, preclose_prices, volumes):
+    """
+    由各列组成 parse_columns 的返回，价格列需为 float64
+    """
+    # [[open_price, close_price, low_price, high_price]]
+    candles = numpy.column_stack((open_prices, close_prices, low_prices, high_prices))
+
+    # 收盘价低于昨收为-1，否则为1（与逐行判断一致，NaN视为1）
+    change_states = numpy.where(close_prices < preclose_prices, -1, 1).astype(numpy.int8)
+
+    return {
+        "indexes": indexes,
+        "str_dates": str_dates,
+        "open_prices": open_prices,
+        "close_prices": close_prices,
+        "low_prices": low_prices,
+        "high_prices": high_prices,
+        "preclose_prices": preclose_prices,
+        "volumes": volumes,
+        "candles": candles,
+        "change_states": change_states,
+    }
+
+
+def frame_digest(df):
+    """
+    K线数据的内容哈希，用作渲染缓存 key 的一部分
+    store.StoreWindow 不读数据，按存储路径、版本和行区间计算
+    """
+    if hasattr(df, "parse_columns"):
+        return df.digest()
+    return columns_digest(df.index.to_numpy(), [df[name].to_numpy() for name in COLUMNS])
+
+
+def index_bytes(indexes):
+    """
+    行索引的字节表示：整数索引按 int64，其它数值、时间索引按原类型，字符串等对象索引按文本
+    """
+    indexes = numpy.asarray(indexes)
+    if indexes.dtype.kind in "biu":
+        return numpy.ascontiguousarray(indexes, dtype=numpy.int64).tobytes()
+    if indexes.dtype.kind in "fcmM":
+        return indexes.dtype.str.encode("ascii") + numpy.ascontiguousarray(indexes).tobytes()
+    return b"O" + "\n".join(map(repr, indexes.tolist())).encode("utf-8")
+
+
+def columns_digest(indexes, values_list):
+    """
+    :param values_list: 按 COLUMNS 顺序的各列，第一列为日期字符串
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(index_bytes(indexes))
+    digest.update("\n".join(map(str, values_list[0])).encode("utf-8"))
+    for values in values_list[1:]:
+        values = numpy.asarray(values)
+        digest.update(values.dtype.str.encode("ascii"))
+        digest.update(numpy.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()
+
+
+class Bars:
+    """
+    内存中的列式K线，可直接作为 ProKline 的 df，不经过 DataFrame
+    价格列可以是 float32 以节省内存，解析时转为 float64 并按 decimals 四舍五入，去掉 float32 的尾差
+    """
+    columns = None  # {name: numpy.ndarray}，name 同 COLUMNS
+    decimals = None
+
+    def __init__(self, columns, decimals=None):
+        """
+        :param columns: {name: 一维数组}，需包含 COLUMNS 的全部列且等长
+        :param decimals: 价格的小数位数，None 为不四舍五入
+        """
+        missing = [name for name in COLUMNS if name not in columns]
+        if missing:
+            raise ValueError("missing columns: %s" % missing)
+        self.columns = {name: numpy.asarray(columns[name]) for name in COLUMNS}
+        lengths = set(len(values) for values in self.columns.values())
+        if len(lengths) > 1:
+            raise ValueError("columns have different lengths: %s" % sorted(lengths))
+        self.decimals = decimals
+
+    def __len__(self):
+        return len(self.columns["close_price"])
+
+    def price(self, name):
+        values = self.columns[name]
+        if values.dtype == numpy.float64:
+            return values
+        values = values.astype(numpy.float64)
+        if self.decimals is not None:
+            numpy.round(values, self.decimals, out=values)
+        return values
+
+    def parse_columns(self):
+        """
+        :return: 与 data.parse_columns 相同的结构
+        """
+        str_dates = self.columns["str_date"]
+        if str_dates.dtype.kind == "S":
+            str_dates = numpy.char.decode(str_dates, "ascii")
+        return build_columns(
+            numpy.arange(len(self)),
+            str_dates.astype(object),
+            *[self.price(name) for name in PRICE_COLUMNS],
+            self.columns["volume"]
+        )
+
+    def digest(self):
+        return columns_digest(numpy.arange(len(self)), [self.columns[name] for name in COLUMNS] + [repr(self.decimals)])
+
+    def to_frame(self):
+        columns = self.parse_columns()
+        return pandas.DataFrame({
+            "str_date": columns["str_dates"],
+            "open_price": columns["open_prices"],
+            "close_price": columns["close_prices"],
+            "low_price": columns["low_prices"],
+            "high_price": columns["high_prices"],
+            "preclose_price": columns["preclose_prices"],
+            "volume": columns["volumes"],
+        }, columns=COLUMNS)
+
+
+def volume_bar_y_data(indexes, volumes, change_states):
+    """
+    成交量柱数据
+    :return: [[index, volume, change_state]]
+    """
+    return [list(item) for item in zip(indexes.tolist(), volumes.tolist(), change_states.tolist())]
+
+
+def sample_frame(rows=64):
+    """
+    构造一份小的K线数据，用于预热和构建版式骨架
+    """
+    close_prices = 10 + numpy.sin(numpy.arange(rows) / 5.0)
+    return pandas.DataFrame({
+        "str_date": [str(i) for i in range(rows)],
+        "open_price": close_prices - 0.1,
+        "close_price": close_prices,
+        "low_price": close_prices - 0.2,
+        "high_price": close_prices + 0.2,
+        "preclose_price": numpy.r_[close_prices[0], close_prices[:-1]],
+        "volume": numpy.full(rows, 1000),
+    })
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+长历史降采样：K线、成交量按固定根数合并，指标线用 LTTB 选点
+"""
+import numpy
+
+__author__ = "Hao Luo"
+
+
+LEVEL_BASE = 4  # 每一级合并的根数是上一级的 4 倍：1、4、16 ...
+
+
+def choose_factor(rows, max_points, base=LEVEL_BASE):
+    """
+    满足点数预算的最小合并倍数
+    """
+    factor = 1
+    while (rows + factor - 1) // factor > max_points:
+        factor *= base
+    return factor
+
+
+def bucket_ends(rows, factor):
+    """
+    每根合并K线的最后一根原始K线下标
+    """
+    return numpy.minimum(numpy.arange(0, rows, factor) + factor, rows) - 1
+
+
+def aggregate_columns(columns, factor):
+    """
+    每 factor 根K线合并为一根，见 aggregate_segments
+    :param columns: data.parse_columns 的返回
+    :return: 与 columns 结构相同
+    """
+    rows = len(columns["close_prices"])
+    if factor <= 1 or rows == 0:
+        return columns
+
+    return aggregate_segments(columns, numpy.arange(0, rows, factor))
+
+
+def aggregate_segments(columns, starts, label="first"):
+    """
+    按分段合并K线：开盘取首根，收盘取末根，最高取最大，最低取最小，成交量求和，
+    昨收取首根的昨收（保留除权日调整过的昨收），首根昨收缺失时取上一段的收盘价
+    :param columns: data.parse_columns 的返回
+    :param starts: 每段第一根的下标，升序，第一个为 0
+    :param label: 日期取每段的首根 "first" 或末根 "last"
+    :return: 与 columns 结构相同
+    """
+    rows = len(columns["close_prices"])
+    ends = numpy.append(starts[1:], rows) - 1
+
+    open_prices = columns["open_prices"][starts]
+    close_prices = columns["close_prices"][ends]
+    low_prices = numpy.minimum.reduceat(columns["low_prices"], starts)
+    high_prices = numpy.maximum.reduceat(columns["high_prices"], starts)
+    preclose_prices = columns["preclose_prices"][starts]
+    missing = numpy.flatnonzero(numpy.isnan(preclose_prices[1:])) + 1
+    if len(missing):
+        preclose_prices = preclose_prices.copy()
+        preclose_prices[missing] = close_prices[missing - 1]
+
+    return {
+        "indexes": numpy.arange(len(starts)),
+        "str_dates": columns["str_dates"][starts if label == "first" else ends],
+        "open_prices": open_prices,
+        "close_prices": close_prices,
+        "low_prices": low_prices,
+        "high_prices": high_prices,
+        "preclose_prices": preclose_prices,
+        "volumes": numpy.add.reduceat(columns["volumes"], starts),
+        "candles": numpy.column_stack((open_prices, close_prices, low_prices, high_prices)),
+        "change_states": numpy.where(close_prices < preclose_prices, -1, 1).astype(numpy.int8),
+    }
+
+
+def lttb(values, threshold):
+    """
+    Largest-Triangle-Three-Buckets 选点，首尾必选，中间每个桶选一个与相邻点构成三角形面积最大的点
+    NaN 不参与选点：只在有效点上分桶，横坐标为原始下标，选出的都是有效点
+    :param values: 一维序列，横坐标为下标
+    :return: 选中点的下标，升序
+    """
+    values = numpy.asarray(values, dtype=numpy.float64)
+    positions = numpy.flatnonzero(~numpy.isnan(values))
+    if len(positions) < len(values):
+        return positions[lttb_points(positions, values[positions], threshold)]
+    return lttb_points(numpy.arange(len(values)), values, threshold)
+
+
+def lttb_points(x, y, threshold):
+    """
+    :param x: 升序的横坐标
+    :param y: 无 NaN 的纵坐标
+    :return: 选中点在 x 中的位置
+    """
+    rows = len(y)
+    if threshold >= rows or threshold < 3:
+        return numpy.arange(rows)
+
+    x = numpy.asarray(x, dtype=numpy.float64)
+    every = (rows - 2) / (threshold - 2)
+    edges = numpy.append(numpy.floor(numpy.arange(threshold - 1) * every).astype(numpy.int64) + 1, rows)
+
+    selected = numpy.empty(threshold, dtype=numpy.int64)
+    selected[0] = 0
+    selected[-1] = rows - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2]
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        areas = numpy.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(numpy.argmax(areas))
+        selected[i + 1] = a
+
+    return selected
+
+
+def gap_starts(values):
+    """
+    中间每段连续 NaN 的第一个下标（开头的预热段、末尾的 NaN 不算），降采样后在这里断开折线
+    """
+    nan = numpy.isnan(values)
+    valid = numpy.flatnonzero(~nan)
+    if len(valid) == 0:
+        return valid
+    inner = nan[valid[0]:valid[-1] + 1]
+    starts = numpy.flatnonzero(inner[1:] & ~inner[:-1]) + 1
+    return starts + valid[0]
+
+
+class Downsampler:
+    """
+    按点数预算降采样 ProKline 的各序列
+    K线、成交量合并为 factor 倍周期；指标线、MACD柱在原始精度上计算后用 LTTB 选点，
+    再对齐到所在合并K线的日期
+    """
+    factor = 1
+    rows = 0
+
+    def __init__(self, columns, max_points):
+        """
+        :param columns: data.parse_columns 的返回
+        :param max_points: 每个序列最多输出的点数
+        """
+        self.rows = len(columns["close_prices"])
+        self.factor = choose_factor(self.rows, max_points)
+        self.columns = aggregate_columns(columns, self.factor)
+        self.x_date = self.columns["str_dates"].tolist()
+
+    def candlestick_y_data(self):
+        return self.columns["candles"].tolist()
+
+    def volume_bar_y_data(self):
+        columns = self.columns
+        return [list(item) for item in zip(columns["indexes"].tolist(), columns["volumes"].tolist(), columns["change_states"].tolist())]
+
+    def select(self, values):
+        """
+        :return: (合并K线下标, 原始下标)，每根合并K线最多一个点
+        中间有 NaN（停牌等）时 LTTB 只在有效点上选点，每段 NaN 保留第一个点（值为 NaN），折线在此断开
+        """
+        values = numpy.asarray(values, dtype=numpy.float64)
+        # 断点放在前面，与选中点落在同一根合并K线时 numpy.unique 保留断点
+        selected = numpy.concatenate((gap_starts(values), lttb(values, len(self.x_date))))
+        buckets, unique = numpy.unique(selected // self.factor, return_index=True)
+        return buckets, selected[unique]
+
+    def line(self, values):
+        """
+        :return: (x_date, y_values)
+        """
+        buckets, selected = self.select(values)
+        return [self.x_date[bucket] for bucket in buckets.tolist()], numpy.asarray(values, dtype=numpy.float64)[selected].tolist()
+
+    def bars(self, values):
+        """
+        :return: [[合并K线下标, value, display_color]]
+        """
+        buckets, selected = self.select(values)
+        selected_values = numpy.asarray(values, dtype=numpy.float64)[selected]
+        display_colors = numpy.where(selected_values < 0, -1, 1)
+        return [list(item) for item in zip(buckets.tolist(), selected_values.tolist(), display_colors.tolist())]
+
+    def align(self, values):
+        """
+        与合并K线一一对齐的序列：取每根合并K线最后一根原始K线上的值，用于共享 dataset 的输出
+        """
+        return numpy.asarray(values)[bucket_ends(self.rows, self.factor)]
+
+    def row_range(self, start, end):
+        """
+        合并K线下标区间 [start, end) 对应的原始行区间，用于缩放后加载原始精度数据
+        """
+        return start * self.factor, min(end * self.factor, self.rows)
@@ -0,0 +1,591 @@
+# -*- coding: utf-8 -*-
+"""
+ProKline 快速输出：版式（grid、图例、缩放、颜色）对所有标的都一样，
+只构建一次选项骨架，每次渲染只把预先格式化好的数据数组拼进去
+"""
+import base64
+import copy
+import os
+import re
+import threading
+import uuid
+
+import numpy
+import simplejson as json
+
+from .lazy import LazyModule
+from .precision import first_valid, is_price_series
+
+__author__ = "Hao Luo"
+
+
+opts = LazyModule("pyecharts.options")
+utils = LazyModule("pyecharts.commons.utils")
+display = LazyModule("pyecharts.render.display")
+engine = LazyModule("pyecharts.render.engine")
+pyecharts_globals = LazyModule("pyecharts.globals")
+
+
+PLACEHOLDER = "__UCHARTS_%s__"
+PLACEHOLDER_PATTERN = re.compile(r'"__UCHARTS_(\w+?)__"')
+
+INT32_MAX = 2 ** 31 - 1
+INT32_NULL = -2 ** 31  # 定点列中表示 NaN
+MAX_PRICE_DECIMALS = 6
+
+# 把 base64 编码的定长列还原为普通数组，NaN 还原为 null；offset 为去掉的开头 NaN 个数，补回 null；
+# 定点列（有 scale）为 Int32 整数，除以 scale（10 的幂）还原，与 Python 端 counts / scale 的结果逐位相同
+DECODE_COLUMNS_FUNCTION = '''
+        function ucharts_decode_columns(columns) {
+            var types = {f4: Float32Array, f8: Float64Array, i1: Int8Array, i4: Int32Array};
+            var source = {};
+            for (var name in columns) {
+                var column = columns[name];
+                if (Array.isArray(column)) {
+                    source[name] = column;
+                    continue;
+                }
+                var bytes = atob(column.data);
+                var buffer = new ArrayBuffer(bytes.length);
+                var view = new Uint8Array(buffer);
+                for (var i = 0; i < bytes.length; i++) {
+                    view[i] = bytes.charCodeAt(i);
+                }
+                var typed = new types[column.type](buffer);
+                var offset = column.offset || 0;
+                var scale = column.scale;
+                var values = new Array(offset + typed.length);
+                for (var k = 0; k < offset; k++) {
+                    values[k] = null;
+                }
+                if (scale) {
+                    for (var m = 0; m < typed.length; m++) {
+                        values[offset + m] = typed[m] === -2147483648 ? null : typed[m] / scale;
+                    }
+                } else {
+                    for (var j = 0; j < typed.length; j++) {
+                        values[offset + j] = isNaN(typed[j]) ? null : typed[j];
+                    }
+                }
+                source[name] = values;
+            }
+            return source;
+        }
+'''
+
+
+def state_color_function(state_index):
+    """
+    共享 dataset 时 params.data 为整行，按涨跌状态所在维度取色
+    """
+    from .kline import Config
+    return '''
+        function (params) {
+            if (params.data[%d] < 0) {
+                return '%s';
+            }
+            return '%s';
+        }
+''' % (state_index, Config.COLOR_NEGATIVE, Config.COLOR_POSITIVE)
+
+
+def state_visual_map(series_index, state_index):
+    """
+    按 dataset 中的涨跌状态列取色，不调用 JS 回调
+    """
+    from .kline import Config
+    return {
+        "type": "piecewise",
+        "show": False,
+        "seriesIndex": series_index,
+        "dimension": state_index,
+        "pieces": [
+            {"lt": 0, "color": Config.COLOR_NEGATIVE},
+            {"gte": 0, "color": Config.COLOR_POSITIVE},
+        ],
+    }
+
+
+def format_values(values, digits=None):
+    """
+    一维数组格式化为 JSON 数组文本，NaN/inf 输出为 null
+    :param values: 也可以是 split_bars 返回的 MaskedArray，被遮住的位置输出为 null
+    :param digits: 有效数字位数，None 为完整精度（与 json.dumps 相同）
+    """
+    if numpy.ma.isMaskedArray(values):
+        return format_masked(values, digits)
+    values = numpy.asarray(values)
+    if len(values) == 0:
+        return "[]"
+    return "[" + join_formatted(value_format(values, digits), len(values), values.tolist()) + "]"
+
+
+def format_masked(values, digits=None):
+    if values.dtype.kind == "f":
+        return format_values(values.filled(numpy.nan), digits)
+    if len(values) == 0:
+        return "[]"
+    # 整数列保持整数输出，tolist 对被遮住的位置返回 None
+    return "[" + (",".join(["%s"] * len(values)) % tuple(values.tolist())).replace("None", "null") + "]"
+
+
+def format_rows(columns, digits=None):
+    """
+    多列按行格式化为二维 JSON 数组文本，如 [[open, close, low, high], ...]
+    :param columns: 等长的一维数组列表
+    """
+    columns = [numpy.asarray(column) for column in columns]
+    rows = len(columns[0])
+    if rows == 0:
+        return "[]"
+
+    width = len(columns)
+    values = [None] * (rows * width)
+    for i, column in enumerate(columns):
+        values[i::width] = column.tolist()
+
+    row_format = "[" + ",".join(value_format(column, digits) for column in columns) + "]"
+    return "[" + join_formatted(row_format, rows, values) + "]"
+
+
+def value_format(values, digits=None):
+    if values.dtype.kind in "iub":
+        return "%d"
+    if digits is None:
+        return "%r"
+    return "%%.%dg" % digits
+
+
+def join_formatted(item_format, count, values):
+    # 一个格式串对整个 tuple 一次 %，比 numpy.char.mod 逐元素格式化快，且 %r 即 float 最短的 repr
+    text = ",".join([item_format] * count) % tuple(values)
+    if "n" in text:
+        # %r / %g 对 NaN、inf 输出 nan、inf，JSON 中写为 null
+        text = text.replace("-inf", "null").replace("inf", "null").replace("nan", "null")
+    return text
+
+
+def format_strings(values):
+    return json.dumps(list(values), ensure_ascii=False)
+
+
+def line_series(values, downsampler=None):
+    if downsampler is None:
+        return values
+    buckets, selected = downsampler.select(values)
+    return buckets, numpy.asarray(values, dtype=numpy.float64)[selected]
+
+
+def bar_series(indexes, values):
+    values = numpy.asarray(values)
+    return indexes, values, numpy.where(values < 0, -1, 1)
+
+
+def split_bars(values, states, indexes=None, rows=None):
+    """
+    柱状序列按涨跌在 Python 端拆为两个与横轴一一对齐的纯数值序列，各自固定颜色，
+    浏览器端不再逐点调用取色回调
+    :param states: 与 values 等长，小于 0 为跌
+    :param indexes: values 所在的横轴下标，None 为与横轴一一对应
+    :param rows: 横轴长度
+    :return: (positive, negative)，numpy.ma.MaskedArray，另一侧、没有点以及 NaN 的位置被遮住，输出为 null
+    """
+    values = numpy.asarray(values)
+    negative = numpy.asarray(states) < 0
+    if values.dtype.kind == "f":
+        missing = numpy.isnan(values)
+    else:
+        missing = numpy.zeros(len(values), dtype=bool)
+
+    if indexes is not None:
+        dense = numpy.zeros(rows, dtype=values.dtype)
+        dense[indexes] = values
+        dense_negative = numpy.zeros(rows, dtype=bool)
+        dense_negative[indexes] = negative
+        dense_missing = numpy.ones(rows, dtype=bool)
+        dense_missing[indexes] = missing
+        values, negative, missing = dense, dense_negative, dense_missing
+
+    return numpy.ma.masked_array(values, missing | negative), numpy.ma.masked_array(values, missing | ~negative)
+
+
+def series_key(series):
+    """
+    序列数据的 key；拆分后的涨跌两个序列同名（图例一起开关），以 id 区分
+    """
+    return series.get("id") or series["name"]
+
+
+def series_arrays(columns, series, downsampler=None, split=False, trim_nan=False):
+    """
+    各序列的数据列，key 见 series_key
+    一维数组输出为 [value, ...]，元组输出为按行组合的 [[...], ...]
+    :param columns: data.parse_columns 的返回
+    :param series: pyramid.indicator_series 的返回
+    :param split: 成交量、MACD柱按涨跌拆为两个序列（Config.BAR_COLOR_MODE 为 split）
+    :param trim_nan: 指标开头的 NaN 不输出，折线为 [[index, value], ...]，由第一个点的下标表示起始位置；
+                     与 get_chart 相同，降采样时不适用
+    :return: (str_dates, {key: numpy.ndarray 或 tuple})
+    """
+    bars = columns
+    if downsampler is not None:
+        bars = downsampler.columns
+
+    arrays = {
+        "candle": (bars["open_prices"], bars["close_prices"], bars["low_prices"], bars["high_prices"]),
+    }
+    if split:
+        arrays["volume_positive"], arrays["volume_negative"] = split_bars(bars["volumes"], bars["change_states"])
+    else:
+        arrays["volume"] = (bars["indexes"], bars["volumes"], bars["change_states"])
+    for name, values in series.items():
+        if name == "HIST":
+            continue
+        arrays[name] = line_series(values, downsampler)
+        if downsampler is None and trim_nan:
+            first = first_valid(values)
+            if first:
+                arrays[name] = (numpy.arange(first, len(values)), numpy.asarray(values)[first:])
+
+    hist = series.get("HIST")
+    if hist is not None:
+        if downsampler is None:
+            first = first_valid(hist) if trim_nan else 0
+            hist_bars = bar_series(numpy.arange(first, len(hist)), numpy.asarray(hist)[first:])
+        else:
+            hist_bars = bar_series(*line_series(hist, downsampler))
+        if split:
+            indexes, values, states = hist_bars
+            arrays["HIST_positive"], arrays["HIST_negative"] = split_bars(values, states, indexes, len(bars["str_dates"]))
+        else:
+            arrays["HIST"] = hist_bars
+
+    return bars["str_dates"], arrays
+
+
+class CompiledLayout:
+    """
+    ProKline 选项骨架：用一份小数据走一遍 ProKline.get_chart，
+    把各序列和横轴的数据替换为占位符后序列化，切分为静态片段
+    """
+    chart = None
+    parts = None  # [str 或 占位符名]
+
+    def __init__(self, build_chart):
+        """
+        :param build_chart: 无参函数，返回一个完整的 ProKline 图表
+        """
+        chart = build_chart()
+        options = chart.options
+        for i, axis in enumerate(options["xAxis"]):
+            axis["data"] = PLACEHOLDER % "XAXIS"
+        for series in options["series"]:
+            series["data"] = PLACEHOLDER % ("SERIES_" + series_key(series))
+
+        self.chart = chart
+        self.parts = PLACEHOLDER_PATTERN.split(chart.dump_options())
+        self.series_names = [series_key(series) for series in options["series"]]
+
+    def fill(self, str_dates, arrays):
+        """
+        :param arrays: series_arrays 的返回，取整、去掉开头 NaN 等精度处理已在其中完成
+        :return: 完整的选项文本
+        """
+        formatted = {"XAXIS": format_strings(str_dates)}
+        for name in self.series_names:
+            values = arrays[name]
+            if isinstance(values, tuple):
+                formatted["SERIES_" + name] = format_rows(values)
+            else:
+                formatted["SERIES_" + name] = format_values(values)
+
+        # 偶数位是静态片段，奇数位是占位符名
+        parts = list(self.parts)
+        for i in range(1, len(parts), 2):
+            parts[i] = formatted[parts[i]]
+        return "".join(parts)
+
+
+def dataset_columns(columns, series, downsampler=None):
+    """
+    共享 dataset 的各列，所有序列与日期一一对齐
+    降采样时K线、成交量用合并后的数据，指标取每根合并K线最后一根原始K线上的值
+    :return: {dimension: numpy.ndarray}
+    """
+    bars = columns
+    align = None
+    if downsampler is not None:
+        bars = downsampler.columns
+        align = downsampler.align
+
+    result = {
+        "date": bars["str_dates"],
+        "open": bars["open_prices"],
+        "close": bars["close_prices"],
+        "low": bars["low_prices"],
+        "high": bars["high_prices"],
+        "volume": bars["volumes"],
+        "volume_state": bars["change_states"],
+    }
+    for name, values in series.items():
+        result[name] = values if align is None else align(values)
+    if "HIST" in result:
+        result["HIST_state"] = numpy.where(result["HIST"] < 0, -1, 1).astype(numpy.int8)
+    return result
+
+
+def encode_column(values, float_type="f4"):
+    """
+    定长列编码为 {"type": ..., "data": base64}，字节序为小端
+    整数列能放进 Int32 时用 i4/i1，否则与浮点列一样处理
+    """
+    values = numpy.asarray(values)
+    if values.dtype.kind in "iub":
+        if values.dtype.itemsize == 1:
+            type_code = "i1"
+        elif len(values) == 0 or (values.min() >= -INT32_MAX and values.max() <= INT32_MAX):
+            type_code = "i4"
+        else:
+            type_code = "f8"
+    else:
+        type_code = float_type
+
+    data = numpy.ascontiguousarray(values, dtype="<" + type_code).tobytes()
+    return {"type": type_code, "data": base64.b64encode(data).decode("ascii")}
+
+
+def price_decimals(values, max_decimals=MAX_PRICE_DECIMALS):
+    """
+    价格都是 10 ** -decimals 的整数倍、且整数能放进 Int32 时的最小 decimals，否则为 None
+    先用开头一段挑出 decimals，再对整列验证 counts / scale 与原值逐位相同
+    :return: (decimals, counts) 或 None，counts 中 NaN 为 INT32_NULL
+    """
+    values = numpy.asarray(values, dtype=numpy.float64)
+    if numpy.isinf(values).any():
+        return None
+    finite = ~numpy.isnan(values)
+    valid = values[finite]
+    if len(valid) == 0:
+        return None
+
+    head = valid[:64]
+    for decimals in range(max_decimals + 1):
+        scale = 10 ** decimals
+        if numpy.abs(head).max() * scale > INT32_MAX:
+            return None
+        if numpy.array_equal(numpy.round(head * scale) / scale, head):
+            break
+    else:
+        return None
+
+    if numpy.abs(valid).max() * scale > INT32_MAX:
+        return None
+    counts = numpy.round(valid * scale)
+    if not numpy.array_equal(counts / scale, valid):
+        return None
+    result = numpy.full(len(values), INT32_NULL, dtype=numpy.int32)
+    result[finite] = counts
+    return decimals, result
+
+
+def encode_price_column(values, float_type="f8"):
+    """
+    价格列优先按定点 Int32 下发（{"type": "i4", "scale": 10 ** decimals}），浏览器端还原后与原值相同；
+    价格不在十进制网格上（未设 PRICE_TICK 的计算结果等）时按 float_type 下发
+    """
+    fixed = price_decimals(values)
+    if fixed is None:
+        return encode_column(values, float_type)
+    decimals, counts = fixed
+    data = counts.astype("<i4").tobytes()
+    return {"type": "i4", "scale": 10 ** decimals, "data": base64.b64encode(data).decode("ascii")}
+
+
+class DatasetLayout:
+    """
+    共享 dataset 的选项骨架：各序列不再各自携带数据，而是通过 encode 引用同一份 dataset 的列，
+    日期只输出一次，横轴不再携带数据
+    dataset 为按列组织的 {dimension: [value, ...]}
+    """
+    chart = None
+    parts = None
+    dimensions = None
+    supports_trim_nan = False  # dataset 各列按位置对齐，开头的 NaN 只能输出为 null
+
+    def __init__(self, build_chart):
+        chart = build_chart()
+        options = chart.options
+        for axis in options["xAxis"]:
+            axis["data"] = None
+
+        # 涨跌拆分的两个序列（Config.BAR_COLOR_MODE 为 split）合并回一个，引用同一列，
+        # 按状态列用 visualMap 取色：dataset 已有紧凑的状态列，拆成两列反而更大
+        split = any(series.get("id") for series in options["series"])
+        if split:
+            options["series"] = [series for series in options["series"] if not series.get("id", "").endswith("_negative")]
+        visual_maps = []
+
+        dimensions = ["date", "open", "close", "low", "high", "volume", "volume_state"]
+        for index, series in enumerate(options["series"]):
+            name = series["name"]
+            series["data"] = None
+            if name == "candle":
+                y = ["open", "close", "low", "high"]
+            elif name in ("volume", "HIST"):
+                if name == "HIST":
+                    dimensions += ["HIST", "HIST_state"]
+                y = name
+                state_index = dimensions.index(name + "_state")
+                if split:
+                    del series["id"], series["barGap"], series["itemStyle"]
+                    visual_maps.append(state_visual_map(index, state_index))
+                else:
+                    series["itemStyle"] = opts.ItemStyleOpts(color=utils.JsCode(state_color_function(state_index)))
+            elif name == "MA1":
+                # 1 日均线就是收盘价，直接引用收盘价列
+                y = "close"
+            else:
+                dimensions.append(name)
+                y = name
+            series["encode"] = {"x": "date", "y": y}
+
+        if visual_maps:
+            options["visualMap"] = visual_maps
+        options["dataset"] = {
+            "dimensions": dimensions,
+            "source": PLACEHOLDER % "SOURCE",
+        }
+
+        self.chart = chart
+        self.dimensions = dimensions
+        self.parts = PLACEHOLDER_PATTERN.split(chart.dump_options())
+
+    def format_column(self, values, trim_nan=False, name=None):
+        """
+        :param trim_nan: 去掉开头的 NaN，见 supports_trim_nan
+        :param name: 列名，binary 模式按列名选择编码类型
+        """
+        return format_values(values)
+
+    def format_source(self, columns, trim_nan=False):
+        formatted = []
+        for name in self.dimensions:
+            if name == "date":
+                text = format_strings(columns[name])
+            else:
+                text = self.format_column(columns[name], trim_nan, name=name)
+            formatted.append("%s: %s" % (json.dumps(name), text))
+        return "{" + ", ".join(formatted) + "}"
+
+    def fill(self, columns, trim_nan=False):
+        """
+        :param columns: dataset_columns 的返回
+        :param trim_nan: 列开头的 NaN 以起始位置表示，只有 binary 模式支持
+        :return: 完整的选项文本
+        """
+        source = self.format_source(columns, trim_nan)
+        parts = list(self.parts)
+        for i in range(1, len(parts), 2):
+            parts[i] = source
+        return "".join(parts)
+
+
+class BinaryDatasetLayout(DatasetLayout):
+    """
+    列数据以 base64 定长数组下发，由 ucharts_decode_columns 在浏览器端还原，
+    输出的选项含 JS 调用，不是严格的 JSON
+    价格列（K线、收盘价均线）在十进制网格上时（设了 PRICE_TICK，或原始数据本身是两三位小数）按定点 Int32 下发，
+    浏览器端还原后与原始数据相同；不在网格上时K线按 Float64（Float32 会显示为 10.239999771118164），均线按 Float32；
+    成交量、其余指标列按 Float32 下发
+    """
+    float_type = "f4"
+    price_float_type = "f8"
+    price_columns = ("open", "close", "low", "high")
+    supports_trim_nan = True
+
+    def __init__(self, build_chart):
+        super().__init__(build_chart)
+        self.chart.add_js_funcs(DECODE_COLUMNS_FUNCTION)
+
+    def format_column(self, values, trim_nan=False, name=None):
+        offset = first_valid(values) if trim_nan else 0
+        values = numpy.asarray(values)[offset:]
+        if values.dtype.kind == "f" and name is not None and is_price_series(name):
+            float_type = self.price_float_type if name in self.price_columns else self.float_type
+            column = encode_price_column(values, float_type)
+        else:
+            column = encode_column(values, self.float_type)
+        if offset:
+            column["offset"] = offset
+        return json.dumps(column)
+
+    def format_source(self, columns, trim_nan=False):
+        return "ucharts_decode_columns(" + super().format_source(columns, trim_nan) + ")"
+
+
+class FastChart:
+    """
+    与 pyecharts 图表相同的 dump_options / render / render_embed / render_notebook 接口
+    选项已拼好，渲染时直接交给 pyecharts 的 RenderEngine，不再经过图表的 dump_options 重新序列化
+    """
+    json_contents = ""
+
+    def __init__(self, skeleton, json_contents):
+        chart = copy.copy(skeleton)
+        chart.chart_id = uuid.uuid4().hex
+        chart.json_contents = json_contents
+        chart.js_dependencies = utils.OrderedSet(*skeleton.js_dependencies.items)
+        if chart.theme not in pyecharts_globals.ThemeType.BUILTIN_THEMES:
+            chart.js_dependencies.add(chart.theme)
+        self.chart = chart
+        self.json_contents = json_contents
+
+    def dump_options(self):
+        return self.json_contents
+
+    def render(self, path="render.html", template_name="simple_chart.html", env=None):
+        engine.RenderEngine(env).render_chart_to_file(chart=self.chart, path=path, template_name=template_name)
+        return os.path.abspath(path)
+
+    def render_embed(self, template_name="simple_chart.html", env=None):
+        return engine.RenderEngine(env).render_chart_to_template(template_name, chart=self.chart)
+
+    def render_notebook(self):
+        """
+        与 pyecharts 的 render_notebook 相同，按 CurrentConfig.NOTEBOOK_TYPE 输出
+        """
+        self.chart.chart_id = uuid.uuid4().hex
+        notebook_type = pyecharts_globals.CurrentConfig.NOTEBOOK_TYPE
+        notebook_types = pyecharts_globals.NotebookType
+        if notebook_type == notebook_types.JUPYTER_NOTEBOOK:
+            require_config = utils.produce_require_dict(self.chart.js_dependencies, self.chart.js_host)
+            return display.HTML(engine.RenderEngine().render_chart_to_notebook(
+                template_name="jupyter_notebook.html",
+                charts=(self.chart,),
+                config_items=require_config["config_items"],
+                libraries=require_config["libraries"],
+            ))
+        if notebook_type == notebook_types.JUPYTER_LAB:
+            return display.HTML(engine.RenderEngine().render_chart_to_notebook(
+                template_name="jupyter_lab.html", charts=(self.chart,)
+            ))
+        if notebook_type == notebook_types.NTERACT:
+            return display.HTML(self.render_embed())
+        if notebook_type == notebook_types.ZEPPELIN:
+            print("%html " + self.render_embed())
+
+
+layouts = {}
+layouts_lock = threading.Lock()
+
+
+def get_layout(key, build_chart, layout_class=CompiledLayout):
+    """
+    按版式 key 缓存骨架，key 需包含影响版式的全部配置
+    """
+    with layouts_lock:
+        layout = layouts.get((key, layout_class))
+        if layout is None:
+            layout = layout_class(build_chart)
+            layouts[(key, layout_class)] = layout
+        return layout
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+带缓存的指标计算，各图表类共用同一份结果
+默认使用 talib，没有安装 TA-Lib 时使用 algorithm 中的纯 NumPy 实现
+"""
+import numpy
+
+from . import algorithm
+from .cache import freeze, indicator_cache
+from .lazy import LazyModule, is_available
+
+__author__ = "Hao Luo"
+
+
+# talib 第一次计算时才导入，导入时还会带入 pandas
+talib = LazyModule("talib") if is_available("talib") else None
+
+ENGINES = ("talib", "numpy")
+engine = "talib" if talib is not None else "numpy"
+
+
+def set_engine(name):
+    """
+    :param name: talib 或 numpy
+    """
+    global engine
+    if name not in ENGINES:
+        raise ValueError("unknown indicator engine: %s" % name)
+    if name == "talib" and load_talib() is None:
+        raise ImportError("TA-Lib is not installed")
+    engine = name
+
+
+def load_talib():
+    """
+    导入 talib；包能找到但 TA-Lib C 库缺失时导入会失败，此时视为未安装，默认引擎改为 numpy
+    :return: talib 模块或 None
+    """
+    global talib, engine
+    if talib is None:
+        return None
+    try:
+        return talib.load()
+    except ImportError:
+        talib = None
+        if engine == "talib":
+            engine = "numpy"
+        return None
+
+
+def get_engine():
+    if engine == "talib":
+        lib = load_talib()
+        if lib is not None:
+            return lib
+    return algorithm
+
+
+def engine_name():
+    """
+    实际使用的引擎名，用于缓存 key；talib 不可用时已回退为 numpy
+    """
+    get_engine()
+    return engine
+
+
+def as_series(values):
+    if isinstance(values, numpy.ndarray) and values.dtype == numpy.float64 and not values.flags.writeable:
+        return values
+    return numpy.ascontiguousarray(values, dtype=numpy.float64)
+
+
+def prime(name, params, inputs, value, engine_name):
+    """
+    把已经算好的结果放进缓存（如 panel 按面板一次算出的结果），之后同一引擎、参数和输入相同的调用直接命中
+    :param name: MA、MA_MATRIX、MACD、STOCH
+    :param params: 与对应函数的参数顺序相同，不含引擎名
+    :param engine_name: 算出 value 的引擎，ENGINES 之一；两个引擎在中间有 NaN 时结果可能不同，不能混用
+    """
+    if engine_name not in ENGINES:
+        raise ValueError("unknown indicator engine: %s" % engine_name)
+    inputs = tuple(as_series(values) for values in inputs)
+    key = indicator_cache.make_key(name, (engine_name,) + tuple(params), inputs)
+    if isinstance(value, tuple):
+        value = tuple(freeze(item) for item in value)
+    else:
+        value = freeze(value)
+    indicator_cache.put(key, value)
+
+
+def ma(values, timeperiod, matype=0):
+    values = as_series(values)
+    lib = get_engine()
+    return indicator_cache.get_or_compute(
+        "MA", (engine, timeperiod, matype), (values,),
+        lambda: lib.MA(values, timeperiod=timeperiod, matype=matype)
+    )
+
+
+def ma_matrix(values, periods, matype=0):
+    """
+    一次计算多条均线，整体缓存
+    :return: numpy.ndarray，形状为 (len(periods), len(values))，第 i 行为 periods[i] 的均线
+    """
+    values = as_series(values)
+    periods = tuple(int(period) for period in periods)
+    lib = get_engine()
+
+    def compute():
+        if lib is algorithm:
+            return algorithm.ma_matrix(values, periods, matype=matype)
+        # talib 单条均线已足够快，逐条计算后合并
+        matrix = numpy.empty((len(periods), len(values)))
+        for i, period in enumerate(periods):
+            matrix[i] = lib.MA(values, timeperiod=period, matype=matype)
+        return matrix
+
+    return indicator_cache.get_or_compute("MA_MATRIX", (engine, periods, matype), (values,), compute)
+
+
+def macd(close_prices, fastperiod=12, slowperiod=26, signalperiod=9):
+    """
+    :return: (macd_dif, macd_signal, macd_hist)
+    """
+    close_prices = as_series(close_prices)
+    lib = get_engine()
+    return indicator_cache.get_or_compute(
+        "MACD", (engine, fastperiod, slowperiod, signalperiod), (close_prices,),
+        lambda: lib.MACD(close_prices, fastperiod=fastperiod, slowperiod=slowperiod, signalperiod=signalperiod)
+    )
+
+
+def stoch(high_prices, low_prices, close_prices, fastk_period=5, slowk_period=3, slowk_matype=0, slowd_period=3, slowd_matype=0):
+    """
+    :return: (slow_k, slow_d)
+    """
+    high_prices = as_series(high_prices)
+    low_prices = as_series(low_prices)
+    close_prices = as_series(close_prices)
+    lib = get_engine()
+    return indicator_cache.get_or_compute(
+        "STOCH", (engine, fastk_period, slowk_period, slowk_matype, slowd_period, slowd_matype), (high_prices, low_prices, close_prices),
+        lambda: lib.STOCH(
+            high_prices, low_prices, close_prices,
+            fastk_period=fastk_period,
+            slowk_period=slowk_period,
+            slowk_matype=slowk_matype,
+            slowd_period=slowd_period,
+            slowd_matype=slowd_matype,
+        )
+    )
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+行情文件导入：按块读取 CSV / Parquet，只读需要的列，按映射改名、收窄类型，
+没有昨收列时由收盘价错位一根得到，跨块衔接；结果为 data.Bars，可直接交给 ProKline
+多个文件用进程池并行
+"""
+import concurrent.futures
+import os
+
+import numpy
+
+from .data import COLUMNS, Bars
+from .lazy import LazyModule, is_available
+
+__author__ = "Hao Luo"
+
+
+pandas = LazyModule("pandas")
+
+DEFAULT_CHUNK_ROWS = 1000000
+DEFAULT_DATE_FORMAT = "%Y-%m-%d %H:%M"
+FLOAT32_EXACT_INTEGER = 2 ** 24  # float32 能精确表示的最大整数，价格乘以 10 ** decimals 不能超过它
+
+
+def source_columns(path):
+    """
+    文件中的列名，只读表头或 schema
+    """
+    if is_parquet(path):
+        return list(parquet_file(path).schema_arrow.names)
+    return list(pandas.read_csv(path, nrows=0).columns)
+
+
+def is_parquet(path):
+    return os.path.splitext(path)[1].lower() in (".parquet", ".pq")
+
+
+def parquet_file(path):
+    if not is_available("pyarrow"):
+        raise ImportError("reading parquet in chunks requires pyarrow")
+    import pyarrow.parquet
+    return pyarrow.parquet.ParquetFile(path)
+
+
+def read_chunks(path, usecols, chunksize=DEFAULT_CHUNK_ROWS, dtype=None):
+    """
+    按块读取指定的列
+    :param dtype: {列名: 类型}，CSV 解析时直接转换，Parquet 读出后转换
+    :return: 迭代 {列名: numpy.ndarray}
+    """
+    if is_parquet(path):
+        for batch in parquet_file(path).iter_batches(batch_size=chunksize, columns=usecols):
+            yield {name: batch.column(name).to_numpy(zero_copy_only=False) for name in usecols}
+        return
+
+    for chunk in pandas.read_csv(path, usecols=usecols, chunksize=chunksize, dtype=dtype):
+        yield {name: chunk[name].to_numpy() for name in usecols}
+
+
+def format_dates(values, date_format=DEFAULT_DATE_FORMAT):
+    """
+    日期列转为定长字节串数组，比 Python 字符串对象省内存；时间类型按 date_format 格式化
+    """
+    values = numpy.asarray(values)
+    if values.dtype.kind == "M":
+        values = pandas.DatetimeIndex(values).strftime(date_format).to_numpy()
+    return values.astype(str).astype(bytes)
+
+
+class Ingestor:
+    """
+    一个文件的导入配置
+    """
+    mapping = None  # {ProKline 列名: 文件列名}，str_date 可以是多个文件列，以空格连接，如 ("date", "time")
+    chunksize = DEFAULT_CHUNK_ROWS
+    price_dtype = numpy.float64
+    decimals = None
+    date_format = DEFAULT_DATE_FORMAT
+
+    def __init__(self, mapping=None, chunksize=DEFAULT_CHUNK_ROWS, price_dtype=numpy.float64, decimals=None,
+                 date_format=DEFAULT_DATE_FORMAT):
+        """
+        :param mapping: 列名映射，未给出的列按同名读取
+        :param price_dtype: 价格列的存储类型，默认 float64 不损失精度；
+                            float32 内存减半，但只有约 7 位有效数字，须给出 decimals，解析时按其还原，
+                            价格乘以 10 ** decimals 须小于 2 ** 24（如 2 位小数时价格小于 167772.16），超出时报错
+        :param decimals: 价格的小数位数（最小变动价位的位数，如外汇 5 位），float64 存储时可为 None
+        :param date_format: 日期列为时间类型时的格式
+        """
+        narrowed = numpy.dtype(price_dtype) != numpy.float64
+        if narrowed and decimals is None:
+            raise ValueError("decimals is required when prices are stored as %s" % numpy.dtype(price_dtype))
+        self.mapping = {name: name for name in COLUMNS}
+        self.mapping.update(mapping or {})
+        self.chunksize = chunksize
+        self.price_dtype = price_dtype
+        self.decimals = decimals
+        self.date_format = date_format
+
+    def narrowed(self):
+        return numpy.dtype(self.price_dtype) != numpy.float64
+
+    def date_sources(self):
+        source = self.mapping["str_date"]
+        return [source] if isinstance(source, str) else list(source)
+
+    def read(self, path):
+        """
+        :return: data.Bars
+        """
+        available = set(source_columns(path))
+        date_sources = self.date_sources()
+        derive_preclose = self.mapping["preclose_price"] not in available
+        names = [name for name in COLUMNS[1:] if not (name == "preclose_price" and derive_preclose)]
+        usecols = date_sources + [self.mapping[name] for name in names]
+        missing = [column for column in usecols if column not in available]
+        if missing:
+            raise ValueError("%s: missing columns %s" % (path, missing))
+
+        # 日期列按字符串读，保持原样，不让 pandas 推断为整数或时间；价格列由解析器直接输出目标类型
+        dtype = dict.fromkeys(date_sources, str)
+        dtype.update((self.mapping[name], self.price_dtype) for name in names if name != "volume")
+
+        parts = {name: [] for name in COLUMNS}
+        last_close = None
+        for chunk in read_chunks(path, list(dict.fromkeys(usecols)), self.chunksize, dtype):
+            columns = self.convert(chunk, names)
+            if derive_preclose:
+                columns["preclose_price"] = shift_prices(columns["close_price"], last_close)
+            if len(columns["close_price"]):
+                last_close = columns["close_price"][-1]
+            for name in COLUMNS:
+                parts[name].append(columns[name])
+
+        result = {}
+        for name in COLUMNS:
+            result[name] = numpy.concatenate(parts[name]) if parts[name] else numpy.empty(0)
+            parts[name] = None  # 合并后立即释放各块
+        return Bars(result, decimals=self.decimals if self.narrowed() else None)
+
+    def convert(self, chunk, names):
+        dates = [format_dates(chunk[source], self.date_format) for source in self.date_sources()]
+        str_dates = dates[0]
+        for values in dates[1:]:
+            str_dates = numpy.char.add(numpy.char.add(str_dates, b" "), values)
+
+        columns = {"str_date": str_dates}
+        for name in names:
+            values = chunk[self.mapping[name]]
+            if name == "volume":
+                # 成交量可能是浮点数或缺失，取整
+                values = numpy.nan_to_num(numpy.asarray(values, dtype=numpy.float64)).round().astype(numpy.int64)
+            else:
+                values = numpy.asarray(values, dtype=self.price_dtype)
+                if self.narrowed():
+                    self.check_precision(name, values)
+            columns[name] = values
+        return columns
+
+    def check_precision(self, name, values):
+        """
+        窄类型的价格按 decimals 四舍五入后须能还原为原值
+        """
+        limit = FLOAT32_EXACT_INTEGER / 10 ** self.decimals
+        largest = numpy.max(numpy.abs(values), initial=0, where=~numpy.isnan(values))
+        if largest >= limit:
+            raise ValueError("%s up to %s cannot keep %d decimals as %s, use price_dtype=numpy.float64" % (
+                name, largest, self.decimals, numpy.dtype(self.price_dtype)))
+
+
+def shift_prices(close_prices, last_close=None):
+    """
+    昨收为上一根的收盘价；第一块的第一根没有上一根，取其自身收盘价
+    :param last_close: 上一块最后一根的收盘价
+    """
+    preclose_prices = numpy.empty_like(close_prices)
+    if len(close_prices) == 0:
+        return preclose_prices
+    preclose_prices[1:] = close_prices[:-1]
+    preclose_prices[0] = close_prices[0] if last_close is None else last_close
+    return preclose_prices
+
+
+def ingest(path, **options):
+    """
+    :param options: 见 Ingestor
+    :return: data.Bars
+    """
+    return Ingestor(**options).read(path)
+
+
+def ingest_files(paths, workers=None, **options):
+    """
+    多个文件并行导入，每个文件一个进程任务
+    :param workers: 进程数，默认 CPU 核数，1 为在当前进程依次导入
+    :return: {path: data.Bars}，顺序与 paths 相同
+    """
+    paths = list(paths)
+    workers = min(workers or os.cpu_count() or 1, len(paths) or 1)
+    if workers == 1:
+        return {path: ingest(path, **options) for path in paths}
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(ingest, path, **options) for path in paths]
+        return {path: future.result() for path, future in zip(paths, futures)}
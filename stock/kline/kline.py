@@ -1,11 +1,31 @@
 # -*- coding: utf-8 -*-
 __author__ = "Hao Luo"
 
-from pyecharts.charts import Kline, Bar, Line, Grid
-import pyecharts.options as opts
-from pyecharts.commons.utils import JsCode
-import talib
-import pandas
+import os
+import re
+import uuid
+import warnings
+
+import numpy
+
+from . import cache, indicator, metrics
+from .cache import content_key, freeze
+from .data import COLUMNS, frame_digest, parse_columns, sample_frame, volume_bar_y_data
+from .downsample import Downsampler
+from .emitter import BinaryDatasetLayout, CompiledLayout, DatasetLayout, FastChart, dataset_columns, get_layout, series_arrays, split_bars
+from .lazy import LazyModule
+from .precision import Precision, first_valid
+from .pyramid import Pyramid, indicator_series
+from .resample import Resampler
+from .stream import KlineStream, kdj_j
+
+# 构建图表时才导入 pyecharts，只用 Config 或数据、指标部分时不加载渲染依赖
+charts = LazyModule("pyecharts.charts")
+opts = LazyModule("pyecharts.options")
+utils = LazyModule("pyecharts.commons.utils")
+pyecharts_globals = LazyModule("pyecharts.globals")
+pandas = LazyModule("pandas")
+aio = LazyModule(__package__ + ".aio")  # asyncio 只有异步接口用到
 
 
 class Config:
@@ -15,6 +35,23 @@ class Config:
     ZOOM_RANGE_START_PERCENT = 90
     ZOOM_RANGE_END_PERCENT = 100
 
+    # ProKline 每个序列最多输出的点数，None 为不降采样
+    DOWNSAMPLE_MAX_POINTS = None
+
+    # ProKline.get_window 按需加载窗口时的点数预算
+    WINDOW_MAX_POINTS = 2000
+
+    # 输出精度：价格（K线、收盘价均线）按最小变动价位取整，如 0.01；其余指标保留的有效数字位数，如 4
+    # None 为完整精度。取整后输出体积约减半，浏览器端解析更快
+    PRICE_TICK = None
+    INDICATOR_DIGITS = None
+    # 指标开头的 NaN 预热段不逐点输出：折线、MACD柱从第一个有效值开始，binary 模式的列带起始位置
+    TRIM_LEADING_NAN = False
+
+    # 成交量、MACD柱的涨跌取色：callback 每个点携带 [idx, value, state]，浏览器端逐点调用 JS 回调取色；
+    # split 在 Python 端按涨跌拆为两个固定颜色的纯数值序列，数据更小，不调用回调
+    BAR_COLOR_MODE = "callback"
+
     CLOSE_PRICE_MALINE_CONFIGS = [
         {
             "day_count": 1,
@@ -56,6 +93,87 @@ class Config:
     }
 
 
+def layout_key():
+    """
+    影响 ProKline 版式的配置，快速输出按此缓存选项骨架
+    """
+    return repr((
+        Config.COLOR_POSITIVE,
+        Config.COLOR_NEGATIVE,
+        Config.ZOOM_RANGE_START_PERCENT,
+        Config.ZOOM_RANGE_END_PERCENT,
+        Config.BAR_COLOR_MODE,
+        Config.PRICE_TICK,
+        Config.INDICATOR_DIGITS,
+        Config.TRIM_LEADING_NAN,
+        Config.CLOSE_PRICE_MALINE_CONFIGS,
+        Config.VOLUME_MALINE_CONFIGS,
+        Config.KDJ,
+    ))
+
+
+BAR_COLOR_MODES = ["callback", "split"]
+
+PANELS = ["candlestick", "volume", "macd", "kdj"]
+
+# 各面板高度（像素）和与上一面板的间距，按 800px 高的四面板版式换算
+PANEL_HEIGHTS = {
+    "candlestick": 240,
+    "volume": 120,
+    "macd": 160,
+    "kdj": 120,
+}
+PANEL_TOP = 60  # 第一个面板的上边距，与 ECharts grid 默认值相同
+PANEL_GAP_AFTER_CANDLESTICK = 28
+PANEL_GAP = 8
+PANEL_BOTTOM = 56  # 底部留给缩放滑块
+
+
+def output_precision():
+    return Precision(Config.PRICE_TICK, Config.INDICATOR_DIGITS, Config.TRIM_LEADING_NAN)
+
+
+def check_panels(panels):
+    if panels is None:
+        return list(PANELS)
+    panels = list(panels)
+    unknown = [panel for panel in panels if panel not in PANELS]
+    if unknown or not panels:
+        raise ValueError("panels must be a non-empty subset of %s, got %s" % (PANELS, panels))
+    return panels
+
+
+def panel_layouts(panels):
+    """
+    选中的面板从上到下依次排列，图表总高度随之缩短
+    :return: {"height": 总高度像素, "panels": [{"top": ..., "height": ...}]}，top、height 为百分比字符串，第一个面板 top 为 None
+    """
+    tops = []
+    bottom = PANEL_TOP
+    previous = None
+    for panel in panels:
+        if previous is not None:
+            bottom += PANEL_GAP_AFTER_CANDLESTICK if previous == "candlestick" else PANEL_GAP
+        tops.append(bottom)
+        bottom += PANEL_HEIGHTS[panel]
+        previous = panel
+
+    height = bottom + PANEL_BOTTOM
+    layouts = []
+    for i, (panel, top) in enumerate(zip(panels, tops)):
+        layouts.append({
+            "top": None if i == 0 else "%g%%" % (top * 100.0 / height),
+            "height": "%g%%" % (PANEL_HEIGHTS[panel] * 100.0 / height),
+        })
+    return {"height": height, "panels": layouts}
+
+
+def as_frame(df):
+    if hasattr(df, "parse_columns"):
+        return df.to_frame()
+    return df
+
+
 class IndexGenerator:
     index = 0
 
@@ -68,6 +186,47 @@ class IndexGenerator:
         return 0
 
 
+def display_x_date(x_date, downsampler=None):
+    if downsampler is None:
+        return x_date
+    return downsampler.x_date
+
+
+def as_list(values):
+    """
+    numpy 数组在交给 pyecharts 时才转为列表，tolist 在 C 层完成，没有逐元素的 Python 循环
+    """
+    if isinstance(values, numpy.ndarray):
+        return values.tolist()
+    return values
+
+
+def line_data(x_date, values, downsampler=None):
+    """
+    折线数据；降采样时只保留选中的点
+    Config.TRIM_LEADING_NAN 时去掉开头的 NaN，折线数据为 [date, value]，由第一个点的日期表示起始位置
+    :return: (x_date, y_values)
+    """
+    if downsampler is not None:
+        return downsampler.line(values)
+    if Config.TRIM_LEADING_NAN:
+        first = first_valid(values)
+        if first:
+            return x_date[first:], values[first:]
+    return x_date, values
+
+
+def histogram_y_data(values):
+    """
+    MACD柱数据，Config.TRIM_LEADING_NAN 时从第一个有效值开始（每点带横轴下标）
+    :return: [[idx, number, display_color]]
+    """
+    values = numpy.asarray(values)
+    first = first_valid(values) if Config.TRIM_LEADING_NAN else 0
+    display_colors = numpy.where(values < 0, -1, 1)
+    return [list(item) for item in zip(range(first, len(values)), values[first:].tolist(), display_colors[first:].tolist())]
+
+
 class Candlestick:
     """
     基础K线图
@@ -75,26 +234,53 @@ class Candlestick:
     title = ""
     x_date = [] # [str_date]
     y_data = [] # [[open_price, close_price, low_price, high_price]]
-    y_close_prices = [] # [close_price]
+    y_close_prices = None # numpy.ndarray [close_price]
     xaxis_index = None
     yaxis_index = None
+    downsampler = None
 
-    def __init__(self, title, x_date, y_data, xaxis_index=0, yaxis_index=0):
+    def __init__(self, title, x_date, y_data, xaxis_index=0, yaxis_index=0, downsampler=None):
         self.title = title
         self.x_date = x_date
         self.y_data = y_data
         self.xaxis_index = xaxis_index
         self.yaxis_index = yaxis_index
+        self.downsampler = downsampler
+
+        # 每个实例独立持有收盘价，不能在类属性上累加
+        self.y_close_prices = freeze(numpy.asarray(y_data, dtype=numpy.float64).reshape(-1, 4)[:, 1])
 
-        for y_item in y_data:
-            self.y_close_prices.append(y_item[1])
+    @classmethod
+    def from_arrays(cls, title, x_date, open_prices, close_prices, low_prices, high_prices, xaxis_index=0, yaxis_index=0, downsampler=None):
+        """
+        由各列数组构建，不必先组成 [[open_price, close_price, low_price, high_price]] 列表；
+        数据保持为 float64 矩阵，输出时才转为列表
+        """
+        candles = numpy.column_stack((open_prices, close_prices, low_prices, high_prices)).astype(numpy.float64, copy=False)
+        return cls(title, as_list(x_date), candles, xaxis_index=xaxis_index, yaxis_index=yaxis_index, downsampler=downsampler)
+
+    @classmethod
+    def from_frame(cls, title, df, **kwargs):
+        """
+        :param df: 与 ProKline 的 df 相同，pandas.DataFrame、store.StoreWindow 或 data.Bars
+        :param kwargs: 见 from_arrays
+        """
+        columns = parse_columns(df)
+        return cls(title, as_list(columns["str_dates"]), columns["candles"], **kwargs)
 
     def get_chart(self):
-        k_chart = Kline()
-        k_chart.add_xaxis(xaxis_data=self.x_date)
+        y_data = as_list(self.y_data)
+        if self.downsampler is not None:
+            y_data = self.downsampler.candlestick_y_data()
+        precision = output_precision()
+        if precision.price_tick is not None:
+            y_data = precision.price(y_data).tolist()
+
+        k_chart = charts.Kline()
+        k_chart.add_xaxis(xaxis_data=display_x_date(self.x_date, self.downsampler))
         k_chart.add_yaxis(
             series_name="candle",
-            y_axis=self.y_data,
+            y_axis=y_data,
             xaxis_index=self.xaxis_index,
             yaxis_index=self.yaxis_index,
             itemstyle_opts=opts.ItemStyleOpts(
@@ -131,9 +317,10 @@ class Candlestick:
             ],
         )
 
-        ma_line = MaLine(self.title, x_date=self.x_date, y_close_prices=self.y_close_prices, xaxis_index=self.xaxis_index, yaxis_index=self.yaxis_index)
+        ma_line = MaLine(self.title, x_date=self.x_date, y_close_prices=self.y_close_prices, xaxis_index=self.xaxis_index, yaxis_index=self.yaxis_index, downsampler=self.downsampler)
         ma_line_chart = ma_line.get_chart()
-        k_chart.overlap(ma_line_chart)
+        with metrics.stage("overlap"):
+            k_chart.overlap(ma_line_chart)
         return k_chart
 
     def render(self):
@@ -156,41 +343,122 @@ bar_color_function = '''
 '''
 
 
+def check_color_mode(color_mode):
+    color_mode = color_mode or Config.BAR_COLOR_MODE
+    if color_mode not in BAR_COLOR_MODES:
+        raise ValueError("unknown bar color mode %r, expected one of %s" % (color_mode, BAR_COLOR_MODES))
+    return color_mode
+
+
+def add_split_bars(bar, series_name, values, states, xaxis_index, yaxis_index, indexes=None, rows=None):
+    """
+    按涨跌拆为两个固定颜色的序列，两者同名（图例一起开关）、重叠在同一位置，以 id 区分
+    参数见 emitter.split_bars
+    """
+    positive, negative = split_bars(values, states, indexes, rows)
+    for suffix, y_data, color in (("positive", positive, Config.COLOR_POSITIVE), ("negative", negative, Config.COLOR_NEGATIVE)):
+        bar.add_yaxis(
+            series_name=series_name,
+            yaxis_data=y_data.tolist(),
+            xaxis_index=xaxis_index,
+            yaxis_index=yaxis_index,
+            gap="-100%",
+            label_opts=opts.LabelOpts(
+                is_show=False
+            ),
+            itemstyle_opts=opts.ItemStyleOpts(color=color)
+        )
+        bar.options["series"][-1]["id"] = "%s_%s" % (series_name, suffix)
+
+
 class VolumeBar:
     """
     成交量
     """
     title = ""
     x_date = []  # [str_date]
-    y_data = []  # [[index, volume, change_state]]
-    y_volumes = []
+    y_data = []  # [[index, volume, change_state]]，由数组构建时为 None，输出时才生成
+    indexes = None  # numpy.ndarray [index]
+    volumes = None  # numpy.ndarray [volume]，保持原类型
+    change_states = None  # numpy.ndarray [change_state]
+    y_volumes = None  # numpy.ndarray [volume]
     xaxis_index = 0
     yaxis_index = 0
+    downsampler = None
+    color_mode = None  # BAR_COLOR_MODES 之一
 
-    def __init__(self, title, x_date, y_data, xaxis_index=0, yaxis_index=0):
+    def __init__(self, title, x_date, y_data, xaxis_index=0, yaxis_index=0, downsampler=None, color_mode=None):
+        """
+        :param color_mode: 涨跌取色方式，默认 Config.BAR_COLOR_MODE
+        """
         self.title = title
         self.x_date = x_date
         self.y_data = y_data
         self.xaxis_index = xaxis_index
         self.yaxis_index = yaxis_index
+        self.downsampler = downsampler
+        self.color_mode = check_color_mode(color_mode)
+
+        if y_data is not None:
+            y_matrix = numpy.asarray(y_data).reshape(-1, 3)
+            self.set_columns(y_matrix[:, 0], y_matrix[:, 1], y_matrix[:, 2])
+
+    def set_columns(self, indexes, volumes, change_states):
+        self.indexes = numpy.asarray(indexes)
+        self.volumes = numpy.asarray(volumes)
+        self.change_states = numpy.asarray(change_states)
+        self.y_volumes = freeze(self.volumes)
+
+    @classmethod
+    def from_arrays(cls, title, x_date, volumes, change_states, xaxis_index=0, yaxis_index=0, downsampler=None, color_mode=None,
+                    indexes=None):
+        """
+        由成交量、涨跌状态数组构建，不必先组成 [[index, volume, change_state]] 列表
+        :param change_states: 收盘价低于昨收为 -1，否则为 1，见 data.build_columns
+        :param indexes: 每根K线的下标，默认从 0 开始
+        """
+        volume_bar = cls(title, as_list(x_date), None, xaxis_index=xaxis_index, yaxis_index=yaxis_index,
+                         downsampler=downsampler, color_mode=color_mode)
+        volume_bar.set_columns(numpy.arange(len(volumes)) if indexes is None else indexes, volumes, change_states)
+        return volume_bar
 
-        for y_item in y_data:
-            self.y_volumes.append(y_item[1])
+    @classmethod
+    def from_frame(cls, title, df, **kwargs):
+        """
+        :param df: 与 ProKline 的 df 相同
+        :param kwargs: 见 from_arrays
+        """
+        columns = parse_columns(df)
+        return cls.from_arrays(title, columns["str_dates"], columns["volumes"], columns["change_states"], **kwargs)
 
     def get_chart(self):
         # bar
-        volume_bar = Bar()
-        volume_bar.add_xaxis(xaxis_data=self.x_date)
-        volume_bar.add_yaxis(
-            series_name="volume",
-            yaxis_data=self.y_data,
-            xaxis_index=self.xaxis_index,
-            yaxis_index=self.yaxis_index,
-            label_opts=opts.LabelOpts(
-                is_show=False
-            ),
-            itemstyle_opts=opts.ItemStyleOpts(color=JsCode(bar_color_function))
-        )
+        volume_bar = charts.Bar()
+        volume_bar.add_xaxis(xaxis_data=display_x_date(self.x_date, self.downsampler))
+        if self.color_mode == "split":
+            if self.downsampler is not None:
+                volumes, states = self.downsampler.columns["volumes"], self.downsampler.columns["change_states"]
+            else:
+                volumes, states = self.volumes, self.change_states
+            add_split_bars(volume_bar, "volume", volumes, states, self.xaxis_index, self.yaxis_index)
+        else:
+            if self.downsampler is not None:
+                y_data = self.downsampler.volume_bar_y_data()
+            elif self.y_data is not None:
+                y_data = self.y_data
+            else:
+                # 下标、涨跌状态保持整数，成交量保持原类型，与逐行构建的列表相同
+                y_data = volume_bar_y_data(self.indexes, self.volumes, self.change_states)
+            volume_bar.add_yaxis(
+                series_name="volume",
+                yaxis_data=y_data,
+                xaxis_index=self.xaxis_index,
+                yaxis_index=self.yaxis_index,
+                label_opts=opts.LabelOpts(
+                    is_show=False
+                ),
+                itemstyle_opts=opts.ItemStyleOpts(color=utils.JsCode(bar_color_function))
+            )
         volume_bar.set_global_opts(
             title_opts=opts.TitleOpts(title=self.title),
             xaxis_opts=opts.AxisOpts(
@@ -221,14 +489,17 @@ class VolumeBar:
         )
 
         # ma line
-        ma_line = Line()
-        ma_line.add_xaxis(xaxis_data=self.x_date)
+        ma_line = charts.Line()
 
-        for ma_config in Config.VOLUME_MALINE_CONFIGS:
+        precision = output_precision()
+        volume_mas = indicator.ma_matrix(self.y_volumes, [ma_config["day_count"] for ma_config in Config.VOLUME_MALINE_CONFIGS])
+        for ma_config, volume_ma in zip(Config.VOLUME_MALINE_CONFIGS, volume_mas):
             day_count = ma_config["day_count"]
+            x_date, y_axis = line_data(self.x_date, precision.indicator(volume_ma), self.downsampler)
+            ma_line.add_xaxis(xaxis_data=x_date)
             ma_line.add_yaxis(
                 series_name="VMA%d" % day_count,
-                y_axis=talib.MA(pandas.Series(self.y_volumes), timeperiod=day_count, matype=0),
+                y_axis=y_axis,
                 xaxis_index=self.xaxis_index,
                 yaxis_index=self.yaxis_index,
                 linestyle_opts=opts.LineStyleOpts(
@@ -244,7 +515,8 @@ class VolumeBar:
             ),
         )
 
-        volume_bar.overlap(ma_line)
+        with metrics.stage("overlap"):
+            volume_bar.overlap(ma_line)
 
         return volume_bar
 
@@ -265,25 +537,48 @@ class MaLine:
     day_configs = []
     xaxis_index = None
     yaxis_index = None
+    downsampler = None
 
-    def __init__(self, title, x_date, y_close_prices, xaxis_index=0, yaxis_index=0, day_configs=[]):
+    def __init__(self, title, x_date, y_close_prices, xaxis_index=0, yaxis_index=0, day_configs=[], downsampler=None):
         self.title = title
         self.x_date = x_date
         self.y_close_prices = y_close_prices
         self.xaxis_index = xaxis_index
         self.yaxis_index = yaxis_index
+        self.downsampler = downsampler
 
         self.day_configs = [config for config in Config.CLOSE_PRICE_MALINE_CONFIGS] + day_configs
 
+    @classmethod
+    def from_arrays(cls, title, x_date, close_prices, xaxis_index=0, yaxis_index=0, day_configs=[], downsampler=None):
+        """
+        收盘价保持为连续的 float64 数组
+        """
+        return cls(title, as_list(x_date), freeze(close_prices), xaxis_index=xaxis_index, yaxis_index=yaxis_index,
+                   day_configs=day_configs, downsampler=downsampler)
+
+    @classmethod
+    def from_frame(cls, title, df, **kwargs):
+        """
+        :param df: 与 ProKline 的 df 相同
+        :param kwargs: 见 from_arrays
+        """
+        columns = parse_columns(df)
+        return cls.from_arrays(title, columns["str_dates"], columns["close_prices"], **kwargs)
+
     def get_chart(self):
-        line = Line()
-        line.add_xaxis(xaxis_data=self.x_date)
+        line = charts.Line()
 
-        for day_config in self.day_configs:
+        close_prices = freeze(self.y_close_prices)
+        precision = output_precision()
+        close_mas = indicator.ma_matrix(close_prices, [day_config["day_count"] for day_config in self.day_configs])
+        for day_config, close_ma in zip(self.day_configs, close_mas):
             day_count = day_config["day_count"]
+            x_date, y_axis = line_data(self.x_date, precision.price(close_ma), self.downsampler)
+            line.add_xaxis(xaxis_data=x_date)
             line.add_yaxis(
                 series_name="MA%d" % day_count,
-                y_axis=talib.MA(pandas.Series(self.y_close_prices), timeperiod=day_count, matype=0),
+                y_axis=y_axis,
                 xaxis_index=self.xaxis_index,
                 yaxis_index=self.yaxis_index,
                 linestyle_opts=opts.LineStyleOpts(
@@ -292,6 +587,7 @@ class MaLine:
                 ),
                 is_symbol_show=False
             )
+        line.add_xaxis(xaxis_data=display_x_date(self.x_date, self.downsampler))
 
         line.set_series_opts(
             label_opts=opts.LabelOpts(
@@ -335,39 +631,78 @@ class MacdChart:
     '''
     title = ""
     x_date = [] # [date]
-    diff_data = [] # [number]
-    signal_data = [] # [number]
-    histogram_data = [] # [[idx, number, display_color]]
+    close_prices = None # [close_price]
+    macd_values = None # (macd_dif, macd_signal, macd_hist)，首次访问时计算
     hist_diplay_ratio = 1  # 乘上系数用于展示。同花顺、雪球是2
     xaxis_index = 0
+    downsampler = None
+    color_mode = None  # BAR_COLOR_MODES 之一
 
     color_diff = "gold"
     color_signal = "blue"
 
-    def __init__(self, title, x_date, close_prices, xaxis_index=0, yaxis_index=0):
+    def __init__(self, title, x_date, close_prices, xaxis_index=0, yaxis_index=0, downsampler=None, color_mode=None):
+        """
+        :param color_mode: MACD柱的涨跌取色方式，默认 Config.BAR_COLOR_MODE
+        """
         self.title = title + " MACD"
         self.x_date = x_date
+        self.close_prices = close_prices
         self.xaxis_index = xaxis_index
         self.yaxis_index = yaxis_index
+        self.downsampler = downsampler
+        self.color_mode = check_color_mode(color_mode)
+        self.macd_values = None
 
-        # macd
-        macd_dif, macd_signal, macd_hist = talib.MACD(pandas.Series(close_prices))
+    @classmethod
+    def from_arrays(cls, title, x_date, close_prices, xaxis_index=0, yaxis_index=0, downsampler=None, color_mode=None):
+        """
+        收盘价保持为连续的 float64 数组
+        """
+        return cls(title, as_list(x_date), freeze(close_prices), xaxis_index=xaxis_index, yaxis_index=yaxis_index,
+                   downsampler=downsampler, color_mode=color_mode)
+
+    @classmethod
+    def from_frame(cls, title, df, **kwargs):
+        """
+        :param df: 与 ProKline 的 df 相同
+        :param kwargs: 见 from_arrays
+        """
+        columns = parse_columns(df)
+        return cls.from_arrays(title, columns["str_dates"], columns["close_prices"], **kwargs)
+
+    def get_macd(self):
+        if self.macd_values is None:
+            self.macd_values = indicator.macd(self.close_prices)
+        return self.macd_values
 
-        self.diff_data = macd_dif
-        self.signal_data = macd_signal
-        for i, hist in enumerate(macd_hist):
-            display_color = 1
-            if hist < 0:
-                display_color = -1
+    @property
+    def diff_data(self):
+        return self.get_macd()[0]
 
-            self.histogram_data.append([i, hist, display_color])
+    @property
+    def signal_data(self):
+        return self.get_macd()[1]
+
+    @property
+    def hist_values(self):
+        return self.get_macd()[2]
+
+    @property
+    def histogram_data(self):
+        """
+        [[idx, number, display_color]]
+        """
+        return histogram_y_data(self.hist_values)
 
     def get_chart(self):
-        line = Line()
-        line.add_xaxis(xaxis_data=self.x_date)
+        precision = output_precision()
+        line = charts.Line()
+        x_date, y_axis = line_data(self.x_date, precision.indicator(self.diff_data), self.downsampler)
+        line.add_xaxis(xaxis_data=x_date)
         line.add_yaxis(
             series_name="DIF",
-            y_axis=self.diff_data,
+            y_axis=y_axis,
             xaxis_index=self.xaxis_index,
             yaxis_index=self.yaxis_index,
             is_symbol_show=False,
@@ -375,9 +710,11 @@ class MacdChart:
                 color=self.color_diff,
             )
         )
+        x_date, y_axis = line_data(self.x_date, precision.indicator(self.signal_data), self.downsampler)
+        line.add_xaxis(xaxis_data=x_date)
         line.add_yaxis(
             series_name="DEA",
-            y_axis=self.signal_data,
+            y_axis=y_axis,
             xaxis_index=self.xaxis_index,
             yaxis_index=self.yaxis_index,
             is_symbol_show=False,
@@ -392,17 +729,31 @@ class MacdChart:
             is_symbol_show=False
         )
 
-        bar = Bar()
-        bar.add_xaxis(xaxis_data=self.x_date)
-        bar.add_yaxis(
-            series_name="HIST",
-            yaxis_data=self.histogram_data,
-            xaxis_index=self.xaxis_index,
-            yaxis_index=self.yaxis_index,
-            itemstyle_opts=opts.ItemStyleOpts(
-                color=JsCode(bar_color_function),
+        bar = charts.Bar()
+        x_date = display_x_date(self.x_date, self.downsampler)
+        bar.add_xaxis(xaxis_data=x_date)
+        hist_values = precision.indicator(self.hist_values)
+        if self.color_mode == "split":
+            indexes = None
+            if self.downsampler is not None:
+                indexes, selected = self.downsampler.select(hist_values)
+                hist_values = hist_values[selected]
+            add_split_bars(bar, "HIST", hist_values, numpy.where(hist_values < 0, -1, 1), self.xaxis_index, self.yaxis_index,
+                           indexes, len(x_date))
+        else:
+            if self.downsampler is not None:
+                histogram_data = self.downsampler.bars(hist_values)
+            else:
+                histogram_data = histogram_y_data(hist_values)
+            bar.add_yaxis(
+                series_name="HIST",
+                yaxis_data=histogram_data,
+                xaxis_index=self.xaxis_index,
+                yaxis_index=self.yaxis_index,
+                itemstyle_opts=opts.ItemStyleOpts(
+                    color=utils.JsCode(bar_color_function),
+                )
             )
-        )
         bar.set_series_opts(
             label_opts=opts.LabelOpts(
                 is_show=False
@@ -434,7 +785,8 @@ class MacdChart:
             ],
         )
 
-        bar.overlap(line)
+        with metrics.stage("overlap"):
+            bar.overlap(line)
 
         return bar
 
@@ -446,43 +798,71 @@ class KdjLine:
     title = ""
 
     x_date = []
-    slow_k = []
-    slow_d = []
-    slow_j = []
+    high_prices = None
+    low_prices = None
+    close_prices = None
+    j_type = "3D-2K"
+    kdj_values = None  # (slow_k, slow_d, slow_j)，首次访问时计算
 
     xaxis_index = None
     yaxis_index = None
+    downsampler = None
 
-    def __init__(self, title, x_date, high_prices, low_prices, close_prices, j_type="3D-2K", xaxis_index=0, yaxis_index=0):
+    def __init__(self, title, x_date, high_prices, low_prices, close_prices, j_type="3D-2K", xaxis_index=0, yaxis_index=0, downsampler=None):
         self.title = title
         self.x_date = x_date
+        self.high_prices = high_prices
+        self.low_prices = low_prices
+        self.close_prices = close_prices
+        self.j_type = j_type
         self.xaxis_index = xaxis_index
         self.yaxis_index = yaxis_index
+        self.downsampler = downsampler
+        self.kdj_values = None
+
+    @classmethod
+    def from_arrays(cls, title, x_date, high_prices, low_prices, close_prices, j_type="3D-2K", xaxis_index=0, yaxis_index=0, downsampler=None):
+        """
+        价格保持为连续的 float64 数组
+        """
+        return cls(title, as_list(x_date), freeze(high_prices), freeze(low_prices), freeze(close_prices), j_type=j_type,
+                   xaxis_index=xaxis_index, yaxis_index=yaxis_index, downsampler=downsampler)
 
-        self.slow_k, self.slow_d = talib.STOCH(high=high_prices, low=low_prices, close=close_prices)
-        if j_type == "3D-2K":
-            self.slow_j = self.slow_d * 3 - self.slow_k * 2
+    @classmethod
+    def from_frame(cls, title, df, **kwargs):
+        """
+        :param df: 与 ProKline 的 df 相同
+        :param kwargs: 见 from_arrays
+        """
+        columns = parse_columns(df)
+        return cls.from_arrays(title, columns["str_dates"], columns["high_prices"], columns["low_prices"], columns["close_prices"], **kwargs)
 
-        elif j_type == "3K-2D":
-            self.slow_j = self.slow_k * 3 - self.slow_d * 2
+    def get_kdj(self):
+        if self.kdj_values is None:
+            slow_k, slow_d = indicator.stoch(self.high_prices, self.low_prices, self.close_prices)
+            self.kdj_values = (slow_k, slow_d, kdj_j(slow_k, slow_d, self.j_type))
+        return self.kdj_values
 
-        elif j_type == "K-D":
-            self.slow_j = self.slow_k - self.slow_d
+    @property
+    def slow_k(self):
+        return self.get_kdj()[0]
 
-        else:
-            self.slow_j = self.slow_k - self.slow_d
+    @property
+    def slow_d(self):
+        return self.get_kdj()[1]
 
-        self.x_date = [item for item in self.x_date]
-        self.slow_k = [item for item in self.slow_k]
-        self.slow_d = [item for item in self.slow_d]
-        self.slow_j = [item for item in self.slow_j]
+    @property
+    def slow_j(self):
+        return self.get_kdj()[2]
 
     def get_chart(self):
-        line = Line()
-        line.add_xaxis(xaxis_data=self.x_date)
+        precision = output_precision()
+        line = charts.Line()
+        x_date, y_axis = line_data(self.x_date, precision.indicator(self.slow_k), self.downsampler)
+        line.add_xaxis(xaxis_data=x_date)
         line.add_yaxis(
             series_name="K",
-            y_axis=self.slow_k,
+            y_axis=y_axis,
             xaxis_index=self.xaxis_index,
             yaxis_index=self.yaxis_index,
             is_symbol_show=False,
@@ -492,9 +872,11 @@ class KdjLine:
             ),
         )
 
+        x_date, y_axis = line_data(self.x_date, precision.indicator(self.slow_d), self.downsampler)
+        line.add_xaxis(xaxis_data=x_date)
         line.add_yaxis(
             series_name="D",
-            y_axis=self.slow_d,
+            y_axis=y_axis,
             xaxis_index=self.xaxis_index,
             yaxis_index=self.yaxis_index,
             is_symbol_show=False,
@@ -504,9 +886,11 @@ class KdjLine:
             ),
         )
 
+        x_date, y_axis = line_data(self.x_date, precision.indicator(self.slow_j), self.downsampler)
+        line.add_xaxis(xaxis_data=x_date)
         line.add_yaxis(
             series_name="J",
-            y_axis=self.slow_j,
+            y_axis=y_axis,
             xaxis_index=self.xaxis_index,
             yaxis_index=self.yaxis_index,
             is_symbol_show=False,
@@ -515,6 +899,7 @@ class KdjLine:
                 color=Config.KDJ["j_color"],
             ),
         )
+        line.add_xaxis(xaxis_data=display_x_date(self.x_date, self.downsampler))
 
         line.set_series_opts(
             label_opts=opts.LabelOpts(
@@ -558,147 +943,397 @@ class ProKline:
     """
     title = ""
     df = None
-
-    def __init__(self, title, df):
+    stream = None
+    appended_bars = None  # 增量追加、尚未合并进 df 的K线
+    max_points = None
+    pyramid = None
+    resampler = None
+    panels = None  # 显示的面板，顺序即从上到下的顺序
+    digest = None  # 数据的内容哈希，追加、改写K线时清空
+
+    def __init__(self, title, df, max_points=None, panels=None):
         """
         :param title:
         :param df: pandas.DataFrame
         columes str_date、open_price、close_price、low_price、high_price、preclose_price、volume
+        或 store.StoreWindow（磁盘列式存储的一个日期区间）、data.Bars（如 ingest 的导入结果），追加K线时才转为 DataFrame
+        :param max_points: 每个序列最多输出的点数，超出时降采样；默认取 Config.DOWNSAMPLE_MAX_POINTS
+        :param panels: PANELS 的子集，如 ["candlestick", "volume"]；默认全部显示。未选中的面板不构建、不计算指标
         """
         self.title = title
         self.df = df
+        self.max_points = max_points if max_points is not None else Config.DOWNSAMPLE_MAX_POINTS
+        self.panels = check_panels(panels)
+        self.stream = None
+        self.appended_bars = []
+        self.pyramid = None
+        self.resampler = None
+        self.digest = None
+
+    @staticmethod
+    def close_ma_periods():
+        return [config["day_count"] for config in Config.CLOSE_PRICE_MALINE_CONFIGS]
+
+    @staticmethod
+    def volume_ma_periods():
+        return [config["day_count"] for config in Config.VOLUME_MALINE_CONFIGS]
+
+    def get_stream(self):
+        if self.stream is None:
+            self.stream = KlineStream(
+                close_ma_periods=self.close_ma_periods(),
+                volume_ma_periods=self.volume_ma_periods(),
+                j_type="K-D",
+            )
+            self.stream.warm(parse_columns(self.df))
+        return self.stream
 
-    def parse_data(self):
-        str_dates = []
-        candlestick_y_data = []
-        volume_bar_y_data = []
-        for idx, item in self.df.iterrows():
-            str_dates.append(item["str_date"])
-            candlestick_y_data.append([
-                item["open_price"],
-                item["close_price"],
-                item["low_price"],
-                item["high_price"]
-            ])
-
-            change_state = 1
-            if item["close_price"] < item["preclose_price"]:
-                change_state = -1
-
-            volume_bar_y_data.append([idx, item["volume"], change_state])
+    def append_bar(self, str_date, open_price, close_price, low_price, high_price, preclose_price, volume):
+        """
+        追加一根K线，只增量更新指标，不重建图表
+        :return: 各序列变化的尾部，见 KlineStream
+        """
+        bar = dict(zip(COLUMNS, [str_date, open_price, close_price, low_price, high_price, preclose_price, volume]))
+        delta = self.get_stream().append(bar)
+        self.appended_bars.append(bar)
+        self.pyramid = None
+        self.resampler = None
+        self.digest = None
+        return delta
+
+    def update_last_bar(self, str_date, open_price, close_price, low_price, high_price, preclose_price, volume):
+        """
+        改写最后一根K线（如盘中未走完的K线）
+        :return: 各序列变化的尾部，见 KlineStream
+        """
+        bar = dict(zip(COLUMNS, [str_date, open_price, close_price, low_price, high_price, preclose_price, volume]))
+        delta = self.get_stream().update_last(bar)
+        if self.appended_bars:
+            self.appended_bars[-1] = bar
+        else:
+            self.df = as_frame(self.df).iloc[:-1]
+            self.appended_bars.append(bar)
+        self.pyramid = None
+        self.resampler = None
+        self.digest = None
+        return delta
+
+    def flush_bars(self):
+        if not self.appended_bars:
+            return
+
+        start = len(self.df)
+        appended = pandas.DataFrame(self.appended_bars, columns=COLUMNS, index=range(start, start + len(self.appended_bars)))
+        self.df = pandas.concat([as_frame(self.df), appended])
+        self.appended_bars = []
+
+    def parse_data(self, row_lists=True):
+        """
+        :param row_lists: 是否生成 candlestick_y_data、volume_bar_y_data 逐行列表；
+                          get_chart 直接由列数组构建图表，不需要
+        """
+        self.flush_bars()
+        with metrics.stage("parse_data", rows=len(self.df)):
+            return self.build_data(row_lists)
+
+    def build_data(self, row_lists=True):
+        columns = parse_columns(self.df)
+        data = {
+            "str_dates": columns["str_dates"].tolist(),
+            "high_prices": freeze(columns["high_prices"]),
+            "low_prices": freeze(columns["low_prices"]),
+            "close_prices": freeze(columns["close_prices"]),
+            "columns": columns,
+        }
+        # 逐行列表只为显示的面板生成
+        if row_lists and "candlestick" in self.panels:
+            data["candlestick_y_data"] = columns["candles"].tolist()
+        if row_lists and "volume" in self.panels:
+            data["volume_bar_y_data"] = volume_bar_y_data(columns["indexes"], columns["volumes"], columns["change_states"])
+        return data
+
+    def get_pyramid(self):
+        self.flush_bars()
+        if self.pyramid is None:
+            columns = parse_columns(self.df)
+            series = indicator_series(columns, self.close_ma_periods(), self.volume_ma_periods(), j_type="K-D")
+            self.pyramid = Pyramid(columns, series)
+        return self.pyramid
+
+    def get_resampler(self):
+        self.flush_bars()
+        if self.resampler is None:
+            self.resampler = Resampler(self.df)
+        return self.resampler
+
+    def resample(self, timeframe):
+        """
+        同一份K线的另一周期视图，如分钟K线的日K线、周K线；各周期只合并一次，之后切换周期只是查表
+        :param timeframe: resample.TIMEFRAMES 中的周期名
+        :return: ProKline，标题、面板、点数预算与当前相同
+        """
+        return ProKline(self.title, self.get_resampler().bars(timeframe), max_points=self.max_points, panels=self.panels)
+
+    def get_window(self, start, end, max_points=None):
+        """
+        原始行区间 [start, end) 的各序列，按点数预算选择金字塔级别，供 dataZoom 变化时按需加载
+        """
+        pyramid = self.get_pyramid()
+        return Pyramid.to_json(pyramid.window(start, end, max_points or Config.WINDOW_MAX_POINTS))
 
+    def get_window_by_date(self, start_date, end_date, max_points=None):
+        pyramid = self.get_pyramid()
+        return Pyramid.to_json(pyramid.window_by_date(start_date, end_date, max_points or Config.WINDOW_MAX_POINTS))
+
+    def get_initial_data(self, max_points=None):
+        """
+        首屏数据：默认缩放范围内的窗口，加一份全历史的粗粒度全景
+        与 get_window 配合由前端在 dataZoom 变化时按需加载；get_chart、render 不经过这里，仍输出完整历史
+        """
+        pyramid = self.get_pyramid()
+        max_points = max_points or Config.WINDOW_MAX_POINTS
+        start = pyramid.rows * Config.ZOOM_RANGE_START_PERCENT // 100
+        end = pyramid.rows * Config.ZOOM_RANGE_END_PERCENT // 100
         return {
-            "str_dates": str_dates,
-            "high_prices": self.df["high_price"],
-            "low_prices": self.df["low_price"],
-            "close_prices": self.df["close_price"],
-            "candlestick_y_data": candlestick_y_data,
-            "volume_bar_y_data": volume_bar_y_data,
+            "rows": pyramid.rows,
+            "window": Pyramid.to_json(pyramid.window(start, end, max_points)),
+            "overview": Pyramid.to_json(pyramid.overview(max_points)),
         }
 
+    def get_fast_chart(self, mode="inline"):
+        """
+        输出与 get_chart 相同的图表，但不逐个构建 pyecharts 对象：
+        版式骨架按配置只构建一次，之后只格式化数据数组
+        输出精度与 get_chart 相同，取 Config.PRICE_TICK、INDICATOR_DIGITS、TRIM_LEADING_NAN；
+        dataset 模式各列按位置对齐，不支持 TRIM_LEADING_NAN，开头的 NaN 仍输出为 null，并给出警告
+        :param mode: inline 各序列内联 JSON 数组；
+                     dataset 各面板共享一份按列组织的 dataset，日期只输出一次；
+                     binary 同 dataset，各列以 base64 定长数组下发，浏览器端解码
+        :return: emitter.FastChart，接口与 pyecharts 图表相同
+        """
+        self.flush_bars()
+        with metrics.stage("get_fast_chart", rows=len(self.df)):
+            with metrics.stage("parse_data", rows=len(self.df)):
+                columns = parse_columns(self.df)
+            series = indicator_series(columns, self.close_ma_periods(), self.volume_ma_periods(), j_type="K-D", panels=self.panels)
+            precision = output_precision()
+            columns = precision.columns(columns)
+            series = {name: precision.series(name, values) for name, values in series.items()}
+            downsampler = self.get_downsampler(columns)
+            key = layout_key() + repr(self.panels)
+
+            def build_chart():
+                return ProKline(self.title, sample_frame(), panels=self.panels).get_chart()
+
+            if mode in ("dataset", "binary"):
+                layout_class = BinaryDatasetLayout if mode == "binary" else DatasetLayout
+                with metrics.stage("layout"):
+                    layout = get_layout(key, build_chart, layout_class)
+                if precision.trim_nan and not layout.supports_trim_nan:
+                    warnings.warn("Config.TRIM_LEADING_NAN does not apply to get_fast_chart(mode=%r), "
+                                  "leading NaN are emitted as null; use mode='inline' or 'binary'" % mode, stacklevel=2)
+                with metrics.stage("fill") as current:
+                    json_contents = layout.fill(dataset_columns(columns, series, downsampler), precision.trim_nan)
+                    current.set(bytes=len(json_contents))
+                return FastChart(layout.chart, json_contents)
+
+            with metrics.stage("layout"):
+                layout = get_layout(key, build_chart, CompiledLayout)
+            with metrics.stage("fill") as current:
+                str_dates, arrays = series_arrays(columns, series, downsampler, split=Config.BAR_COLOR_MODE == "split",
+                                                  trim_nan=precision.trim_nan)
+                json_contents = layout.fill(str_dates, arrays)
+                current.set(bytes=len(json_contents))
+            return FastChart(layout.chart, json_contents)
+
+    def get_downsampler(self, columns):
+        if not self.max_points or len(columns["close_prices"]) <= self.max_points:
+            return None
+        return Downsampler(columns, self.max_points)
+
     def get_chart(self):
-        grid_chart = Grid(init_opts=opts.InitOpts(
-            height="800px",
+        self.flush_bars()
+        with metrics.stage("get_chart", rows=len(self.df)):
+            return self.build_chart()
+
+    def build_chart(self):
+        data = self.parse_data(row_lists=False)
+        downsampler = self.get_downsampler(data["columns"])
+        layouts = panel_layouts(self.panels)
+
+        grid_chart = charts.Grid(init_opts=opts.InitOpts(
+            height="%dpx" % layouts["height"],
             animation_opts=opts.AnimationOpts(animation=False),
         ))
 
-        data = self.parse_data()
+        xaxis_index = list(range(len(self.panels)))
+        for index, (panel, layout) in enumerate(zip(self.panels, layouts["panels"])):
+            with metrics.stage("build." + panel):
+                chart = self.build_panel(panel, index, data, downsampler)
+            if index == 0:
+                chart.set_global_opts(
+                    axispointer_opts=opts.AxisPointerOpts(
+                        is_show=True,
+                        link=[{"xAxisIndex": "all"}],
+                    ),
+                    datazoom_opts=[
+                        opts.DataZoomOpts(
+                            xaxis_index=xaxis_index,
+                            range_start=Config.ZOOM_RANGE_START_PERCENT,
+                            range_end=Config.ZOOM_RANGE_END_PERCENT
+                        ),
+                        opts.DataZoomOpts(
+                            type_="inside",
+                            xaxis_index=xaxis_index,
+                            range_start=Config.ZOOM_RANGE_START_PERCENT,
+                            range_end=Config.ZOOM_RANGE_END_PERCENT
+                        )
+                    ],
+                    legend_opts=opts.LegendOpts(
+                        type_="scroll",
+                        pos_left="right"
+                    )
+                )
+            else:
+                chart.set_global_opts(
+                    xaxis_opts=opts.AxisOpts(
+                        axislabel_opts=opts.LabelOpts(is_show=False),
+                    ),
+                    yaxis_opts=opts.AxisOpts(
+                        axislabel_opts=opts.LabelOpts(is_show=False),
+                    ),
+                    legend_opts=opts.LegendOpts(
+                        type_="scroll",
+                        pos_left="right",
+                        pos_top=layout["top"]
+                    )
+                )
 
-        candlestick_chart_index = 0
-        volume_bar_chart_index = 1
-        macd_chart_index = 2
-        kdj_chart_index = 3
-        xaxis_index = [candlestick_chart_index, volume_bar_chart_index, macd_chart_index, kdj_chart_index]
+            with metrics.stage("grid_add"):
+                grid_chart.add(chart, grid_opts=opts.GridOpts(
+                    pos_left="5%", pos_right="1%", pos_top=layout["top"], height=layout["height"]
+                ))
 
-        candlestick_chart = Candlestick(title="CANDLESTICK", x_date=data["str_dates"], y_data=data["candlestick_y_data"], xaxis_index=candlestick_chart_index).get_chart()
-        volume_bar_chart = VolumeBar(title="VOLUME", x_date=data["str_dates"], y_data=data["volume_bar_y_data"], xaxis_index=volume_bar_chart_index).get_chart()
-        macd_chart = MacdChart(title="MACD", x_date=data["str_dates"], close_prices=data["close_prices"], xaxis_index=macd_chart_index).get_chart()
-        kdj_chart = KdjLine(title="KDJ", x_date=data["str_dates"], high_prices=data["high_prices"], low_prices=data["low_prices"], close_prices=data["close_prices"], j_type="K-D", xaxis_index=kdj_chart_index, yaxis_index=kdj_chart_index).get_chart()
+        return grid_chart
 
-        candlestick_chart.set_global_opts(
-            axispointer_opts=opts.AxisPointerOpts(
-                is_show=True,
-                link=[{"xAxisIndex": "all"}],
-            ),
-            datazoom_opts=[
-                opts.DataZoomOpts(
-                    xaxis_index=xaxis_index,
-                    range_start=Config.ZOOM_RANGE_START_PERCENT,
-                    range_end=Config.ZOOM_RANGE_END_PERCENT
-                ),
-                opts.DataZoomOpts(
-                    type_="inside",
-                    xaxis_index=xaxis_index,
-                    range_start=Config.ZOOM_RANGE_START_PERCENT,
-                    range_end=Config.ZOOM_RANGE_END_PERCENT
-                )
-            ],
-            legend_opts=opts.LegendOpts(
-                type_="scroll",
-                pos_left="right"
-            )
-        )
+    def build_panel(self, panel, index, data, downsampler):
+        """
+        只构建选中的面板，未选中的面板不计算指标
+        """
+        columns = data["columns"]
+        if panel == "candlestick":
+            return Candlestick(title="CANDLESTICK", x_date=data["str_dates"], y_data=columns["candles"], xaxis_index=index, downsampler=downsampler).get_chart()
+        elif panel == "volume":
+            return VolumeBar.from_arrays(title="VOLUME", x_date=data["str_dates"], volumes=columns["volumes"], change_states=columns["change_states"], xaxis_index=index, downsampler=downsampler, indexes=columns["indexes"]).get_chart()
+        elif panel == "macd":
+            return MacdChart(title="MACD", x_date=data["str_dates"], close_prices=data["close_prices"], xaxis_index=index, downsampler=downsampler).get_chart()
+        elif panel == "kdj":
+            return KdjLine(title="KDJ", x_date=data["str_dates"], high_prices=data["high_prices"], low_prices=data["low_prices"], close_prices=data["close_prices"], j_type="K-D", xaxis_index=index, yaxis_index=index, downsampler=downsampler).get_chart()
+        raise ValueError("unknown panel: %s" % panel)
+
+    def cache_key(self, kind):
+        """
+        渲染缓存 key：数据内容哈希、影响版式和指标的配置、面板选项
+        数据哈希在实例上只计算一次，原地修改 df 后需新建 ProKline
+        """
+        self.flush_bars()
+        if self.digest is None:
+            self.digest = frame_digest(self.df)
+        return content_key(kind, self.title, self.digest, layout_key(), self.max_points, self.panels, indicator.engine_name())
 
-        volume_bar_chart.set_global_opts(
-            xaxis_opts=opts.AxisOpts(
-                axislabel_opts=opts.LabelOpts(is_show=False),
-            ),
-            yaxis_opts=opts.AxisOpts(
-                axislabel_opts=opts.LabelOpts(is_show=False),
-            ),
-            legend_opts=opts.LegendOpts(
-                type_="scroll",
-                pos_left="right",
-                pos_top="41%"
-            )
-        )
+    @staticmethod
+    def get_render_cache(use_cache):
+        """
+        :param use_cache: False 不缓存，True 使用 cache.render_cache，也可以传入 cache.RenderCache 实例
+        """
+        if use_cache is True:
+            return cache.render_cache
+        return use_cache or None
 
-        macd_chart.set_global_opts(
-            xaxis_opts=opts.AxisOpts(
-                axislabel_opts=opts.LabelOpts(is_show=False),
-            ),
-            yaxis_opts=opts.AxisOpts(
-                axislabel_opts=opts.LabelOpts(is_show=False),
-            ),
-            legend_opts=opts.LegendOpts(
-                type_="scroll",
-                pos_left="right",
-                pos_top="57%"
-            )
-        )
+    def render_embed(self, use_cache=False):
+        """
+        :return: 完整的 HTML 文本；命中缓存时原样返回，chart_id 与首次渲染相同
+        """
+        render_cache = self.get_render_cache(use_cache)
+        if render_cache is None:
+            return self.render_chart()
+        return render_cache.get_or_render(self.cache_key("embed"), self.render_chart)
+
+    def render_chart(self):
+        chart = self.get_chart()
+        with metrics.stage("render", rows=len(self.df)) as current:
+            html = chart.render_embed()
+            current.set(bytes=len(html))
+        return html
+
+    def render(self, path="render.html", use_cache=False):
+        """
+        与 pyecharts 的 render 输出相同的 HTML 文件
+        :return: 文件的绝对路径
+        """
+        return write_text(path, self.render_embed(use_cache))
 
-        kdj_chart.set_global_opts(
-            xaxis_opts=opts.AxisOpts(
-                axislabel_opts=opts.LabelOpts(is_show=False),
-            ),
-            yaxis_opts=opts.AxisOpts(
-                axislabel_opts=opts.LabelOpts(is_show=False),
-            ),
-            legend_opts=opts.LegendOpts(
-                type_="scroll",
-                pos_left="right",
-                pos_top="78%"
-            )
-        )
+    def render_notebook(self, use_cache=False):
+        render_cache = self.get_render_cache(use_cache)
+        if render_cache is None:
+            return self.get_chart().render_notebook()
 
-        grid_chart.add(candlestick_chart, grid_opts=opts.GridOpts(
-            pos_left="5%", pos_right="1%", height="30%"
-        ))
+        # 同一个 notebook 页面里多次输出，需要换上新的 chart_id
+        from IPython.display import HTML
+        key = self.cache_key("notebook:%s" % pyecharts_globals.CurrentConfig.NOTEBOOK_TYPE)
+        return HTML(renew_chart_id(render_cache.get_or_render(key, lambda: self.get_chart().render_notebook().data)))
 
-        grid_chart.add(volume_bar_chart, grid_opts=opts.GridOpts(
-            pos_left="5%", pos_right="1%", pos_top="41%", height="15%"
-        ))
+    async def aget_chart(self, renderer=None):
+        """
+        get_chart 的 asyncio 版本，在线程池中构建；相同数据和选项的并发请求共享同一个图表对象
+        :param renderer: aio.AsyncRenderer，默认 aio.async_renderer
+        """
+        renderer = renderer or aio.async_renderer
+        return await renderer.run(await self.acache_key("chart", renderer), self.get_chart)
 
-        grid_chart.add(macd_chart, grid_opts=opts.GridOpts(
-            pos_left="5%", pos_right="1%", pos_top="57%", height="20%"
-        ))
+    async def arender_embed(self, use_cache=False, renderer=None):
+        """
+        render_embed 的 asyncio 版本，命中渲染缓存时不进入线程池
+        """
+        renderer = renderer or aio.async_renderer
+        key = await self.acache_key("embed", renderer)
+        render_cache = self.get_render_cache(use_cache)
+        if render_cache is not None:
+            html = render_cache.get(key)
+            if html is not None:
+                return html
+        return await renderer.run(key, self.render_embed, use_cache)
+
+    async def arender(self, path="render.html", use_cache=False, renderer=None):
+        """
+        render 的 asyncio 版本
+        :return: 文件的绝对路径
+        """
+        renderer = renderer or aio.async_renderer
+        html = await self.arender_embed(use_cache, renderer)
+        return await renderer.call(write_text, path, html)
 
-        grid_chart.add(kdj_chart, grid_opts=opts.GridOpts(
-            pos_left="5%", pos_right="1%", pos_top="78%", height="15%"
-        ))
+    async def acache_key(self, kind, renderer):
+        # 第一次计算数据哈希需要读一遍全部数据，放到线程池
+        if self.digest is None or self.appended_bars:
+            return await renderer.call(self.cache_key, kind)
+        return self.cache_key(kind)
 
-        return grid_chart
 
-    def render_notebook(self):
-        return self.get_chart().render_notebook()
+def write_text(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return os.path.abspath(path)
 
+
+CHART_ID_PATTERN = re.compile(r"\bchart_([0-9a-f]{32})\b")
+
+
+def renew_chart_id(html):
+    """
+    缓存的 HTML 换上新的 chart_id，同一页面输出多份时 DOM id 不冲突
+    """
+    match = CHART_ID_PATTERN.search(html)
+    if match is None:
+        return html
+    return html.replace(match.group(1), uuid.uuid4().hex)
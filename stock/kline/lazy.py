@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+延迟导入：pyecharts、pandas、talib 导入较慢，只做数据准备或指标计算的进程用不到，
+第一次访问属性时才真正导入
+"""
+import importlib
+import importlib.util
+
+__author__ = "Hao Luo"
+
+
+class LazyModule:
+    """
+    opts = LazyModule("pyecharts.options")
+    opts.AxisOpts(...)  # 此时才导入 pyecharts.options
+    """
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            module = importlib.import_module(self.__dict__["_name"])
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        return "<lazy module %r>" % self.__dict__["_name"]
+
+
+def is_available(name):
+    """
+    模块是否已安装，不导入模块本身
+    """
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+图表生成各阶段的耗时、行数、输出字节数，交给可替换的 hook 处理
+默认关闭，关闭时 stage() 返回共享的空对象，开销只有一次函数调用
+"""
+import collections
+import threading
+import time
+import tracemalloc
+
+__author__ = "Hao Luo"
+
+
+# path 为嵌套的阶段名，如 get_chart/build.macd/indicator.MACD
+# allocated_bytes 为阶段内净分配的内存，只在开启 trace_allocations 时统计
+Measurement = collections.namedtuple("Measurement", ["stage", "path", "seconds", "rows", "bytes", "allocated_bytes"])
+
+hook = None
+trace_allocations = False
+started_tracemalloc = False  # tracemalloc 由这里启动时，关闭统计后一并停止
+local = threading.local()
+
+
+def set_hook(new_hook, allocations=False):
+    """
+    :param new_hook: 接收 Measurement 的函数，None 关闭统计
+    :param allocations: 用 tracemalloc 统计内存分配，开销较大，只在排查时打开
+    """
+    global hook, trace_allocations, started_tracemalloc
+    hook = new_hook
+    trace_allocations = bool(new_hook) and allocations
+    if trace_allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        started_tracemalloc = True
+    elif not trace_allocations and started_tracemalloc:
+        tracemalloc.stop()
+        started_tracemalloc = False
+
+
+def get_hook():
+    return hook
+
+
+class NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, rows=None, bytes=None):
+        pass
+
+
+NULL_STAGE = NullStage()
+
+
+class Stage:
+    name = ""
+    rows = None
+    bytes = None
+
+    def __init__(self, name, rows=None, bytes=None):
+        self.name = name
+        self.rows = rows
+        self.bytes = bytes
+
+    def set(self, rows=None, bytes=None):
+        """
+        阶段内才知道的行数、字节数
+        """
+        if rows is not None:
+            self.rows = rows
+        if bytes is not None:
+            self.bytes = bytes
+
+    def __enter__(self):
+        stack = getattr(local, "stack", None)
+        if stack is None:
+            stack = local.stack = []
+        stack.append(self.name)
+        self.path = "/".join(stack)
+        self.memory = tracemalloc.get_traced_memory()[0] if trace_allocations else None
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        allocated_bytes = None
+        if self.memory is not None:
+            allocated_bytes = tracemalloc.get_traced_memory()[0] - self.memory
+        local.stack.pop()
+        current_hook = hook
+        if current_hook is not None:
+            current_hook(Measurement(self.name, self.path, seconds, self.rows, self.bytes, allocated_bytes))
+        return False
+
+
+def stage(name, rows=None, bytes=None):
+    """
+    with metrics.stage("parse_data", rows=len(df)) as current:
+        ...
+        current.set(bytes=len(text))
+    """
+    if hook is None:
+        return NULL_STAGE
+    return Stage(name, rows, bytes)
+
+
+class StageStats:
+    """
+    按阶段汇总的 hook：次数、总耗时、最大耗时，可定期导出到 Prometheus 等监控系统
+    """
+
+    def __init__(self):
+        self.stats = {}  # path -> [count, total_seconds, max_seconds, total_rows, total_bytes]
+        self.lock = threading.Lock()
+
+    def __call__(self, measurement):
+        with self.lock:
+            item = self.stats.get(measurement.path)
+            if item is None:
+                item = self.stats[measurement.path] = [0, 0.0, 0.0, 0, 0]
+            item[0] += 1
+            item[1] += measurement.seconds
+            item[2] = max(item[2], measurement.seconds)
+            item[3] += measurement.rows or 0
+            item[4] += measurement.bytes or 0
+
+    def snapshot(self):
+        """
+        :return: {path: dict(count, total_seconds, max_seconds, rows, bytes)}
+        """
+        with self.lock:
+            return {path: dict(zip(("count", "total_seconds", "max_seconds", "rows", "bytes"), item))
+                    for path, item in self.stats.items()}
+
+    def report(self):
+        lines = ["%-64s %8s %12s %12s %12s" % ("stage", "count", "total(s)", "max(s)", "bytes")]
+        for path, item in sorted(self.snapshot().items()):
+            lines.append("%-64s %8d %12.4f %12.4f %12d" % (
+                path, item["count"], item["total_seconds"], item["max_seconds"], item["bytes"]))
+        return "\n".join(lines)
+
+    def clear(self):
+        with self.lock:
+            self.stats.clear()
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class LatencyBudget:
+    """
+    各阶段的耗时预算，超出时计数、保留最近 max_recent 条并调用 on_exceeded；strict 时抛出 BudgetExceeded
+    长期运行时只占用固定内存，需要完整记录时由 on_exceeded 自行保存
+    可与其它 hook 组合：set_hook(LatencyBudget(budgets, hook=StageStats()))
+    """
+
+    def __init__(self, budgets, hook=None, on_exceeded=None, strict=False, max_recent=100):
+        """
+        :param budgets: {阶段名或 path: 秒}
+        :param max_recent: exceeded 保留的最近超出记录数
+        """
+        self.budgets = dict(budgets)
+        self.hook = hook
+        self.on_exceeded = on_exceeded
+        self.strict = strict
+        self.exceeded = collections.deque(maxlen=max_recent)  # [Measurement]，最近的超出记录
+        self.exceeded_count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, measurement):
+        if self.hook is not None:
+            self.hook(measurement)
+        budget = self.budgets.get(measurement.path, self.budgets.get(measurement.stage))
+        if budget is None or measurement.seconds <= budget:
+            return
+
+        with self.lock:
+            self.exceeded.append(measurement)
+            self.exceeded_count += 1
+        if self.on_exceeded is not None:
+            self.on_exceeded(measurement, budget)
+        if self.strict:
+            raise BudgetExceeded("%s took %.4fs, budget %.4fs" % (measurement.path, measurement.seconds, budget))
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+多标的指标：二维面板（每行一个标的，每列一根K线）上按行一次算出 MA、MACD、KDJ，
+N 个标的只需几次整块的数组运算，不必逐个标的调用指标函数
+"""
+import numpy
+
+from . import algorithm, indicator
+from .stream import kdj_j
+
+__author__ = "Hao Luo"
+
+
+def as_panel(values):
+    """
+    :param values: 二维数组（标的 × K线），或宽表 DataFrame（行为日期、列为标的）
+    :return: (matrix, symbols, str_dates)，matrix 为 float64 的 标的 × K线
+    """
+    if hasattr(values, "columns"):
+        return values.to_numpy(dtype=numpy.float64).T.copy(), list(values.columns), values.index.to_numpy()
+    matrix = numpy.atleast_2d(numpy.asarray(values, dtype=numpy.float64))
+    return matrix, list(range(len(matrix))), None
+
+
+class IndicatorPanel:
+    """
+    按面板计算全部标的的指标，结果的每一行与 pyramid.indicator_series 中同名序列一致
+    所有标的需对齐到同一组日期，缺失（未上市、停牌）为 NaN，与 talib 一样跳过每行开头的 NaN
+    """
+    symbols = None
+    str_dates = None
+    close_prices = None  # 标的 × K线
+    high_prices = None
+    low_prices = None
+    volumes = None
+    close_ma_periods = None
+    volume_ma_periods = None
+    j_type = "K-D"
+
+    def __init__(self, close_prices, high_prices=None, low_prices=None, volumes=None,
+                 close_ma_periods=None, volume_ma_periods=None, j_type="K-D"):
+        """
+        :param close_prices: 收盘价面板，见 as_panel
+        :param high_prices: 最高价面板，计算 KDJ 时需要
+        :param low_prices: 最低价面板，计算 KDJ 时需要
+        :param volumes: 成交量面板，计算成交量均线时需要
+        :param close_ma_periods: 收盘价均线周期，默认与 ProKline 相同，取 Config.CLOSE_PRICE_MALINE_CONFIGS，
+                                 prime 后 ProKline 的均线才能命中缓存
+        :param volume_ma_periods: 成交量均线周期，默认取 Config.VOLUME_MALINE_CONFIGS
+        """
+        from .kline import ProKline
+        if close_ma_periods is None:
+            close_ma_periods = ProKline.close_ma_periods()
+        if volume_ma_periods is None:
+            volume_ma_periods = ProKline.volume_ma_periods()
+
+        self.close_prices, self.symbols, self.str_dates = as_panel(close_prices)
+        if high_prices is not None:
+            self.high_prices = as_panel(high_prices)[0]
+        if low_prices is not None:
+            self.low_prices = as_panel(low_prices)[0]
+        if volumes is not None:
+            self.volumes = as_panel(volumes)[0]
+
+        self.close_ma_periods = [int(period) for period in close_ma_periods]
+        self.volume_ma_periods = [int(period) for period in volume_ma_periods]
+        self.j_type = j_type
+        self.results = {}
+
+    def __len__(self):
+        return len(self.close_prices)
+
+    def close_mas(self):
+        """
+        :return: (len(close_ma_periods), 标的数, K线数)
+        """
+        if "close_mas" not in self.results:
+            self.results["close_mas"] = algorithm.ma_matrix(self.close_prices, self.close_ma_periods)
+        return self.results["close_mas"]
+
+    def volume_mas(self):
+        if self.volumes is None:
+            return None
+        if "volume_mas" not in self.results:
+            self.results["volume_mas"] = algorithm.ma_matrix(self.volumes, self.volume_ma_periods)
+        return self.results["volume_mas"]
+
+    def macd(self):
+        """
+        :return: (macd_dif, macd_signal, macd_hist)，均为 标的 × K线
+        """
+        if "macd" not in self.results:
+            self.results["macd"] = algorithm.macd(self.close_prices)
+        return self.results["macd"]
+
+    def kdj(self):
+        """
+        :return: (slow_k, slow_d, j)，没有最高最低价时为 None
+        """
+        if self.high_prices is None or self.low_prices is None:
+            return None
+        if "kdj" not in self.results:
+            slow_k, slow_d = algorithm.stoch(self.high_prices, self.low_prices, self.close_prices)
+            self.results["kdj"] = (slow_k, slow_d, kdj_j(slow_k, slow_d, self.j_type))
+        return self.results["kdj"]
+
+    def compute(self):
+        """
+        一次算出全部指标
+        """
+        self.close_mas()
+        self.volume_mas()
+        self.macd()
+        self.kdj()
+        return self
+
+    def index_of(self, symbol):
+        return self.symbols.index(symbol)
+
+    def series(self, symbol):
+        """
+        单个标的的全部指标序列，key 与图表中的 series_name 相同
+        """
+        i = self.index_of(symbol)
+        series = {}
+        for period, values in zip(self.close_ma_periods, self.close_mas()[:, i]):
+            series["MA%d" % period] = values
+        volume_mas = self.volume_mas()
+        if volume_mas is not None:
+            for period, values in zip(self.volume_ma_periods, volume_mas[:, i]):
+                series["VMA%d" % period] = values
+
+        series["DIF"], series["DEA"], series["HIST"] = (values[i] for values in self.macd())
+        kdj = self.kdj()
+        if kdj is not None:
+            series["K"], series["D"], series["J"] = (values[i] for values in kdj)
+        return series
+
+    def prime(self, symbol):
+        """
+        把该标的的结果放进指标缓存，之后用同样数据构建的 ProKline、MaLine、MacdChart、KdjLine 直接命中，不再重新计算
+        缓存按输入内容匹配，面板中该行需与图表数据中的对应列完全相同（包括长度）
+        面板由 NumPy 引擎（algorithm）计算，结果按 numpy 引擎放入缓存：indicator 选用 numpy 引擎时命中，
+        选用 talib 时仍由 talib 重新计算，不会拿到另一个引擎的结果
+        """
+        i = self.index_of(symbol)
+        close_prices = self.close_prices[i]
+        engine_name = "numpy"
+        indicator.prime("MA_MATRIX", (tuple(self.close_ma_periods), 0), (close_prices,), self.close_mas()[:, i], engine_name)
+        if self.volumes is not None:
+            indicator.prime("MA_MATRIX", (tuple(self.volume_ma_periods), 0), (self.volumes[i],), self.volume_mas()[:, i], engine_name)
+        indicator.prime("MACD", (12, 26, 9), (close_prices,), tuple(values[i] for values in self.macd()), engine_name)
+        kdj = self.kdj()
+        if kdj is not None:
+            indicator.prime(
+                "STOCH", (5, 3, 0, 3, 0), (self.high_prices[i], self.low_prices[i], close_prices),
+                (kdj[0][i], kdj[1][i]), engine_name,
+            )
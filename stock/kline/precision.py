@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+输出精度：价格按最小变动价位取整，指标保留有效数字，指标开头的 NaN 预热段不逐点输出
+取整用 numpy 按数组一次完成，得到的 float 的 repr 即为最短的十进制文本，输出时不再逐个格式化
+"""
+import decimal
+
+import numpy
+
+__author__ = "Hao Luo"
+
+
+def tick_decimals(tick):
+    """
+    最小变动价位的小数位数，0.01 为 2，0.005 为 3
+    """
+    return max(0, -decimal.Decimal(repr(float(tick))).normalize().as_tuple().exponent)
+
+
+def round_to_tick(values, tick):
+    """
+    四舍五入到 tick 的整数倍，再按 tick 的小数位数去掉二进制尾差
+    """
+    values = numpy.asarray(values, dtype=numpy.float64)
+    return numpy.round(numpy.round(values / tick) * tick, tick_decimals(tick))
+
+
+def round_significant(values, digits):
+    """
+    保留 digits 位有效数字，按数量级分组，每组一次 numpy.round
+    """
+    values = numpy.asarray(values, dtype=numpy.float64)
+    result = values.copy()
+    finite = numpy.isfinite(values) & (values != 0)
+    if not finite.any():
+        return result
+
+    decimals = numpy.zeros(len(values), dtype=numpy.int64)
+    decimals[finite] = digits - 1 - numpy.floor(numpy.log10(numpy.abs(values[finite]))).astype(numpy.int64)
+    for scale in numpy.unique(decimals[finite]).tolist():
+        selected = finite & (decimals == scale)
+        result[selected] = numpy.round(values[selected], scale)
+    return result
+
+
+def first_valid(values):
+    """
+    开头连续 NaN 的个数，全为 NaN 时为长度
+    """
+    values = numpy.asarray(values)
+    if values.dtype.kind != "f" or len(values) == 0:
+        return 0
+    valid = ~numpy.isnan(values)
+    return int(numpy.argmax(valid)) if valid.any() else len(values)
+
+
+def is_price_series(name):
+    """
+    与价格同一刻度的序列：K线、收盘价均线（MA5 等，成交量均线为 VMA5）
+    """
+    return name in ("candle", "open", "close", "low", "high") or name.startswith("MA")
+
+
+class Precision:
+    """
+    各序列的输出精度
+    """
+    price_tick = None  # 价格的最小变动价位，如 0.01；None 为完整精度
+    digits = None  # 指标保留的有效数字位数，如 4；None 为完整精度
+    trim_nan = False  # 折线开头的 NaN 不输出，由起始位置表示
+
+    def __init__(self, price_tick=None, digits=None, trim_nan=False):
+        self.price_tick = price_tick
+        self.digits = digits
+        self.trim_nan = trim_nan
+
+    def __repr__(self):
+        return "Precision(price_tick=%r, digits=%r, trim_nan=%r)" % (self.price_tick, self.digits, self.trim_nan)
+
+    def price(self, values):
+        if self.price_tick is None:
+            return values
+        return round_to_tick(values, self.price_tick)
+
+    def indicator(self, values):
+        if self.digits is None:
+            return values
+        return round_significant(values, self.digits)
+
+    def columns(self, columns):
+        """
+        data.parse_columns 返回中的价格列取整，涨跌状态仍按原始价格
+        """
+        if self.price_tick is None:
+            return columns
+        columns = dict(columns)
+        for name in ("open_prices", "close_prices", "low_prices", "high_prices", "preclose_prices"):
+            columns[name] = self.price(columns[name])
+        columns["candles"] = numpy.column_stack((columns["open_prices"], columns["close_prices"], columns["low_prices"], columns["high_prices"]))
+        return columns
+
+    def series(self, name, values):
+        """
+        按序列名取整，整数序列（成交量、涨跌状态）不变
+        """
+        if numpy.asarray(values).dtype.kind != "f":
+            return values
+        if is_price_series(name):
+            return self.price(values)
+        return self.indicator(values)
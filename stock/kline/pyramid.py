@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+多级分辨率金字塔：第 k 级每根K线由 4^k 根原始K线合并而成，按窗口取切片，
+首屏只需下发可见窗口和一份粗粒度全景
+只有 ProKline.get_initial_data / get_window 的数据接口按需加载；get_chart、render 仍输出完整历史
+（设了 max_points 时为降采样后的完整历史），不经过金字塔
+"""
+import threading
+
+import numpy
+
+from . import indicator
+from .downsample import LEVEL_BASE, aggregate_columns, bucket_ends
+
+__author__ = "Hao Luo"
+
+
+def indicator_series(columns, close_ma_periods, volume_ma_periods, j_type="K-D", panels=None):
+    """
+    原始精度的指标序列，key 与图表中的 series_name 相同
+    :param panels: 显示的面板，未显示面板的指标不计算；None 为全部
+    """
+    close_prices = columns["close_prices"]
+    series = {}
+    if panels is None or "candlestick" in panels:
+        for period, values in zip(close_ma_periods, indicator.ma_matrix(close_prices, close_ma_periods)):
+            series["MA%d" % period] = values
+    if panels is None or "volume" in panels:
+        for period, values in zip(volume_ma_periods, indicator.ma_matrix(columns["volumes"], volume_ma_periods)):
+            series["VMA%d" % period] = values
+
+    if panels is None or "macd" in panels:
+        series["DIF"], series["DEA"], series["HIST"] = indicator.macd(close_prices)
+
+    if panels is not None and "kdj" not in panels:
+        return series
+    slow_k, slow_d = indicator.stoch(columns["high_prices"], columns["low_prices"], close_prices)
+    series["K"] = slow_k
+    series["D"] = slow_d
+    if j_type == "3D-2K":
+        series["J"] = slow_d * 3 - slow_k * 2
+    elif j_type == "3K-2D":
+        series["J"] = slow_k * 3 - slow_d * 2
+    else:
+        series["J"] = slow_k - slow_d
+    return series
+
+
+def to_json_list(values):
+    values = numpy.asarray(values)
+    if values.dtype.kind == "f":
+        return numpy.where(numpy.isnan(values), None, values).tolist()
+    return values.tolist()
+
+
+class PyramidLevel:
+    factor = 1
+    columns = None  # 与 data.parse_columns 结构相同
+    series = None  # {series_name: numpy.ndarray}
+
+    def __init__(self, factor, columns, series):
+        self.factor = factor
+        self.columns = columns
+        self.series = series
+
+    def __len__(self):
+        return len(self.columns["close_prices"])
+
+
+class Pyramid:
+    """
+    OHLCV 按 aggregate_columns 合并；指标在原始精度上计算，
+    粗粒度级别取每根合并K线最后一根原始K线上的值，与合并后的收盘价对齐
+    """
+    rows = 0
+    base = LEVEL_BASE
+    levels = None
+    lock = None
+
+    def __init__(self, columns, series, min_points=500, base=LEVEL_BASE):
+        """
+        :param columns: data.parse_columns 的返回
+        :param series: indicator_series 的返回
+        :param min_points: 预先构建到最粗一级不少于这么多根；点数预算更小时由 choose_level 再往下构建
+        """
+        self.rows = len(columns["close_prices"])
+        self.base = base
+        self.levels = [PyramidLevel(1, columns, series)]
+        self.lock = threading.Lock()
+
+        factor = base
+        while (self.rows + factor - 1) // factor >= min_points:
+            self.levels.append(self.build_level(factor))
+            factor *= base
+
+    def build_level(self, factor):
+        columns = self.levels[0].columns
+        ends = bucket_ends(self.rows, factor)
+        return PyramidLevel(
+            factor,
+            aggregate_columns(columns, factor),
+            {name: values[ends] for name, values in self.levels[0].series.items()},
+        )
+
+    def choose_level(self, rows, max_points):
+        """
+        窗口内点数不超过 max_points 的最精细级别；已有级别都超出时继续构建更粗的级别
+        """
+        if max_points < 1:
+            raise ValueError("max_points must be positive, got %r" % max_points)
+        for level in self.levels:
+            if (rows + level.factor - 1) // level.factor <= max_points:
+                return level
+
+        with self.lock:
+            level = self.levels[-1]
+            while (rows + level.factor - 1) // level.factor > max_points:
+                level = self.build_level(level.factor * self.base)
+                self.levels.append(level)
+            return level
+
+    def window(self, start, end, max_points):
+        """
+        原始行区间 [start, end) 在合适级别上的切片，切片是视图，不复制数据
+        :return: dict(level, factor, start, end, columns, series)，start/end 为该级别下标
+        """
+        start = max(int(start), 0)
+        end = min(int(end), self.rows)
+        level = self.choose_level(max(end - start, 0), max_points)
+        level_start = start // level.factor
+        level_end = min((end + level.factor - 1) // level.factor, len(level))
+
+        return {
+            "level": self.levels.index(level),
+            "factor": level.factor,
+            "start": level_start,
+            "end": level_end,
+            "columns": {name: values[level_start:level_end] for name, values in level.columns.items()},
+            "series": {name: values[level_start:level_end] for name, values in level.series.items()},
+        }
+
+    def window_by_date(self, start_date, end_date, max_points):
+        """
+        按日期取窗口，日期为与 str_date 同格式的字符串，包含两端
+        """
+        str_dates = self.levels[0].columns["str_dates"]
+        start = numpy.searchsorted(str_dates, start_date, side="left")
+        end = numpy.searchsorted(str_dates, end_date, side="right")
+        return self.window(start, end, max_points)
+
+    def overview(self, max_points):
+        return self.window(0, self.rows, max_points)
+
+    @staticmethod
+    def to_json(window):
+        """
+        转为可直接下发给前端的结构，NaN 转为 null
+        """
+        columns = window["columns"]
+        hist = window["series"]["HIST"]
+        series = {name: to_json_list(values) for name, values in window["series"].items()}
+        series["HIST"] = [list(item) for item in zip(
+            range(window["start"], window["end"]),
+            to_json_list(hist),
+            numpy.where(hist < 0, -1, 1).tolist(),
+        )]
+        series["candle"] = to_json_list(columns["candles"])
+        series["volume"] = [list(item) for item in zip(
+            range(window["start"], window["end"]),
+            to_json_list(columns["volumes"]),
+            columns["change_states"].tolist(),
+        )]
+        return {
+            "level": window["level"],
+            "factor": window["factor"],
+            "start": window["start"],
+            "end": window["end"],
+            "str_dates": columns["str_dates"].tolist(),
+            "series": series,
+        }
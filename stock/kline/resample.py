@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+周期转换：1 分钟K线合并为 5/15/30/60 分钟、日、周、月K线
+按时间分段后用 reduceat 一次合并，不经过 pandas groupby；每个周期算过一次后缓存，
+切换周期只是查表，较粗的周期由已缓存的较细周期合并
+"""
+import numpy
+
+from . import metrics
+from .data import Bars, parse_columns
+from .downsample import aggregate_segments
+from .lazy import LazyModule
+
+__author__ = "Hao Luo"
+
+
+pandas = LazyModule("pandas")
+
+DAY = "day"
+WEEK = "week"
+MONTH = "month"
+
+# {周期名: 分钟数或日历周期}
+TIMEFRAMES = {
+    "1m": 1,
+    "5m": 5,
+    "15m": 15,
+    "30m": 30,
+    "60m": 60,
+    "1h": 60,
+    "day": DAY,
+    "week": WEEK,
+    "month": MONTH,
+}
+
+# A 股交易时段，当天的分钟数 [start, end)
+SESSIONS = ((9 * 60 + 30, 11 * 60 + 30), (13 * 60, 15 * 60))
+
+
+def parse_times(str_dates):
+    """
+    日期字符串转为 datetime64[m]，如 "2020-01-02 09:31"、"2020-01-02"
+    """
+    str_dates = numpy.asarray(str_dates)
+    if str_dates.dtype.kind == "S":
+        str_dates = numpy.char.decode(str_dates, "ascii")
+    return pandas.to_datetime(str_dates, format="ISO8601").to_numpy().astype("datetime64[m]")
+
+
+def session_minutes(minutes_of_day, sessions=SESSIONS):
+    """
+    开盘后经过的交易分钟数，午休不计；sessions 为 None 时按自然时间
+    """
+    if sessions is None:
+        return minutes_of_day
+    elapsed = numpy.zeros_like(minutes_of_day)
+    for start, end in sessions:
+        elapsed += numpy.clip(minutes_of_day - start, 0, end - start)
+    return elapsed
+
+
+def bucket_keys(times, timeframe, sessions=SESSIONS):
+    """
+    每根K线所属的目标周期，相同 key 的相邻K线合并为一根
+    分钟K线按结束时间标记（9:31 为 9:30-9:31 这一分钟），按开盘后的交易分钟数分段，
+    60 分钟K线即 9:30-10:30、10:30-11:30、13:00-14:00、14:00-15:00；集合竞价的 9:30 并入第一段
+    :param times: datetime64[m]
+    :return: int64 数组
+    """
+    step = TIMEFRAMES[timeframe]
+    days = times.astype("datetime64[D]")
+    if step == MONTH:
+        return times.astype("datetime64[M]").astype(numpy.int64)
+    day_numbers = days.astype(numpy.int64)
+    if step == WEEK:
+        # 1970-01-01 是星期四，错开 3 天后以星期一为一周的开始
+        return (day_numbers + 3) // 7
+    if step == DAY:
+        return day_numbers
+
+    minutes_of_day = (times - days).astype(numpy.int64)
+    buckets = numpy.maximum(session_minutes(minutes_of_day, sessions) - 1, 0) // step
+    return day_numbers * (24 * 60) + buckets
+
+
+def segment_starts(keys):
+    """
+    key 变化处即新的一段
+    """
+    if len(keys) == 0:
+        return numpy.empty(0, dtype=numpy.int64)
+    return numpy.flatnonzero(numpy.r_[True, keys[1:] != keys[:-1]])
+
+
+def can_derive(timeframe, source):
+    """
+    target 周期能否由 source 周期的K线合并得到：每根 source K线须完整落在一根 target K线里
+    """
+    step, source_step = TIMEFRAMES[timeframe], TIMEFRAMES[source]
+    if isinstance(step, int):
+        return isinstance(source_step, int) and step % source_step == 0
+    if isinstance(source_step, int):
+        return True
+    return source_step == DAY or source_step == step
+
+
+class Level:
+    """
+    一个周期的K线
+    """
+    columns = None  # 与 data.parse_columns 的返回结构相同
+    times = None  # 每根K线首根原始K线的时间，用于继续合并为更粗的周期
+
+    def __init__(self, columns, times):
+        self.columns = columns
+        self.times = times
+
+    def __len__(self):
+        return len(self.columns["close_prices"])
+
+
+class Resampler:
+    """
+    一份分钟K线的各周期视图，每个周期合并一次后缓存
+    原始K线须按时间升序
+    """
+    intraday = True  # 原始K线是否为分钟K线
+    sessions = SESSIONS
+
+    def __init__(self, df, sessions=SESSIONS):
+        """
+        :param df: 与 ProKline 的 df 相同，pandas.DataFrame、store.StoreWindow 或 data.Bars
+        :param sessions: 交易时段 ((开始分钟, 结束分钟), ...)，None 为按自然时间分段（如 24 小时交易的品种）
+        """
+        columns = parse_columns(df)
+        times = parse_times(columns["str_dates"])
+        self.sessions = sessions
+        self.intraday = bool(len(times)) and bool((times != times.astype("datetime64[D]")).any())
+        # 原始K线是分钟线时为 1 分钟周期，否则视为日线
+        self.base = "1m" if self.intraday else DAY
+        self.levels = {self.base: Level(columns, times)}
+
+    def get(self, timeframe):
+        """
+        :param timeframe: TIMEFRAMES 中的周期名
+        :return: 该周期的K线，结构与 data.parse_columns 的返回相同
+        """
+        return self.get_level(timeframe).columns
+
+    def get_level(self, timeframe):
+        if timeframe not in TIMEFRAMES:
+            raise ValueError("unknown timeframe %r, expected one of %s" % (timeframe, list(TIMEFRAMES)))
+        if timeframe == "1h":
+            timeframe = "60m"
+        level = self.levels.get(timeframe)
+        if level is not None:
+            return level
+        if not can_derive(timeframe, self.base):
+            raise ValueError("timeframe %r needs minute bars, got daily bars" % timeframe)
+
+        # 从已缓存的周期中选根数最少的一个继续合并
+        sources = [self.levels[name] for name in self.levels if can_derive(timeframe, name)]
+        source = min(sources, key=len)
+        with metrics.stage("resample." + timeframe, rows=len(source)):
+            level = self.aggregate(source, timeframe)
+        self.levels[timeframe] = level
+        return level
+
+    def aggregate(self, source, timeframe):
+        if len(source) == 0:
+            return source
+
+        starts = segment_starts(bucket_keys(source.times, timeframe, self.sessions))
+        # 分钟K线以末根的时间标记，日、周、月K线以最后一个交易日标记
+        columns = aggregate_segments(source.columns, starts, label="last")
+        if not isinstance(TIMEFRAMES[timeframe], int):
+            columns["str_dates"] = columns["str_dates"].astype(str).astype("U10").astype(object)
+        return Level(columns, source.times[starts])
+
+    def bars(self, timeframe):
+        """
+        :return: data.Bars，可直接作为 ProKline 的 df
+        """
+        columns = self.get(timeframe)
+        return Bars({
+            "str_date": columns["str_dates"],
+            "open_price": columns["open_prices"],
+            "close_price": columns["close_prices"],
+            "low_price": columns["low_prices"],
+            "high_price": columns["high_prices"],
+            "preclose_price": columns["preclose_prices"],
+            "volume": columns["volumes"],
+        })
+
+    def clear(self):
+        """
+        只保留原始K线
+        """
+        self.levels = {self.base: self.levels[self.base]}
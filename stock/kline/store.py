@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+磁盘列式K线存储：每列一个定长二进制文件，用 numpy.memmap 打开，
+按日期区间取窗口时只映射需要的部分，不经过 pandas 全量加载
+
+目录结构：
+    meta.json        行数、各列类型
+    str_date.bin     定长字节串，升序，兼作日期索引
+    open_price.bin   ...
+"""
+import json
+import os
+
+import numpy
+
+from .data import COLUMNS, PRICE_COLUMNS, build_columns
+from .lazy import LazyModule
+
+__author__ = "Hao Luo"
+
+
+pandas = LazyModule("pandas")
+
+META_FILE = "meta.json"
+DATE_WIDTH = 19  # "YYYY-MM-DD HH:MM:SS"
+
+PRICE_DTYPE = "<f8"
+
+
+def column_path(path, name):
+    return os.path.join(path, name + ".bin")
+
+
+def read_meta(path):
+    with open(os.path.join(path, META_FILE)) as f:
+        return json.load(f)
+
+
+def read_versioned_meta(path):
+    """
+    :return: (meta, version)，version 取自同一个打开的 meta.json：每次写入都替换 meta.json，inode 和修改时间随之变化
+    """
+    with open(os.path.join(path, META_FILE)) as f:
+        stat = os.fstat(f.fileno())
+        return json.load(f), "%d:%d" % (stat.st_ino, stat.st_mtime_ns)
+
+
+def write_meta(path, meta):
+    # 先写临时文件再替换，写入中途失败时旧的 meta 仍然有效
+    temp_path = os.path.join(path, META_FILE + ".tmp")
+    with open(temp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(temp_path, os.path.join(path, META_FILE))
+
+
+def frame_columns(df, dtypes, date_width):
+    """
+    DataFrame 转为各列的定长数组
+    """
+    str_dates = df["str_date"].astype(str)
+    if len(str_dates) and str_dates.str.len().max() > date_width:
+        raise ValueError("str_date longer than %d characters" % date_width)
+
+    result = {"str_date": str_dates.to_numpy().astype("S%d" % date_width)}
+    for name in COLUMNS[1:]:
+        result[name] = df[name].to_numpy(dtype=dtypes[name])
+    return result
+
+
+def check_ascending(str_dates):
+    if numpy.any(str_dates[1:] < str_dates[:-1]):
+        raise ValueError("str_date must be in ascending order")
+
+
+def write_frame(df, path, date_width=DATE_WIDTH):
+    """
+    把 DataFrame 写为新的存储，已存在的存储会被覆盖
+    各列先写临时文件再替换，已打开的 OhlcvStore、StoreWindow 仍映射旧文件，数据不受影响
+    :param df: pandas.DataFrame，列与 ProKline 的 DataFrame 相同，按 str_date 升序
+    :return: OhlcvStore
+    """
+    volume_dtype = "<i8" if df["volume"].dtype.kind in "iub" else "<f8"
+    dtypes = dict({name: PRICE_DTYPE for name in PRICE_COLUMNS}, volume=volume_dtype)
+    columns = frame_columns(df, dtypes, date_width)
+    check_ascending(columns["str_date"])
+
+    os.makedirs(path, exist_ok=True)
+    for name in COLUMNS:
+        temp_path = column_path(path, name) + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(numpy.ascontiguousarray(columns[name]).tobytes())
+        os.replace(temp_path, column_path(path, name))
+
+    write_meta(path, {"rows": len(columns["str_date"]), "date_width": date_width, "dtypes": dtypes})
+    return OhlcvStore(path)
+
+
+def append_frame(df, path):
+    """
+    在已有存储末尾追加K线，日期需晚于已有的最后一根；要改写最后一根需重新 write_frame
+    :return: OhlcvStore
+    """
+    meta = read_meta(path)
+    columns = frame_columns(df, meta["dtypes"], meta["date_width"])
+    str_dates = columns["str_date"]
+    if len(str_dates) == 0:
+        return OhlcvStore(path)
+    check_ascending(str_dates)
+    if meta["rows"]:
+        last_date = OhlcvStore(path).dates[-1]
+        # 与最后一根日期相同会重复这根K线
+        if str_dates[0] <= last_date:
+            raise ValueError("appended str_date %s is not after the last stored %s" % (str_dates[0].decode(), last_date.decode()))
+
+    # 追加前按 meta 的行数截断，上次写入中途失败留下的尾部被丢弃
+    for name in COLUMNS:
+        values = columns[name]
+        with open(column_path(path, name), "r+b") as f:
+            f.truncate(meta["rows"] * values.dtype.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(numpy.ascontiguousarray(values).tobytes())
+
+    meta["rows"] += len(str_dates)
+    write_meta(path, meta)
+    return OhlcvStore(path)
+
+
+def convert_csv(csv_path, path, chunksize=1000000, date_width=DATE_WIDTH):
+    """
+    按块读取 CSV 写入存储，内存占用与 chunksize 成正比，不随文件大小增长
+    :return: OhlcvStore
+    """
+    store = None
+    for chunk in pandas.read_csv(csv_path, usecols=COLUMNS, chunksize=chunksize, dtype={"str_date": str}):
+        if store is None:
+            store = write_frame(chunk, path, date_width)
+        else:
+            store = append_frame(chunk, path)
+    if store is None:
+        raise ValueError("%s has no rows" % csv_path)
+    return store
+
+
+class OhlcvStore:
+    """
+    只读打开的存储，各列为 numpy.memmap
+    """
+    path = None
+    rows = 0
+    columns = None  # {name: numpy.memmap}
+    version = None  # 打开时 meta.json 的版本，之后重写存储不影响已打开的实例
+
+    def __init__(self, path):
+        meta, self.version = read_versioned_meta(path)
+        self.path = path
+        self.rows = meta["rows"]
+        dtypes = dict(meta["dtypes"], str_date="S%d" % meta["date_width"])
+
+        self.columns = {}
+        for name in COLUMNS:
+            if self.rows == 0:
+                self.columns[name] = numpy.empty(0, dtype=dtypes[name])
+            else:
+                self.columns[name] = numpy.memmap(column_path(path, name), dtype=dtypes[name], mode="r", shape=(self.rows,))
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def dates(self):
+        return self.columns["str_date"]
+
+    def locate(self, start_date=None, end_date=None):
+        """
+        日期区间 [start_date, end_date] 对应的行区间，二分查找日期列，只读取很少几页
+        """
+        start = 0 if start_date is None else int(numpy.searchsorted(self.dates, str(start_date).encode(), side="left"))
+        end = self.rows if end_date is None else int(numpy.searchsorted(self.dates, str(end_date).encode(), side="right"))
+        return start, max(start, end)
+
+    def window(self, start_date=None, end_date=None):
+        """
+        按日期取窗口，包含两端，None 为不限
+        :return: StoreWindow，可直接作为 ProKline 的 df
+        """
+        return StoreWindow(self, *self.locate(start_date, end_date))
+
+    def tail(self, rows):
+        """
+        最后 rows 根K线
+        """
+        return StoreWindow(self, max(self.rows - rows, 0), self.rows)
+
+
+class StoreWindow:
+    """
+    存储的一个行区间，各列是 memmap 的切片，不复制数据
+    data.parse_columns 可直接解析，价格列为只读 float64，指标缓存按对象复用哈希
+    """
+    store = None
+    start = 0
+    end = 0
+
+    def __init__(self, store, start, end):
+        self.store = store
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return self.end - self.start
+
+    def column(self, name):
+        return self.store.columns[name][self.start:self.end]
+
+    def parse_columns(self):
+        """
+        :return: 与 data.parse_columns 相同的结构
+        """
+        return build_columns(
+            numpy.arange(len(self)),
+            numpy.char.decode(self.column("str_date"), "ascii").astype(object),
+            *[numpy.asarray(self.column(name)) for name in PRICE_COLUMNS],
+            numpy.asarray(self.column("volume"))
+        )
+
+    def digest(self):
+        """
+        按存储打开时的版本计算：重写后已打开的窗口仍映射旧文件，与新打开的窗口 key 不同
+        """
+        store = self.store
+        return "store:%s:%s:%d:%d:%d" % (os.path.abspath(store.path), store.version, store.rows, self.start, self.end)
+
+    def to_frame(self):
+        """
+        读入内存的 DataFrame，用于需要改写数据的场景（如追加K线）
+        """
+        columns = {name: numpy.array(self.column(name)) for name in COLUMNS}
+        columns["str_date"] = numpy.char.decode(columns["str_date"], "ascii").astype(object)
+        return pandas.DataFrame(columns, columns=COLUMNS)
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+增量指标状态：每来一根新K线只做O(1)更新，返回各序列变化的尾部
+改写最后一根K线时，各状态由 append 前记下的少量标量恢复，不复制窗口
+"""
+import collections
+import math
+
+__author__ = "Hao Luo"
+
+
+NAN = float("nan")
+
+
+def to_json_value(value):
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+class SmaState:
+    """
+    简单移动平均，与 talib.MA(matype=0) 一致
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.window = collections.deque()
+        self.total = 0.0
+        self.count = 0
+
+    def snapshot(self):
+        """
+        :return: (count, total, 下一次 update 会移出窗口的值)
+        """
+        head = self.window[0] if len(self.window) == self.period else None
+        return self.count, self.total, head
+
+    def restore(self, snapshot):
+        """
+        撤销 snapshot 之后的那一次 update
+        """
+        count, total, head = snapshot
+        if self.count != count:
+            self.window.pop()
+            if head is not None:
+                self.window.appendleft(head)
+        self.count, self.total = count, total
+
+    def update(self, value):
+        self.count += 1
+        self.window.append(value)
+        self.total += value
+        if len(self.window) > self.period:
+            self.total -= self.window.popleft()
+
+        if len(self.window) < self.period:
+            return NAN
+        return self.total / self.period
+
+
+class MacdState:
+    """
+    MACD，与 talib.MACD 一致：
+    慢线在第 slowperiod 根以简单平均起算，快线在同一根以最近 fastperiod 根的平均起算，
+    DEA 以前 signalperiod 个 DIF 的平均起算
+    """
+
+    def __init__(self, fastperiod=12, slowperiod=26, signalperiod=9):
+        if slowperiod < fastperiod:
+            fastperiod, slowperiod = slowperiod, fastperiod
+
+        self.fastperiod = fastperiod
+        self.slowperiod = slowperiod
+        self.signalperiod = signalperiod
+        self.fast_k = 2.0 / (fastperiod + 1)
+        self.slow_k = 2.0 / (slowperiod + 1)
+        self.signal_k = 2.0 / (signalperiod + 1)
+
+        self.warmup = collections.deque(maxlen=slowperiod)
+        self.fast = None
+        self.slow = None
+        self.signal_warmup = []
+        self.signal = None
+
+    def snapshot(self):
+        """
+        起算前的预热值不超过 slowperiod + signalperiod 个，起算后只有标量
+        """
+        warmup = tuple(self.warmup) if self.slow is None else None
+        signal_warmup = tuple(self.signal_warmup) if self.signal is None else None
+        return self.fast, self.slow, self.signal, warmup, signal_warmup
+
+    def restore(self, snapshot):
+        self.fast, self.slow, self.signal, warmup, signal_warmup = snapshot
+        if warmup is not None:
+            self.warmup.clear()
+            self.warmup.extend(warmup)
+        if signal_warmup is not None:
+            self.signal_warmup = list(signal_warmup)
+
+    def update(self, close_price):
+        """
+        :return: (dif, dea, hist)
+        """
+        if self.slow is None:
+            self.warmup.append(close_price)
+            if len(self.warmup) < self.slowperiod:
+                return NAN, NAN, NAN
+
+            values = list(self.warmup)
+            self.slow = sum(values) / self.slowperiod
+            self.fast = sum(values[-self.fastperiod:]) / self.fastperiod
+            self.warmup.clear()
+        else:
+            self.fast += (close_price - self.fast) * self.fast_k
+            self.slow += (close_price - self.slow) * self.slow_k
+
+        dif = self.fast - self.slow
+        if self.signal is None:
+            self.signal_warmup.append(dif)
+            if len(self.signal_warmup) < self.signalperiod:
+                return NAN, NAN, NAN
+
+            self.signal = sum(self.signal_warmup) / self.signalperiod
+            self.signal_warmup = []
+        else:
+            self.signal += (dif - self.signal) * self.signal_k
+
+        return dif, self.signal, dif - self.signal
+
+
+class StochState:
+    """
+    慢速随机指标，与 talib.STOCH（均线类型为SMA）一致：
+    slowK、slowD 都从第 fastk_period + slowk_period + slowd_period - 2 根开始有值
+    """
+
+    def __init__(self, fastk_period=5, slowk_period=3, slowd_period=3):
+        self.highs = collections.deque(maxlen=fastk_period)
+        self.lows = collections.deque(maxlen=fastk_period)
+        self.slow_k = SmaState(slowk_period)
+        self.slow_d = SmaState(slowd_period)
+
+    def snapshot(self):
+        full = len(self.highs) == self.highs.maxlen
+        heads = (self.highs[0], self.lows[0]) if full else None
+        return heads, self.slow_k.snapshot(), self.slow_d.snapshot()
+
+    def restore(self, snapshot):
+        heads, slow_k, slow_d = snapshot
+        self.highs.pop()
+        self.lows.pop()
+        if heads is not None:
+            self.highs.appendleft(heads[0])
+            self.lows.appendleft(heads[1])
+        self.slow_k.restore(slow_k)
+        self.slow_d.restore(slow_d)
+
+    def update(self, high_price, low_price, close_price):
+        """
+        :return: (slow_k, slow_d)
+        """
+        self.highs.append(high_price)
+        self.lows.append(low_price)
+        if len(self.highs) < self.highs.maxlen:
+            return NAN, NAN
+
+        lowest = min(self.lows)
+        diff = (max(self.highs) - lowest) / 100.0
+        fast_k = (close_price - lowest) / diff if diff != 0 else 0.0
+
+        slow_k = self.slow_k.update(fast_k)
+        if math.isnan(slow_k):
+            return NAN, NAN
+        slow_d = self.slow_d.update(slow_k)
+        # talib 的两条线从同一根开始输出，slowD 起算前 slowK 也不输出
+        if math.isnan(slow_d):
+            return NAN, NAN
+        return slow_k, slow_d
+
+
+def kdj_j(slow_k, slow_d, j_type):
+    if j_type == "3D-2K":
+        return slow_d * 3 - slow_k * 2
+    elif j_type == "3K-2D":
+        return slow_k * 3 - slow_d * 2
+    return slow_k - slow_d
+
+
+class KlineStream:
+    """
+    ProKline 的增量状态
+    append 追加一根K线，update_last 改写最后一根；两者都只返回变化的那一个点：
+    {
+        "index": idx,
+        "str_date": str_date,
+        "series": {"candle": [...], "volume": [...], "MA5": value, ..., "K": value, ...}
+    }
+    series 的 key 与图表中的 series_name 相同，前端可直接写入已有 ECharts 实例
+    """
+
+    def __init__(self, close_ma_periods, volume_ma_periods, j_type="K-D"):
+        self.close_ma_periods = list(close_ma_periods)
+        self.volume_ma_periods = list(volume_ma_periods)
+        self.j_type = j_type
+
+        self.close_mas = [SmaState(period) for period in self.close_ma_periods]
+        self.volume_mas = [SmaState(period) for period in self.volume_ma_periods]
+        self.macd = MacdState()
+        self.stoch = StochState()
+        self.count = 0
+        self.last_states = None
+
+    def warm(self, columns):
+        """
+        用历史数据初始化状态。均线、KDJ只需尾部窗口，MACD的EMA需遍历全部收盘价。
+        最后一根K线按 append 处理，之后可直接 update_last 改写它
+        :param columns: data.parse_columns 的返回
+        """
+        close_prices = columns["close_prices"].tolist()
+        if not close_prices:
+            return
+
+        volumes = columns["volumes"].tolist()
+        high_prices = columns["high_prices"].tolist()
+        low_prices = columns["low_prices"].tolist()
+        last = len(close_prices) - 1
+
+        for period, state in zip(self.close_ma_periods, self.close_mas):
+            for value in close_prices[max(last - period, 0):last]:
+                state.update(value)
+        for period, state in zip(self.volume_ma_periods, self.volume_mas):
+            for value in volumes[max(last - period, 0):last]:
+                state.update(value)
+
+        for value in close_prices[:last]:
+            self.macd.update(value)
+
+        tail = max(last - (self.stoch.highs.maxlen + self.stoch.slow_k.period + self.stoch.slow_d.period), 0)
+        for i in range(tail, last):
+            self.stoch.update(high_prices[i], low_prices[i], close_prices[i])
+
+        self.count = last
+        self.append({
+            "str_date": columns["str_dates"][last],
+            "open_price": columns["open_prices"][last].item(),
+            "close_price": close_prices[last],
+            "low_price": low_prices[last],
+            "high_price": high_prices[last],
+            "preclose_price": columns["preclose_prices"][last].item(),
+            "volume": volumes[last],
+        })
+
+    def states(self):
+        return self.close_mas + self.volume_mas + [self.macd, self.stoch]
+
+    def snapshot(self):
+        return [state.snapshot() for state in self.states()]
+
+    def restore(self, snapshots):
+        for state, snapshot in zip(self.states(), snapshots):
+            state.restore(snapshot)
+
+    def append(self, bar):
+        """
+        :param bar: dict，列与 ProKline 的 DataFrame 相同
+        """
+        self.last_states = self.snapshot()
+        delta = self._apply(self.count, bar)
+        self.count += 1
+        return delta
+
+    def update_last(self, bar):
+        if self.last_states is None:
+            raise ValueError("no appended bar to update")
+
+        # 先撤销上一次 append，再按新的K线重新更新；快照不变，可以反复改写
+        self.restore(self.last_states)
+        return self._apply(self.count - 1, bar)
+
+    def _apply(self, idx, bar):
+        close_price = bar["close_price"]
+        change_state = -1 if close_price < bar["preclose_price"] else 1
+
+        series = {
+            "candle": [bar["open_price"], close_price, bar["low_price"], bar["high_price"]],
+            "volume": [idx, bar["volume"], change_state],
+        }
+        for period, state in zip(self.close_ma_periods, self.close_mas):
+            series["MA%d" % period] = state.update(close_price)
+        for period, state in zip(self.volume_ma_periods, self.volume_mas):
+            series["VMA%d" % period] = state.update(bar["volume"])
+
+        dif, dea, hist = self.macd.update(close_price)
+        series["DIF"] = dif
+        series["DEA"] = dea
+        series["HIST"] = [idx, hist, -1 if hist < 0 else 1]
+
+        slow_k, slow_d = self.stoch.update(bar["high_price"], bar["low_price"], close_price)
+        series["K"] = slow_k
+        series["D"] = slow_d
+        series["J"] = kdj_j(slow_k, slow_d, self.j_type)
+
+        for name, value in series.items():
+            if isinstance(value, list):
+                series[name] = [to_json_value(item) for item in value]
+            else:
+                series[name] = to_json_value(value)
+
+        return {
+            "index": idx,
+            "str_date": bar["str_date"],
+            "series": series,
+        }
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+测试用K线数据和逐行解析的对照实现
+与 benchmarks 中的同名函数分开维护，基准测试改动数据时不影响测试检查的内容
+"""
+import numpy
+import pandas
+
+__author__ = "Hao Luo"
+
+
+MINUTES_PER_DAY = 240  # A 股每个交易日 4 小时
+
+
+def make_frame(rows, seed=0):
+    """
+    连续的分钟K线（不分交易时段），收盘价为随机游走，成交量为整数
+    """
+    random = numpy.random.default_rng(seed)
+    close_prices = 10 + numpy.cumsum(random.normal(0, 0.1, rows))
+    open_prices = close_prices + random.normal(0, 0.05, rows)
+    return pandas.DataFrame({
+        "str_date": pandas.date_range("1990-01-01", periods=rows, freq="min").strftime("%Y-%m-%d %H:%M"),
+        "open_price": open_prices,
+        "close_price": close_prices,
+        "low_price": numpy.minimum(open_prices, close_prices) - 0.1,
+        "high_price": numpy.maximum(open_prices, close_prices) + 0.1,
+        "preclose_price": numpy.r_[close_prices[0], close_prices[:-1]],
+        "volume": random.integers(100, 100000, rows),
+    })
+
+
+def trading_dates(rows, profile="minute"):
+    """
+    工作日日历；分钟线每天 9:30-11:30、13:00-15:00，以每分钟的结束时间标记
+    """
+    if profile == "daily":
+        return pandas.bdate_range("1990-12-19", periods=rows).strftime("%Y-%m-%d").to_numpy()
+
+    days = pandas.bdate_range("1990-12-19", periods=(rows + MINUTES_PER_DAY - 1) // MINUTES_PER_DAY)
+    minutes = numpy.r_[numpy.arange(9 * 60 + 31, 11 * 60 + 31), numpy.arange(13 * 60 + 1, 15 * 60 + 1)]
+    times = pandas.to_timedelta(minutes, unit="min")
+    stamps = (days.to_numpy()[:, None] + times.to_numpy()[None, :]).ravel()[:rows]
+    return pandas.DatetimeIndex(stamps).strftime("%Y-%m-%d %H:%M").to_numpy()
+
+
+def session_frame(rows, profile="minute", seed=0):
+    """
+    按交易日历的K线，价格保留两位小数
+    """
+    random = numpy.random.default_rng(seed)
+    volatility = 0.02 if profile == "daily" else 0.002
+    close_prices = 10 * numpy.exp(numpy.cumsum(random.normal(0, volatility, rows)))
+    preclose_prices = numpy.r_[close_prices[0], close_prices[:-1]]
+    open_prices = preclose_prices * (1 + random.normal(0, volatility / 4, rows))
+    spread = numpy.abs(random.normal(0, volatility / 2, rows)) * close_prices
+    return pandas.DataFrame({
+        "str_date": trading_dates(rows, profile),
+        "open_price": open_prices.round(2),
+        "close_price": close_prices.round(2),
+        "low_price": (numpy.minimum(open_prices, close_prices) - spread).round(2),
+        "high_price": (numpy.maximum(open_prices, close_prices) + spread).round(2),
+        "preclose_price": preclose_prices.round(2),
+        "volume": random.lognormal(10, 1, rows).astype(numpy.int64),
+    })
+
+
+def parse_data_iterrows(df):
+    """
+    原逐行解析实现，作为对照
+    """
+    str_dates = []
+    candlestick_y_data = []
+    volume_bar_y_data = []
+    for idx, item in df.iterrows():
+        str_dates.append(item["str_date"])
+        candlestick_y_data.append([
+            item["open_price"],
+            item["close_price"],
+            item["low_price"],
+            item["high_price"]
+        ])
+
+        change_state = 1
+        if item["close_price"] < item["preclose_price"]:
+            change_state = -1
+
+        volume_bar_y_data.append([idx, item["volume"], change_state])
+
+    return {
+        "str_dates": str_dates,
+        "candlestick_y_data": candlestick_y_data,
+        "volume_bar_y_data": volume_bar_y_data,
+    }
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+批量渲染：工作进程崩溃只记为该标的失败，进程池重建后继续其余标的
+"""
+import os
+
+from frames import make_frame
+from stock.kline.batch import render_batch
+
+__author__ = "Hao Luo"
+
+
+class Crash:
+    """
+    在工作进程中反序列化时直接退出进程，模拟段错误、OOM
+    """
+
+    def __reduce__(self):
+        return os._exit, (1,)
+
+
+def test_crash_fails_only_that_symbol(tmp_path):
+    df = make_frame(100)
+    jobs = [("S%d" % i, df) for i in range(6)]
+    jobs.insert(2, ("CRASH", Crash()))
+    results = []
+    report = render_batch(jobs, str(tmp_path), workers=2, output_format="json", on_result=results.append)
+
+    assert report.total == len(jobs) == len(results)
+    assert report.succeeded == len(jobs) - 1
+    assert [failure.title for failure in report.failures] == ["CRASH"]
+    assert "BrokenProcessPool" in report.failures[0].error
+    assert len(os.listdir(str(tmp_path))) == len(jobs) - 1
+
+
+def test_repeated_crashes(tmp_path):
+    df = make_frame(50)
+    jobs = [("CRASH%d" % i, Crash()) if i % 3 == 0 else ("S%d" % i, df) for i in range(10)]
+    report = render_batch(jobs, str(tmp_path), workers=1, output_format="json")
+    assert report.total == 10
+    assert sorted(failure.title for failure in report.failures) == ["CRASH0", "CRASH3", "CRASH6", "CRASH9"]
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+由列数组构建（from_frame、from_arrays）的图表与由逐行列表构建的输出一致
+"""
+import pytest
+
+from frames import make_frame, parse_data_iterrows
+from stock.kline.kline import Candlestick, ProKline, VolumeBar
+
+__author__ = "Hao Luo"
+
+
+def frames():
+    df = make_frame(200)
+    float_volumes = make_frame(200, seed=1)
+    float_volumes["volume"] = float_volumes["volume"] * 1.0
+    return {
+        "int_volume": df,
+        "float_volume": float_volumes,
+        "sliced": df.iloc[50:],
+    }
+
+
+@pytest.fixture(params=["int_volume", "float_volume", "sliced"])
+def df(request):
+    return frames()[request.param]
+
+
+def series_data(options, name):
+    for series in options["series"]:
+        if series["name"] == name:
+            return series["data"]
+    raise KeyError(name)
+
+
+def test_candlestick_from_frame_matches_rows(df):
+    legacy = parse_data_iterrows(df)
+    expected = Candlestick("CANDLESTICK", legacy["str_dates"], legacy["candlestick_y_data"]).get_chart()
+    assert Candlestick.from_frame("CANDLESTICK", df).get_chart().dump_options() == expected.dump_options()
+
+
+def test_volume_bar_from_frame_matches_rows(df):
+    legacy = parse_data_iterrows(df)
+    chart = VolumeBar.from_frame("VOLUME", df).get_chart()
+    # from_frame 按位置编号，下标从 0 开始；成交量、涨跌状态与逐行列表相同
+    rows = series_data(chart.get_options(), "volume")
+    assert [row[0] for row in rows] == list(range(len(df)))
+    assert [row[1:] for row in rows] == [row[1:] for row in legacy["volume_bar_y_data"]]
+    if df.index[0] == 0:
+        expected = VolumeBar("VOLUME", legacy["str_dates"], legacy["volume_bar_y_data"]).get_chart()
+        assert chart.dump_options() == expected.dump_options()
+
+
+def test_pro_kline_volume_rows_keep_types(df):
+    legacy = parse_data_iterrows(df)
+    options = ProKline("TEST", df).get_chart().get_options()
+    rows = series_data(options, "volume")
+    assert rows == legacy["volume_bar_y_data"]
+    assert all(isinstance(row[0], int) and isinstance(row[2], int) for row in rows)
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+降采样：LTTB 跳过 NaN，中间的 NaN 在降采样后仍断开折线
+"""
+import numpy
+
+from frames import make_frame
+from stock.kline.data import parse_columns
+from stock.kline.downsample import Downsampler, lttb
+
+__author__ = "Hao Luo"
+
+
+def test_lttb_skips_nan():
+    values = numpy.sin(numpy.arange(1000) / 20.0)
+    values[:30] = numpy.nan
+    values[400:450] = numpy.nan
+    selected = lttb(values, 100)
+    assert len(selected) == 100
+    assert not numpy.isnan(values[selected]).any()
+    assert selected[0] == 30 and selected[-1] == 999
+    assert numpy.all(numpy.diff(selected) > 0)
+
+
+def test_lttb_without_nan_keeps_ends():
+    values = numpy.cos(numpy.arange(500) / 10.0)
+    selected = lttb(values, 50)
+    assert len(selected) == 50
+    assert selected[0] == 0 and selected[-1] == 499
+
+
+def test_select_keeps_gap():
+    rows = 4000
+    downsampler = Downsampler(parse_columns(make_frame(rows)), 500)
+    values = numpy.sin(numpy.arange(rows) / 50.0)
+    values[:20] = numpy.nan
+    values[2000:2100] = numpy.nan
+    buckets, selected = downsampler.select(values)
+    assert len(buckets) == len(set(buckets.tolist())) <= 500
+    gaps = selected[numpy.isnan(values[selected])]
+    # 开头的预热段不输出，中间的一段 NaN 输出一个断点
+    assert gaps.tolist() == [2000]
+    assert selected[0] >= 20
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+NumPy 引擎（algorithm）与 talib 的结果一致，包括开头的 NaN 预热段和中间的 NaN（WMA 除外，见 algorithm）
+"""
+import numpy
+import pytest
+
+from stock.kline import algorithm
+
+__author__ = "Hao Luo"
+
+
+ROWS = 500
+LEADING_NAN = 7
+
+
+@pytest.fixture
+def talib():
+    return pytest.importorskip("talib")
+
+
+@pytest.fixture
+def prices():
+    random = numpy.random.default_rng(0)
+    close_prices = 10 + numpy.cumsum(random.normal(0, 0.1, ROWS))
+    high_prices = close_prices + numpy.abs(random.normal(0, 0.1, ROWS))
+    low_prices = close_prices - numpy.abs(random.normal(0, 0.1, ROWS))
+    # 未上市、停牌等缺失数据在开头，talib 跳过开头的 NaN
+    for values in (close_prices, high_prices, low_prices):
+        values[:LEADING_NAN] = numpy.nan
+    return high_prices, low_prices, close_prices
+
+
+def assert_same(actual, expected):
+    numpy.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+@pytest.mark.parametrize("matype", algorithm.MA_TYPES)
+def test_ma_matrix(talib, prices, matype):
+    close_prices = prices[2]
+    periods = [1, 5, 10, 30, 250]
+    result = algorithm.ma_matrix(close_prices, periods, matype=matype)
+    for period, values in zip(periods, result):
+        assert_same(values, talib.MA(close_prices, timeperiod=period, matype=matype))
+
+
+def test_ma_matrix_rows(talib, prices):
+    matrix = numpy.vstack(prices)
+    result = algorithm.ma_matrix(matrix, [5, 20])
+    for i, values in enumerate(matrix):
+        assert_same(result[1, i], talib.MA(values, timeperiod=20))
+
+
+def test_macd(talib, prices):
+    close_prices = prices[2]
+    for actual, expected in zip(algorithm.macd(close_prices), talib.MACD(close_prices)):
+        assert_same(actual, expected)
+
+
+def test_stoch(talib, prices):
+    high_prices, low_prices, close_prices = prices
+    for actual, expected in zip(algorithm.stoch(high_prices, low_prices, close_prices),
+                                talib.STOCH(high_prices, low_prices, close_prices)):
+        assert_same(actual, expected)
+
+
+def test_short_input(talib):
+    values = numpy.arange(3, dtype=numpy.float64)
+    assert_same(algorithm.ma(values, 5), talib.MA(values, timeperiod=5))
+    for actual, expected in zip(algorithm.stoch(values, values, values), talib.STOCH(values, values, values)):
+        assert_same(actual, expected)
+
+
+def test_unsupported_matype():
+    values = numpy.arange(10, dtype=numpy.float64)
+    with pytest.raises(ValueError):
+        algorithm.ma(values, 3, matype=5)
+    with pytest.raises(ValueError):
+        algorithm.stoch(values, values, values, slowk_matype=3)
+
+
+INTERIOR_NAN = 200
+
+
+@pytest.fixture
+def gapped_prices(prices):
+    # 停牌等缺失数据在中间
+    for values in prices:
+        values[INTERIOR_NAN] = numpy.nan
+    return prices
+
+
+@pytest.mark.parametrize("matype", [0, 1])
+def test_interior_nan_ma(talib, gapped_prices, matype):
+    close_prices = gapped_prices[2]
+    for period in (5, 30):
+        assert_same(algorithm.ma(close_prices, period, matype=matype), talib.MA(close_prices, timeperiod=period, matype=matype))
+
+
+def test_interior_nan_macd_stoch(talib, gapped_prices):
+    high_prices, low_prices, close_prices = gapped_prices
+    for actual, expected in zip(algorithm.macd(close_prices), talib.MACD(close_prices)):
+        assert_same(actual, expected)
+    for actual, expected in zip(algorithm.stoch(high_prices, low_prices, close_prices),
+                                talib.STOCH(high_prices, low_prices, close_prices)):
+        assert_same(actual, expected)
+
+
+def test_interior_nan_wma(talib, gapped_prices):
+    close_prices = gapped_prices[2]
+    result = algorithm.wma(close_prices, 5)
+    # NaN 之前与 talib 相同，之后一直为 NaN（talib 会在重算点恢复出值）
+    assert_same(result[:INTERIOR_NAN], talib.WMA(close_prices, timeperiod=5)[:INTERIOR_NAN])
+    assert numpy.isnan(result[INTERIOR_NAN:]).all()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+图表的序列按实例保存：多个实例互不影响，反复构建时长度不增长
+"""
+import numpy
+
+from frames import make_frame
+from stock.kline.kline import Candlestick, MacdChart, ProKline, VolumeBar
+
+__author__ = "Hao Luo"
+
+
+def build_charts(df):
+    data = ProKline("TEST", df).parse_data()
+    return (
+        Candlestick("CANDLESTICK", data["str_dates"], data["candlestick_y_data"]),
+        VolumeBar("VOLUME", data["str_dates"], data["volume_bar_y_data"]),
+        MacdChart("MACD", data["str_dates"], data["close_prices"]),
+    )
+
+
+def test_instances_are_independent():
+    first_df = make_frame(100, seed=0)
+    second_df = make_frame(300, seed=1)
+    candlestick, volume_bar, macd_chart = build_charts(first_df)
+    close_prices = candlestick.y_close_prices.copy()
+    volumes = volume_bar.y_volumes.copy()
+    hist_values = macd_chart.hist_values.copy()
+
+    other_candlestick, other_volume_bar, other_macd_chart = build_charts(second_df)
+    for chart in (other_candlestick, other_volume_bar, other_macd_chart):
+        chart.get_chart()
+
+    assert numpy.array_equal(candlestick.y_close_prices, close_prices)
+    assert numpy.array_equal(volume_bar.y_volumes, volumes)
+    assert numpy.array_equal(macd_chart.hist_values, hist_values, equal_nan=True)
+    assert numpy.array_equal(candlestick.y_close_prices, first_df["close_price"].to_numpy())
+    assert numpy.array_equal(other_candlestick.y_close_prices, second_df["close_price"].to_numpy())
+    assert len(other_volume_bar.y_volumes) == len(other_macd_chart.histogram_data) == 300
+
+    # 类属性不被实例改写
+    assert Candlestick.y_close_prices is None
+    assert VolumeBar.y_volumes is None
+
+
+def test_lengths_stay_bounded():
+    df = make_frame(50)
+    for _ in range(20):
+        candlestick, volume_bar, macd_chart = build_charts(df)
+        ProKline("TEST", df).get_chart()
+        assert len(candlestick.y_close_prices) == 50
+        assert len(volume_bar.y_volumes) == 50
+        assert len(macd_chart.histogram_data) == 50
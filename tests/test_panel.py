@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+面板指标与单个标的计算一致，prime 按 NumPy 引擎放入缓存
+"""
+import numpy
+import pytest
+
+from frames import make_frame
+from stock.kline import indicator
+from stock.kline.cache import indicator_cache
+from stock.kline.data import parse_columns
+from stock.kline.kline import ProKline
+from stock.kline.panel import IndicatorPanel
+from stock.kline.pyramid import indicator_series
+
+__author__ = "Hao Luo"
+
+
+@pytest.fixture
+def engine():
+    """
+    测试结束后恢复引擎并清空指标缓存
+    """
+    saved = indicator.engine_name()
+    indicator_cache.clear()
+    yield indicator.set_engine
+    indicator.set_engine(saved)
+    indicator_cache.clear()
+
+
+def build_panel(frames):
+    columns = [parse_columns(df) for df in frames]
+    return IndicatorPanel(
+        [item["close_prices"] for item in columns],
+        [item["high_prices"] for item in columns],
+        [item["low_prices"] for item in columns],
+        [item["volumes"] for item in columns],
+    ).compute()
+
+
+def test_default_periods_match_chart():
+    panel = build_panel([make_frame(50)])
+    assert panel.close_ma_periods == ProKline.close_ma_periods()
+    assert panel.volume_ma_periods == ProKline.volume_ma_periods()
+
+
+def test_rows_match_single_symbol(engine):
+    engine("numpy")
+    frames = [make_frame(300, seed=seed) for seed in range(3)]
+    panel = build_panel(frames)
+    for i, df in enumerate(frames):
+        expected = indicator_series(parse_columns(df), panel.close_ma_periods, panel.volume_ma_periods)
+        for name, values in panel.series(i).items():
+            numpy.testing.assert_allclose(values, expected[name], rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+def test_prime_hits_numpy_engine(engine):
+    engine("numpy")
+    df = make_frame(300)
+    build_panel([df]).prime(0)
+    ProKline("TEST", df).get_chart()
+    assert indicator_cache.misses == 0
+    assert indicator_cache.hits == 4
+
+
+def test_prime_does_not_leak_into_talib(engine):
+    pytest.importorskip("talib")
+    engine("talib")
+    df = make_frame(300)
+    build_panel([df]).prime(0)
+    ProKline("TEST", df).get_chart()
+    # talib 引擎的查找不会命中 NumPy 面板放入的结果
+    assert indicator_cache.hits == 0
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+按列解析与原逐行实现的输出一致
+"""
+import pytest
+
+from frames import make_frame, parse_data_iterrows
+from stock.kline.kline import ProKline
+
+__author__ = "Hao Luo"
+
+
+def frames():
+    df = make_frame(200)
+    float_volumes = make_frame(200, seed=1)
+    float_volumes["volume"] = float_volumes["volume"] * 1.0
+    return {
+        "int_volume": df,
+        "float_volume": float_volumes,
+        "sliced": df.iloc[50:],
+    }
+
+
+@pytest.fixture(params=["int_volume", "float_volume", "sliced"])
+def df(request):
+    return frames()[request.param]
+
+
+def test_parse_data_matches_iterrows(df):
+    legacy = parse_data_iterrows(df)
+    data = ProKline("TEST", df).parse_data()
+    assert data["str_dates"] == legacy["str_dates"]
+    assert data["candlestick_y_data"] == legacy["candlestick_y_data"]
+    assert data["volume_bar_y_data"] == legacy["volume_bar_y_data"]
+
+
+def test_parse_data_types(df):
+    data = ProKline("TEST", df).parse_data()
+    rows = data["volume_bar_y_data"]
+    assert all(isinstance(row[0], int) and isinstance(row[2], int) for row in rows)
+    assert all(isinstance(value, float) for row in data["candlestick_y_data"] for value in row)
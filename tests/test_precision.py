@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+输出精度：get_fast_chart 与 get_chart 按同一份 Config 取整、去掉开头 NaN
+"""
+import base64
+import json
+
+import numpy
+import pytest
+
+from frames import make_frame
+from stock.kline.emitter import INT32_NULL, encode_price_column
+from stock.kline.kline import Config, ProKline
+
+__author__ = "Hao Luo"
+
+
+ROWS = 300
+
+
+@pytest.fixture
+def split_mode(monkeypatch):
+    # split 模式没有 JS 回调，快速输出是严格的 JSON，可以直接解析
+    monkeypatch.setattr(Config, "BAR_COLOR_MODE", "split")
+
+
+def series_lengths(options):
+    return [(series["name"], len(series["data"])) for series in options["series"]]
+
+
+@pytest.mark.parametrize("trim_nan", [False, True])
+def test_fast_chart_matches_chart(monkeypatch, split_mode, trim_nan):
+    monkeypatch.setattr(Config, "TRIM_LEADING_NAN", trim_nan)
+    df = make_frame(ROWS)
+    expected = ProKline("TEST", df).get_chart().get_options()
+    options = json.loads(ProKline("TEST", df).get_fast_chart().dump_options())
+    assert series_lengths(options) == series_lengths(expected)
+
+
+def test_fast_chart_trim_offsets(monkeypatch, split_mode):
+    monkeypatch.setattr(Config, "TRIM_LEADING_NAN", True)
+    options = json.loads(ProKline("TEST", make_frame(ROWS)).get_fast_chart().dump_options())
+    lengths = dict(series_lengths(options))
+    assert lengths["MA5"] == ROWS - 4
+    assert lengths["K"] == ROWS - 8
+    first_points = {series["name"]: series["data"][0] for series in options["series"]}
+    # 第一个点带横轴下标，表示起始位置
+    assert first_points["MA5"][0] == 4
+    assert first_points["DIF"][0] == 33
+
+
+def test_fast_chart_rounding(monkeypatch, split_mode):
+    monkeypatch.setattr(Config, "PRICE_TICK", 0.01)
+    monkeypatch.setattr(Config, "INDICATOR_DIGITS", 4)
+    df = make_frame(ROWS)
+    options = json.loads(ProKline("TEST", df).get_fast_chart().dump_options())
+    candles = options["series"][0]["data"]
+    assert all(round(value, 2) == value for row in candles for value in row)
+
+
+def test_dataset_mode_warns_on_trim(monkeypatch):
+    monkeypatch.setattr(Config, "TRIM_LEADING_NAN", True)
+    df = make_frame(ROWS)
+    with pytest.warns(UserWarning):
+        ProKline("TEST", df).get_fast_chart(mode="dataset")
+    assert '"offset"' in ProKline("TEST", df).get_fast_chart(mode="binary").dump_options()
+
+
+def decode_column(column):
+    values = numpy.frombuffer(base64.b64decode(column["data"]), dtype="<" + column["type"])
+    if "scale" in column:
+        values = numpy.where(values == INT32_NULL, numpy.nan, values / column["scale"])
+    return values
+
+
+def test_price_column_fixed_point():
+    prices = numpy.round(make_frame(ROWS)["close_price"].to_numpy(), 2)
+    prices[:3] = numpy.nan
+    column = encode_price_column(prices)
+    assert column["type"] == "i4" and column["scale"] == 100
+    # 浏览器端 counts / scale 与原值逐位相同
+    numpy.testing.assert_array_equal(decode_column(column), prices)
+    # 不在十进制网格上的价格仍按 Float64 原样下发
+    raw = make_frame(ROWS)["close_price"].to_numpy()
+    assert encode_price_column(raw)["type"] == "f8"
+    numpy.testing.assert_array_equal(decode_column(encode_price_column(raw)), raw)
+
+
+def test_binary_prices_with_tick(monkeypatch):
+    monkeypatch.setattr(Config, "PRICE_TICK", 0.01)
+    df = make_frame(ROWS)
+    binary = ProKline("TEST", df).get_fast_chart(mode="binary").dump_options()
+    dataset = ProKline("TEST", df).get_fast_chart(mode="dataset").dump_options()
+    assert '"scale": 100' in binary
+    assert len(binary) < len(dataset) * 0.75
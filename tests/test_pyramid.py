@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+金字塔窗口：点数不超过 max_points，预先构建的级别不够粗时继续往下构建
+"""
+import pytest
+
+from frames import make_frame
+from stock.kline.kline import ProKline
+
+__author__ = "Hao Luo"
+
+
+ROWS = 20000
+
+
+@pytest.mark.parametrize("max_points", [1, 10, 100, 1000])
+def test_window_within_budget(max_points):
+    pyramid = ProKline("TEST", make_frame(ROWS)).get_pyramid()
+    window = pyramid.overview(max_points)
+    assert 0 < window["end"] - window["start"] <= max_points
+    assert len(window["columns"]["close_prices"]) == len(window["series"]["MA5"]) <= max_points
+
+
+def test_initial_data_within_budget():
+    data = ProKline("TEST", make_frame(ROWS)).get_initial_data(max_points=100)
+    assert len(data["overview"]["str_dates"]) <= 100
+    assert len(data["window"]["str_dates"]) <= 100
+    assert data["rows"] == ROWS
+
+
+def test_reuses_built_levels():
+    pyramid = ProKline("TEST", make_frame(ROWS)).get_pyramid()
+    pyramid.overview(10)
+    levels = len(pyramid.levels)
+    pyramid.overview(10)
+    assert len(pyramid.levels) == levels
+    with pytest.raises(ValueError):
+        pyramid.overview(0)
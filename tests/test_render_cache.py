@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+渲染缓存：字节预算、磁盘一层在多个实例（进程）间共享
+"""
+import os
+import subprocess
+import sys
+
+from stock.kline.cache import RenderCache, scan_directory
+
+__author__ = "Hao Luo"
+
+
+def directory_bytes(directory):
+    return sum(nbytes for _, _, nbytes in scan_directory(directory))
+
+
+def test_budget_in_bytes():
+    render_cache = RenderCache(max_bytes=100)
+    render_cache.put("a", "中" * 30)
+    render_cache.put("b", "中" * 30)
+    assert render_cache.stats()["bytes"] == 90
+    assert render_cache.get("a") is None
+    assert render_cache.get("b") == "中" * 30
+
+
+def test_disk_shared_across_instances(tmp_path):
+    directory = str(tmp_path)
+    writer = RenderCache(directory=directory)
+    reader = RenderCache(directory=directory)
+    writer.put("key", "text")
+    assert reader.get("key") == "text"
+    assert reader.stats()["disk_hits"] == 1
+
+
+def test_disk_shared_across_processes(tmp_path):
+    directory = str(tmp_path)
+    code = "from stock.kline.cache import RenderCache; RenderCache(directory=%r).put('key', 'text')" % directory
+    subprocess.check_call([sys.executable, "-c", code], cwd=os.getcwd())
+    assert RenderCache(directory=directory).get("key") == "text"
+
+
+def test_disk_budget_covers_all_writers(tmp_path):
+    directory = str(tmp_path)
+    max_disk_bytes = 1000
+    writers = [RenderCache(directory=directory, max_disk_bytes=max_disk_bytes) for _ in range(4)]
+    for i in range(40):
+        writers[i % len(writers)].put("key%d" % i, "x" * 100)
+        assert directory_bytes(directory) <= max_disk_bytes
+    # 保留最近写入的文件
+    assert writers[0].get("key39") == "x" * 100
+    assert not os.path.exists(os.path.join(directory, "key0.html"))
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Resampler 与 pandas groupby 逐周期合并的结果一致
+"""
+import numpy
+import pandas
+import pytest
+
+from frames import session_frame
+from stock.kline.resample import Resampler
+
+__author__ = "Hao Luo"
+
+
+MINUTE_TIMEFRAMES = ["5m", "15m", "30m", "60m"]
+TIMEFRAMES = MINUTE_TIMEFRAMES + ["day", "week", "month"]
+
+
+def groupby_keys(df, timeframe):
+    """
+    分钟K线按开盘后的交易分钟数分段（午休不计，9:30 并入第一段），日、周、月按日历
+    """
+    times = pandas.to_datetime(df["str_date"], format="ISO8601")
+    days = times.dt.normalize()
+    if timeframe == "day":
+        return days
+    if timeframe == "week":
+        return times.dt.to_period("W")
+    if timeframe == "month":
+        return times.dt.to_period("M")
+    minutes = times.dt.hour * 60 + times.dt.minute
+    elapsed = (minutes - 570).clip(0, 120) + (minutes - 780).clip(0, 120)
+    return [days, (elapsed - 1).clip(lower=0) // int(timeframe[:-1])]
+
+
+def groupby(df, timeframe):
+    return df.groupby(groupby_keys(df, timeframe), sort=False).agg(
+        str_date=("str_date", "last"),
+        open_price=("open_price", "first"),
+        close_price=("close_price", "last"),
+        low_price=("low_price", "min"),
+        high_price=("high_price", "max"),
+        preclose_price=("preclose_price", "first"),
+        volume=("volume", "sum"),
+    )
+
+
+@pytest.fixture(scope="module")
+def df():
+    return session_frame(20000)
+
+
+@pytest.fixture(scope="module")
+def resampler(df):
+    return Resampler(df)
+
+
+@pytest.mark.parametrize("timeframe", TIMEFRAMES)
+def test_resample_matches_groupby(df, resampler, timeframe):
+    expected = groupby(df, timeframe)
+    columns = resampler.get(timeframe)
+    for name, key in [("open_price", "open_prices"), ("close_price", "close_prices"), ("low_price", "low_prices"),
+                      ("high_price", "high_prices"), ("preclose_price", "preclose_prices"), ("volume", "volumes")]:
+        assert numpy.array_equal(expected[name].to_numpy(), columns[key]), name
+
+    str_dates = expected["str_date"]
+    if timeframe not in MINUTE_TIMEFRAMES:
+        str_dates = str_dates.str[:10]
+    assert columns["str_dates"].tolist() == str_dates.tolist()
+
+
+@pytest.mark.parametrize("timeframe", TIMEFRAMES)
+def test_order_independent(df, timeframe):
+    """
+    由缓存的较细周期合并与直接由分钟K线合并结果相同
+    """
+    resampler = Resampler(df)
+    for name in TIMEFRAMES:
+        resampler.get(name)
+    direct = Resampler(df).get(timeframe)
+    for name, values in resampler.get(timeframe).items():
+        assert numpy.array_equal(numpy.asarray(values), numpy.asarray(direct[name])), name
+
+
+def test_hour_alias(resampler):
+    assert resampler.get("1h") is resampler.get("60m")
+
+
+def test_daily_bars():
+    df = session_frame(300, profile="daily")
+    resampler = Resampler(df)
+    expected = groupby(df, "week")
+    assert numpy.array_equal(expected["high_price"].to_numpy(), resampler.get("week")["high_prices"])
+    with pytest.raises(ValueError):
+        resampler.get("5m")
+
+
+def test_unknown_timeframe(resampler):
+    with pytest.raises(ValueError):
+        resampler.get("2d")
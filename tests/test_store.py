@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+磁盘列式存储：重写时已打开的窗口数据和缓存 key 不变，追加时拒绝重复日期
+"""
+import numpy
+import pytest
+
+from frames import make_frame
+from stock.kline import store
+from stock.kline.cache import RenderCache
+from stock.kline.kline import ProKline
+
+__author__ = "Hao Luo"
+
+
+def test_rewrite_keeps_open_window(tmp_path):
+    path = str(tmp_path / "store")
+    df = make_frame(100)
+    old_window = store.write_frame(df.assign(close_price=10.0), path).window()
+
+    store.write_frame(df.assign(close_price=20.0), path)
+    new_window = store.OhlcvStore(path).window()
+
+    assert numpy.all(numpy.asarray(old_window.column("close_price")) == 10.0)
+    assert numpy.all(numpy.asarray(new_window.column("close_price")) == 20.0)
+    assert old_window.digest() != new_window.digest()
+    assert ProKline("TEST", old_window).cache_key("embed") != ProKline("TEST", new_window).cache_key("embed")
+
+
+def test_rewrite_does_not_serve_stale_render(tmp_path):
+    path = str(tmp_path / "store")
+    df = make_frame(100)
+    render_cache = RenderCache()
+    old_window = store.write_frame(df.assign(close_price=10.0), path).window()
+
+    store.write_frame(df.assign(close_price=20.0), path)
+    new_html = ProKline("TEST", store.OhlcvStore(path).window()).render_embed(use_cache=render_cache)
+    # 重写前打开的窗口仍是旧数据，不能命中新数据的渲染结果
+    old_html = ProKline("TEST", old_window).render_embed(use_cache=render_cache)
+    assert old_html != new_html
+    assert render_cache.stats()["hits"] == 0
+
+    ProKline("TEST", store.OhlcvStore(path).window()).render_embed(use_cache=render_cache)
+    assert render_cache.stats()["hits"] == 1
+
+
+def test_append_rejects_repeated_date(tmp_path):
+    path = str(tmp_path / "store")
+    df = make_frame(100)
+    store.write_frame(df.iloc[:50], path)
+    with pytest.raises(ValueError):
+        store.append_frame(df.iloc[49:60], path)
+    assert len(store.append_frame(df.iloc[50:], path)) == 100
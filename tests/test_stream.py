@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+增量更新（append_bar、update_last_bar）与对全部K线一次计算的结果一致
+"""
+import math
+
+import numpy
+import pytest
+
+from frames import make_frame
+from stock.kline import algorithm
+from stock.kline.data import COLUMNS, parse_columns
+from stock.kline.kline import ProKline
+from stock.kline.stream import KlineStream
+
+__author__ = "Hao Luo"
+
+
+ROWS = 120
+CLOSE_MA_PERIODS = [1, 5, 10, 30]
+VOLUME_MA_PERIODS = [5, 10]
+
+
+def batch_series(df):
+    """
+    对全部K线一次计算，key 与 KlineStream 输出的 series 相同
+    """
+    columns = parse_columns(df)
+    close_prices = columns["close_prices"]
+    series = {}
+    for period, values in zip(CLOSE_MA_PERIODS, algorithm.ma_matrix(close_prices, CLOSE_MA_PERIODS)):
+        series["MA%d" % period] = values
+    for period, values in zip(VOLUME_MA_PERIODS, algorithm.ma_matrix(columns["volumes"], VOLUME_MA_PERIODS)):
+        series["VMA%d" % period] = values
+    series["DIF"], series["DEA"], _ = algorithm.macd(close_prices)
+    series["K"], series["D"] = algorithm.stoch(columns["high_prices"], columns["low_prices"], close_prices)
+    return series
+
+
+def bar_at(df, i):
+    return {name: value.item() if hasattr(value, "item") else value for name, value in df.iloc[i][COLUMNS].items()}
+
+
+def assert_point(delta, expected, i):
+    for name, values in expected.items():
+        actual = delta["series"][name]
+        if math.isnan(values[i]):
+            assert actual is None, (name, i, actual)
+        else:
+            assert actual == pytest.approx(values[i], rel=1e-9, abs=1e-9), (name, i)
+
+
+@pytest.mark.parametrize("warm_rows", [1, 5, 7, 9, 40])
+def test_append_matches_batch(warm_rows):
+    df = make_frame(ROWS)
+    expected = batch_series(df)
+    stream = KlineStream(CLOSE_MA_PERIODS, VOLUME_MA_PERIODS)
+    stream.warm(parse_columns(df.iloc[:warm_rows]))
+    for i in range(warm_rows, ROWS):
+        delta = stream.append(bar_at(df, i))
+        assert delta["index"] == i
+        assert_point(delta, expected, i)
+
+
+@pytest.mark.parametrize("warm_rows", [1, 8, 40])
+def test_update_last_matches_batch(warm_rows):
+    df = make_frame(ROWS)
+    expected = batch_series(df)
+    stream = KlineStream(CLOSE_MA_PERIODS, VOLUME_MA_PERIODS)
+    stream.warm(parse_columns(df.iloc[:warm_rows]))
+    for i in range(warm_rows, ROWS):
+        bar = bar_at(df, i)
+        # 盘中先后收到几次未走完的K线，最后一次为收盘后的值
+        stream.append(dict(bar, close_price=bar["close_price"] + 1, high_price=bar["high_price"] + 2, volume=bar["volume"] * 3))
+        stream.update_last(dict(bar, low_price=bar["low_price"] - 1))
+        assert_point(stream.update_last(bar), expected, i)
+
+
+def test_kdj_begin_index():
+    """
+    与 talib.STOCH 一样，K、D 从同一根开始有值，默认参数下为第 8 根
+    """
+    df = make_frame(20)
+    stream = KlineStream(CLOSE_MA_PERIODS, VOLUME_MA_PERIODS)
+    stream.warm(parse_columns(df.iloc[:1]))
+    deltas = [stream.append(bar_at(df, i)) for i in range(1, 20)]
+    first_k = min(delta["index"] for delta in deltas if delta["series"]["K"] is not None)
+    first_d = min(delta["index"] for delta in deltas if delta["series"]["D"] is not None)
+    assert first_k == first_d == 8
+
+
+def test_pro_kline_append_bar():
+    df = make_frame(ROWS)
+    split = 60
+    pro_kline = ProKline("TEST", df.iloc[:split])
+    expected = batch_series(df)
+    for i in range(split, ROWS):
+        delta = pro_kline.append_bar(*bar_at(df, i).values())
+        assert_point(delta, {name: values for name, values in expected.items() if name in delta["series"]}, i)
+
+    pro_kline.flush_bars()
+    assert numpy.array_equal(pro_kline.df["close_price"].to_numpy(), df["close_price"].to_numpy())